@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+#One pool of arpeggios shared by many melody searches, with an inverted index from pitch number to the sorted positions of the
+#arpeggios holding it; does not import abjad. search_melody here selects exactly what melodySearch.search_melody selects when it
+#scans the pool in order, but each melody note costs one bisect into its pitch's positions instead of a scan over the pool,
+#so several melodies and transpositions can be searched in the same material without generating or scanning it again.
+from bisect import bisect_right
+import numpy
+import melodySearch
+
+class ArpeggioPool(object):
+    #arpeggios: melodySearch.Arpeggios in pool order; positions: {pitch number: ascending positions of the arpeggios containing it}.
+    __slots__ = ('arpeggios', 'positions')
+
+    def __init__(self):
+        self.arpeggios = [ ]
+        self.positions = { }
+
+    def __len__(self):
+        return len(self.arpeggios)
+
+    def extend(self, chords):
+        #adds a chordEngine.ChordBatch at the end of the pool; the new positions are all larger, so each pitch's list stays sorted.
+        first_position = len(self.arpeggios)
+        self.arpeggios.extend( melodySearch.make_arpeggio( x ) for x in chords )
+        valid = numpy.arange(chords.pitch_numbers.shape[1])[None, :] < chords.lengths[:, None]
+        rows = numpy.nonzero(valid)[0]
+        pitch_numbers = chords.pitch_numbers[valid]
+        #grouped by pitch, each group still in row order.
+        order = numpy.argsort(pitch_numbers, kind = 'stable')
+        pitch_numbers = pitch_numbers[order]
+        rows = rows[order] + first_position
+        boundaries = numpy.flatnonzero(numpy.diff(pitch_numbers)) + 1
+        for group_pitch_numbers, group_rows in zip(numpy.split(pitch_numbers, boundaries), numpy.split(rows, boundaries)):
+            if len(group_rows):
+                self.positions.setdefault( int(group_pitch_numbers[0]), [ ] ).extend( group_rows.tolist() )
+
+    def get_next_position(self, pitch_number, after_position = -1):
+        #the position of the first arpeggio after after_position that contains pitch_number, or None.
+        positions = self.positions.get(pitch_number)
+        if positions is None:
+            return None
+        index = bisect_right(positions, after_position)
+        if index == len(positions):
+            return None
+        return positions[index]
+
+def make_arpeggio_pool( chords ):
+    pool = ArpeggioPool()
+    pool.extend( chords )
+    return pool
+
+def search_melody_positions( pool, pitch_numbers ):
+    #the pool positions melodySearch.search_melody would select, stopping at the first pitch the rest of the pool does not hold.
+    positions = [ ]
+    position = -1
+    for pitch_number in pitch_numbers:
+        position = pool.get_next_position( pitch_number, position )
+        if position is None:
+            break
+        positions.append( position )
+    return positions
+
+def search_melody( pool, pitch_numbers ):
+    #returns the (arpeggio, pitch_number) selections, as melodySearch.search_melody over the pool's arpeggios would.
+    return [ (pool.arpeggios[position], pitch_number) for position, pitch_number in zip(search_melody_positions( pool, pitch_numbers ), pitch_numbers) ]
+
+def search_melodies( pool, melodies, transpositions = (0,) ):
+    #every melody (a list of pitch numbers) at every transposition, each searched from the start of the same pool.
+    #returns {(melody index, transposition): selections}; a melody the pool can not hold to its end has fewer selections than notes.
+    selections = { }
+    for melody_index, pitch_numbers in enumerate(melodies):
+        for transposition in transpositions:
+            selections[(melody_index, transposition)] = search_melody( pool, [ x + transposition for x in pitch_numbers ] )
+    return selections
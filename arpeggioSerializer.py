@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#Writes the LilyPond text of enfilade arpeggio voices straight from pitch numbers and mark annotations, without building abjad objects.
+#The text follows abjad 2.13's formatting of the voices that make_enfilade_staff builds in enfilade2.13.py: the two match line for line
+#on serializerGolden.ly, abjad's formatting of the passes in serializerGolden.json (see check_serializers there); does not import abjad.
+#ArpeggioAnnotation is also what enfilade2.13.py builds its arpeggio voices from: marks are planned on annotations
+#(enfiladeCore.annotate_passes) and attached to the abjad voices in one walk (see add_mark_plan).
+from array import array
+
+#abjad's default spelling of each pitch class.
+pitch_class_names = ('c', 'cs', 'd', 'ef', 'e', 'f', 'fs', 'g', 'af', 'a', 'bf', 'b')
+articulation_strings = {'-': 'tenuto', '.': 'staccato', '>': 'accent', '^': 'marcato', '+': 'stopped', '_': 'portato'}
+direction_strings = {'up': '^', 'down': '_', None: '-'}
+
+class ArpeggioAnnotation(object):
+    #one arpeggio voice: pitch numbers in playing order (a byte per note), the duration of every note, and the marks its notes carry,
+    #keyed by note index. staff_switches: (note index, clef_key) pairs; dynamics: (note index, dynamic name) pairs, in attachment order;
+    #articulations: (note index, articulation name, direction) triples; tempo: (reference duration, units per minute) or None.
+    __slots__ = ('pitch_numbers', 'duration', 'staff_switches', 'dynamics', 'articulations', 'tempo', 'break_after')
+
+    def __init__(self, pitch_numbers, staff_switches = (), dynamics = (), articulations = (), tempo = None, break_after = False,
+        duration = (1, 16)):
+        self.pitch_numbers = array('b', pitch_numbers)
+        self.duration = duration
+        self.staff_switches = list(staff_switches)
+        self.dynamics = list(dynamics)
+        self.articulations = list(articulations)
+        self.tempo = tempo
+        self.break_after = break_after
+
+def get_pitch_name( pitch_number ):
+    octave, pitch_class_number = divmod(pitch_number, 12)
+    octave_ticks = octave + 1
+    if octave_ticks < 0:
+        return pitch_class_names[pitch_class_number] + ',' * -octave_ticks
+    return pitch_class_names[pitch_class_number] + "'" * octave_ticks
+
+def add_mark_plan( annotations, plan = None, first_leaf_index = 0 ):
+    #the marks of the annotations as a plan: {leaf index: [(kind, arguments), ...] in attachment order}, the annotations' notes
+    #numbered on from first_leaf_index. kinds: 'time_signature', 'staff_lines', 'articulation', 'dynamic', 'command', 'tempo'.
+    #Adds to plan when one is given, so one plan can hold a whole staff; enfilade2.13.py applies it in one walk over the leaves.
+    if plan is None:
+        plan = { }
+    leaf_index = first_leaf_index
+    for annotation in annotations:
+        marks = [ [ ] for x in annotation.pitch_numbers ]
+        marks[0].append( ('time_signature', (annotation.duration,)) )
+        for index, clef_key in annotation.staff_switches:
+            marks[index].append( ('staff_lines', (clef_key,)) )
+        for index, name, direction in annotation.articulations:
+            marks[index].append( ('articulation', (name, direction)) )
+        #a later dynamic on the same note replaces an earlier one, as in format_arpeggio_voice; abjad refuses a second DynamicMark.
+        for index, dynamic in sorted( dict( annotation.dynamics ).items() ):
+            marks[index].append( ('dynamic', (dynamic,)) )
+        if annotation.break_after:
+            marks[-1].append( ('command', ('break', 'after')) )
+        if annotation.tempo is not None:
+            marks[0].append( ('tempo', annotation.tempo) )
+        for index, note_marks in enumerate(marks):
+            if note_marks:
+                plan.setdefault( leaf_index + index, [ ] ).extend( note_marks )
+        leaf_index += len(annotation.pitch_numbers)
+    return plan
+
+def split_annotations_at_breaks( annotations, systems_per_chunk, leading_systems = 0 ):
+    #cuts the annotations into chunks of systems_per_chunk systems (each ending at a break), so each chunk can be engraved on its own.
+    #leading_systems: systems the first chunk holds before the annotations (the melody's); with as many as systems_per_chunk,
+    #the first chunk has no annotations. Every arpeggio voice sets its staff lines on its first note, so a chunk needs no state
+    #from the chunks before it.
+    if systems_per_chunk < 1:
+        raise ValueError('systems_per_chunk must be at least 1, not %s.' % systems_per_chunk)
+    chunks = [ [ ] ]
+    number_of_systems = leading_systems
+    for annotation in annotations:
+        if systems_per_chunk <= number_of_systems:
+            chunks.append( [ ] )
+            number_of_systems = 0
+        chunks[-1].append( annotation )
+        if annotation.break_after:
+            number_of_systems += 1
+    return chunks
+
+def format_duration( duration ):
+    #durations of the form (1, n) only, the only kind the arpeggios use.
+    numerator, denominator = duration
+    if numerator != 1:
+        raise ValueError('can not format the duration %s/%s.' % duration)
+    return str(denominator)
+
+def format_articulation( name, direction ):
+    return direction_strings[direction] + '\\' + articulation_strings.get(name, name)
+
+def format_tempo( tempo ):
+    reference_duration, units_per_minute = tempo
+    return '\\tempo %s=%s' % (reference_duration[1] // reference_duration[0], units_per_minute)
+
+def format_arpeggio_voice( annotation, clef_key_command_strings, indent = '\t' ):
+    #returns the lines of one \new Voice block, each starting with indent.
+    #clef_key_command_strings: the table of move_staff_lines_at_leaf, so the staff switch commands are the exact strings the abjad path uses.
+    pitch_numbers = annotation.pitch_numbers
+    last_index = len(pitch_numbers) - 1
+    duration_string = format_duration( annotation.duration )
+    commands = [ [ ] for x in pitch_numbers ]
+    for index, clef_key in annotation.staff_switches:
+        commands[index].extend( clef_key_command_strings[clef_key] )
+    #a later dynamic on the same note replaces an earlier one.
+    dynamics = dict( annotation.dynamics )
+    articulations = [ [ ] for x in pitch_numbers ]
+    for index, name, direction in annotation.articulations:
+        articulations[index].append( format_articulation( name, direction ) )
+    inner_indent = indent + '\t'
+    lines = [ indent + '\\new Voice \\with {',
+        inner_indent + "\\override PhrasingSlur #'height-limit = #20",
+        inner_indent + "\\override PhrasingSlur #'ratio = #0.6",
+        indent + '} {' ]
+    for index, pitch_number in enumerate(pitch_numbers):
+        if index == 0:
+            lines.append( inner_indent + '\\time %s/%s' % annotation.duration )
+            if annotation.tempo is not None:
+                lines.append( inner_indent + format_tempo( annotation.tempo ) )
+        for command_string in commands[index]:
+            lines.append( inner_indent + '\\' + command_string )
+        pieces = [ get_pitch_name( pitch_number ) + duration_string ]
+        pieces.extend( articulations[index] )
+        if index in dynamics:
+            pieces.append( '\\' + dynamics[index] )
+        if index == 0:
+            pieces.extend( ['[', '\\('] )
+        if index == last_index:
+            pieces.extend( [']', '\\)'] )
+        lines.append( inner_indent + ' '.join(pieces) )
+        if index == last_index and annotation.break_after:
+            lines.append( inner_indent + '\\break' )
+    lines.append( indent + '}' )
+    return lines
+
+def format_arpeggio_voices( annotations, clef_key_command_strings, indent = '\t' ):
+    lines = [ ]
+    for annotation in annotations:
+        lines.extend( format_arpeggio_voice( annotation, clef_key_command_strings, indent ) )
+    return lines
+
+def replace_placeholder_voice( lilypond_string, placeholder_name, annotations, clef_key_command_strings ):
+    #swaps the empty voice named placeholder_name in an abjad-formatted file for the formatted arpeggio voices, at the same indentation.
+    lines = lilypond_string.split('\n')
+    opening = '\\context Voice = "%s" {' % placeholder_name
+    for start, line in enumerate(lines):
+        if line.strip() == opening:
+            break
+    else:
+        raise ValueError('no voice named %r in the LilyPond text.' % placeholder_name)
+    indent = lines[start][:len(lines[start]) - len(lines[start].lstrip())]
+    stop = start + 1
+    while lines[stop] != indent + '}':
+        stop += 1
+    voice_lines = format_arpeggio_voices( annotations, clef_key_command_strings, indent )
+    return '\n'.join( lines[:start] + voice_lines + lines[stop + 1:] )
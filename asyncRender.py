@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+#An asyncio render pipeline: variant N + 1 is generated while variant N engraves in a LilyPond subprocess; does not import abjad.
+#asyncio needs Python 3 and abjad 2.13 Python 2, so generation is a subprocess too: make_ly_command(variant, ly_path) gives the command
+#that writes a variant's .ly to ly_path, run one at a time (python2 enfilade2.13.py --ly-file, see main). A bounded queue between
+#generation and the engravers holds generation back when LilyPond falls behind. Submitting a name again makes the earlier job for it
+#stale: it is dropped if it has not started engraving, and its LilyPond process is killed if it has. Reports match batchRender's,
+#with 'cancelled' added.
+#The LilyPond run and the cache steps are renderCache's and batchRender's; only the processes are awaited here, and the blocking
+#cache steps (lilypond --version, reading includes, eviction) run in the loop's default executor.
+#usage: python3 asyncRender.py out --seeds 1 2 3 --python python2 --sampling table (options it does not know go to enfilade2.13.py)
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import time
+import batchRender
+import renderCache
+
+async def run_command( command, cwd = None ):
+    #runs command to completion and returns its output (standard error included); cancelling it kills the process.
+    process = await asyncio.create_subprocess_exec( *command, cwd = cwd, stdout = asyncio.subprocess.PIPE,
+        stderr = asyncio.subprocess.STDOUT )
+    try:
+        log = ( await process.communicate() )[0]
+    except asyncio.CancelledError:
+        process.kill()
+        await process.wait()
+        raise
+    return process.returncode, log
+
+async def run_lilypond( ly_string, output_directory, lilypond_command = 'lilypond', file_name = 'score' ):
+    #renderCache.run_lilypond as a coroutine; cancelling it kills LilyPond.
+    command = renderCache.write_lilypond_input( ly_string, output_directory, lilypond_command, file_name )
+    start_time = time.time()
+    returncode, log = await run_command( command, output_directory )
+    renderCache.check_lilypond_exit( returncode, lilypond_command, log )
+    return time.time() - start_time
+
+async def generate_ly_string( command, ly_path ):
+    #runs a generation command that writes ly_path and returns the text it wrote. Raises CalledProcessError with its output on failure.
+    try:
+        returncode, log = await run_command( command )
+        if returncode != 0:
+            raise subprocess.CalledProcessError( returncode, command, log )
+        with open(ly_path) as ly_file:
+            return ly_file.read()
+    finally:
+        if os.path.exists(ly_path):
+            os.remove(ly_path)
+
+async def render_and_time_lilypond_string( ly_string, cache_directory = renderCache.default_cache_directory, lilypond_command = 'lilypond',
+    directory = None, maximum_bytes = renderCache.default_maximum_bytes, maximum_age_seconds = renderCache.default_maximum_age_seconds ):
+    #renderCache.render_and_time_lilypond_string as a coroutine: returns (outputs, LilyPond seconds), running LilyPond only on a cache miss.
+    loop = asyncio.get_event_loop()
+    key, entry_directory, outputs = await loop.run_in_executor( None, renderCache.look_up_entry, ly_string, cache_directory,
+        lilypond_command, directory )
+    if outputs:
+        return outputs, 0.0
+    working_directory = renderCache.make_working_directory( cache_directory, key )
+    try:
+        lilypond_seconds = await run_lilypond( ly_string, working_directory, lilypond_command )
+    except BaseException:
+        shutil.rmtree(working_directory, ignore_errors = True)
+        raise
+    renderCache.commit_entry( working_directory, entry_directory )
+    await loop.run_in_executor( None, renderCache.evict, cache_directory, maximum_bytes, maximum_age_seconds, key )
+    return renderCache.get_cached_outputs( entry_directory ), lilypond_seconds
+
+class RenderPipeline(object):
+    #use inside a running event loop: submit() variants, then await close() for the reports.
+    #make_ly_command(variant, ly_path) returns the command line of a process that writes the .ly text of a variant to ly_path.
+
+    def __init__(self, make_ly_command, output_directory, queue_size = 2, engravers = 1, lilypond_command = 'lilypond',
+        cache_directory = renderCache.default_cache_directory, midi = True, maximum_bytes = renderCache.default_maximum_bytes,
+        maximum_age_seconds = renderCache.default_maximum_age_seconds):
+        #maximum_bytes, maximum_age_seconds: the cache's eviction limits (see renderCache.evict).
+        self.make_ly_command = make_ly_command
+        self.output_directory = output_directory
+        self.lilypond_command = lilypond_command
+        self.cache_directory = cache_directory
+        self.midi = midi
+        self.maximum_bytes = maximum_bytes
+        self.maximum_age_seconds = maximum_age_seconds
+        if not os.path.isdir(output_directory):
+            os.makedirs(output_directory)
+        self.requests = asyncio.Queue()
+        self.ly_strings = asyncio.Queue( queue_size )
+        #name: the number of the newest job submitted under it; name: the task engraving it.
+        self.newest_jobs = { }
+        self.engraving = { }
+        self.reports = [ ]
+        self.number_of_jobs = 0
+        self.tasks = [ asyncio.ensure_future( self.generate() ) ]
+        self.tasks.extend( asyncio.ensure_future( self.engrave() ) for x in range(engravers) )
+
+    def submit(self, name, variant):
+        #queues a variant under name; an earlier job with the same name becomes stale.
+        self.number_of_jobs += 1
+        self.newest_jobs[name] = self.number_of_jobs
+        if name in self.engraving:
+            self.engraving[name].cancel()
+        self.requests.put_nowait( (name, variant, self.number_of_jobs) )
+
+    def is_stale(self, name, job):
+        return self.newest_jobs.get(name) != job
+
+    def add_cancelled_report(self, name):
+        self.reports.append( {'name': name, 'ly': None, 'outputs': [ ], 'failed': False, 'cancelled': True, 'error': None, 'seconds': 0.0,
+            'lilypond_seconds': 0.0} )
+
+    async def generate(self):
+        while True:
+            name, variant, job = await self.requests.get()
+            try:
+                if self.is_stale( name, job ):
+                    self.add_cancelled_report( name )
+                    continue
+                start_time = time.time()
+                ly_path = os.path.abspath( os.path.join(self.output_directory, name + '.generated.ly') )
+                try:
+                    ly_string = await generate_ly_string( self.make_ly_command( variant, ly_path ), ly_path )
+                except Exception as error:
+                    report = batchRender.make_report( name, self.output_directory )
+                    report.update( {'ly': None, 'cancelled': False, 'seconds': time.time() - start_time} )
+                    batchRender.set_report_error( report, error )
+                    self.reports.append( report )
+                    continue
+                #waits here while the queue is full.
+                await self.ly_strings.put( (name, ly_string, job, time.time() - start_time) )
+            finally:
+                self.requests.task_done()
+
+    async def engrave(self):
+        while True:
+            name, ly_string, job, generation_seconds = await self.ly_strings.get()
+            try:
+                if self.is_stale( name, job ):
+                    self.add_cancelled_report( name )
+                    continue
+                task = asyncio.ensure_future( self.engrave_job( name, ly_string ) )
+                self.engraving[name] = task
+                try:
+                    report = await task
+                except asyncio.CancelledError:
+                    if not task.cancelled():
+                        raise
+                    self.add_cancelled_report( name )
+                    continue
+                finally:
+                    if self.engraving.get(name) is task:
+                        del self.engraving[name]
+                report['generation_seconds'] = generation_seconds
+                self.reports.append( report )
+            finally:
+                self.ly_strings.task_done()
+
+    async def engrave_job(self, name, ly_string):
+        #batchRender.render_job, with LilyPond run as a coroutine.
+        report = batchRender.make_report( name, self.output_directory )
+        report['cancelled'] = False
+        start_time = time.time()
+        try:
+            ly_string = batchRender.write_ly_file( report['ly'], ly_string, self.midi )
+            if self.cache_directory is not None:
+                outputs, report['lilypond_seconds'] = await render_and_time_lilypond_string( ly_string, self.cache_directory,
+                    self.lilypond_command, self.output_directory, self.maximum_bytes, self.maximum_age_seconds )
+                report['outputs'] = batchRender.copy_cached_outputs( outputs, self.output_directory, name )
+            else:
+                report['lilypond_seconds'] = await run_lilypond( ly_string, self.output_directory, self.lilypond_command, name )
+                report['outputs'] = batchRender.find_outputs( self.output_directory, name )
+        except Exception as error:
+            batchRender.set_report_error( report, error )
+        report['seconds'] = time.time() - start_time
+        return report
+
+    async def close(self):
+        #waits for every submitted job to finish (or be cancelled), stops the pipeline and returns the reports in finishing order.
+        await self.requests.join()
+        await self.ly_strings.join()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather( *self.tasks, return_exceptions = True )
+        return self.reports
+
+async def render_variants( named_variants, make_ly_command, output_directory, queue_size = 2, engravers = 1, lilypond_command = 'lilypond',
+    cache_directory = renderCache.default_cache_directory, midi = True, maximum_bytes = renderCache.default_maximum_bytes,
+    maximum_age_seconds = renderCache.default_maximum_age_seconds ):
+    #named_variants: (name, variant) pairs, generated in order. Returns batchRender-style reports in input order, cancelled jobs included.
+    pipeline = RenderPipeline( make_ly_command, output_directory, queue_size, engravers, lilypond_command, cache_directory, midi,
+        maximum_bytes, maximum_age_seconds )
+    for name, variant in named_variants:
+        pipeline.submit( name, variant )
+    reports = await pipeline.close()
+    order = dict( (name, x) for x, (name, variant) in enumerate(named_variants) )
+    reports.sort( key = lambda x: order.get(x['name'], len(order)) )
+    return reports
+
+def render_variants_and_report( named_variants, make_ly_command, output_directory, queue_size = 2, engravers = 1,
+    lilypond_command = 'lilypond', cache_directory = renderCache.default_cache_directory, midi = True,
+    maximum_bytes = renderCache.default_maximum_bytes, maximum_age_seconds = renderCache.default_maximum_age_seconds ):
+    #runs render_variants to completion and writes the reports to render_report.json, as batchRender does.
+    reports = asyncio.run( render_variants( named_variants, make_ly_command, output_directory, queue_size, engravers,
+        lilypond_command, cache_directory, midi, maximum_bytes, maximum_age_seconds ) )
+    batchRender.write_reports( reports, output_directory )
+    return reports
+
+enfilade_path = os.path.join( os.path.dirname(os.path.abspath(__file__)), 'enfilade2.13.py' )
+
+def make_enfilade_ly_command( python_command, enfilade_arguments ):
+    #the make_ly_command for enfilade seeds: enfilade2.13.py --ly-file under python_command, which has to have abjad 2.13.
+    def make_ly_command( seed, ly_path ):
+        return [ python_command, enfilade_path, '--seeds', str(seed), '--ly-file', ly_path ] + list(enfilade_arguments)
+    return make_ly_command
+
+def main():
+    parser = argparse.ArgumentParser( description = 'Generates enfilade seeds in a Python 2 subprocess while earlier seeds engrave.',
+        epilog = 'Options not listed here (--sampling, --serializer, --pitch-weights, --maximum-chords) go to enfilade2.13.py.' )
+    parser.add_argument( 'output_directory' )
+    parser.add_argument( '--seeds', nargs = '+', type = int, required = True )
+    parser.add_argument( '--python', default = 'python2', help = 'the interpreter that runs enfilade2.13.py (needs abjad 2.13)' )
+    parser.add_argument( '--queue-size', type = int, default = 2, help = 'generated .ly files waiting for LilyPond at most' )
+    parser.add_argument( '--processes', type = int, default = 1, help = 'LilyPond processes running at once' )
+    parser.add_argument( '--lilypond', default = 'lilypond' )
+    arguments, enfilade_arguments = parser.parse_known_args()
+    if arguments.queue_size < 1 or arguments.processes < 1:
+        parser.error( '--queue-size and --processes must be at least 1.' )
+    named_variants = [ ('enfilade_seed_%s' % seed, seed) for seed in arguments.seeds ]
+    reports = render_variants_and_report( named_variants, make_enfilade_ly_command( arguments.python, enfilade_arguments ),
+        arguments.output_directory, arguments.queue_size, arguments.processes, arguments.lilypond )
+    batchRender.print_reports( reports )
+    return 1 if any( report['failed'] for report in reports ) else 0
+
+if __name__ == '__main__':
+    sys.exit( main() )
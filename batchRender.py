@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+#Headless output: writes .ly, .pdf and .midi files to a directory instead of opening a viewer, engraving many files
+#across a bounded pool of LilyPond processes and reporting per-file timings and failures; does not import abjad.
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+import renderCache
+
+report_file_name = 'render_report.json'
+
+def add_midi_output( ly_string ):
+    #gives the \score block a \midi block (and a \layout block, without which LilyPond would skip the PDF).
+    lines = ly_string.split('\n')
+    for start, line in enumerate(lines):
+        if line.rstrip() == '\\score {':
+            break
+    else:
+        raise ValueError('no \\score block in the LilyPond text.')
+    for stop in range(start + 1, len(lines)):
+        if lines[stop].rstrip() == '}':
+            break
+    else:
+        raise ValueError('the \\score block is not closed.')
+    return '\n'.join( lines[:stop] + ['\t\\layout { }', '\t\\midi { }'] + lines[stop:] )
+
+#the steps of render_job, shared with asyncRender's engrave_job.
+
+def make_report( name, output_directory ):
+    #seconds: the whole job; lilypond_seconds: the LilyPond run alone (0.0 when the cache had the outputs).
+    return {'name': name, 'ly': os.path.join(output_directory, name + '.ly'), 'outputs': [ ], 'failed': False, 'error': None,
+        'lilypond_seconds': 0.0}
+
+def write_ly_file( ly_path, ly_string, midi ):
+    #writes the .ly that goes next to the outputs; returns the text to engrave.
+    if midi:
+        ly_string = add_midi_output( ly_string )
+    with open(ly_path, 'w') as ly_file:
+        ly_file.write(ly_string)
+    return ly_string
+
+def copy_cached_outputs( outputs, output_directory, name ):
+    #copies renderCache outputs to output_directory/name.pdf, ...; returns the copies' paths.
+    output_paths = [ ]
+    for extension, cached_path in sorted(outputs.items()):
+        output_path = os.path.join(output_directory, name + extension)
+        shutil.copyfile(cached_path, output_path)
+        output_paths.append(output_path)
+    return output_paths
+
+def find_outputs( output_directory, name ):
+    return [ os.path.join(output_directory, name + x) for x in renderCache.output_extensions
+        if os.path.exists(os.path.join(output_directory, name + x)) ]
+
+def set_report_error( report, error ):
+    report['failed'] = True
+    if isinstance(error, subprocess.CalledProcessError):
+        log = error.output.decode('utf-8', 'replace') if isinstance(error.output, bytes) else str(error.output)
+        program = error.cmd[0] if isinstance(error.cmd, (list, tuple)) else error.cmd
+        report['error'] = '%s exited with status %s:\n%s' % (os.path.basename(program), error.returncode, log[-2000:])
+    else:
+        report['error'] = '%s: %s' % (type(error).__name__, error)
+
+def render_job( job ):
+    #job: (name, ly_string, output_directory, lilypond_command, midi, cache_directory); cache_directory None renders without the cache.
+    #returns a report dictionary; never raises.
+    name, ly_string, output_directory, lilypond_command, midi, cache_directory = job
+    report = make_report( name, output_directory )
+    start_time = time.time()
+    try:
+        ly_string = write_ly_file( report['ly'], ly_string, midi )
+        if cache_directory is not None:
+            outputs, report['lilypond_seconds'] = renderCache.render_and_time_lilypond_string( ly_string, cache_directory, lilypond_command,
+                output_directory )
+            report['outputs'] = copy_cached_outputs( outputs, output_directory, name )
+        else:
+            report['lilypond_seconds'] = renderCache.run_lilypond( ly_string, output_directory, lilypond_command, name )
+            report['outputs'] = find_outputs( output_directory, name )
+    except Exception as error:
+        set_report_error( report, error )
+    report['seconds'] = time.time() - start_time
+    return report
+
+def render_lilypond_strings( named_ly_strings, output_directory, processes = 2, lilypond_command = 'lilypond', midi = True,
+    cache_directory = renderCache.default_cache_directory ):
+    #named_ly_strings: (name, ly_string) pairs; each is written to output_directory/name.ly and engraved next to it.
+    #processes: the most LilyPond processes running at once; cache_directory: see renderCache, or None to always run LilyPond.
+    #returns one report per file, in input order, and writes them to render_report.json.
+    if not os.path.isdir(output_directory):
+        os.makedirs(output_directory)
+    jobs = [ (name, ly_string, output_directory, lilypond_command, midi, cache_directory) for name, ly_string in named_ly_strings ]
+    pool = ThreadPool( processes )
+    try:
+        reports = pool.map( render_job, jobs, chunksize = 1 )
+    finally:
+        pool.close()
+        pool.join()
+    write_reports( reports, output_directory )
+    return reports
+
+def find_executable( name ):
+    #the path of the program name on PATH, or None; shutil.which is Python 3 only, and the chunks are rendered under abjad's Python 2.
+    for directory in os.environ.get('PATH', os.defpath).split(os.pathsep):
+        file_path = os.path.join(directory, name)
+        if os.path.isfile(file_path) and os.access(file_path, os.X_OK):
+            return file_path
+    return None
+
+def get_pdf_concatenation_command( pdf_paths, output_path ):
+    #pdfunite (poppler) if it is installed, else Ghostscript.
+    if find_executable('pdfunite') is not None:
+        return ['pdfunite'] + list(pdf_paths) + [output_path]
+    if find_executable('gs') is not None:
+        return ['gs', '-q', '-dBATCH', '-dNOPAUSE', '-sDEVICE=pdfwrite', '-sOutputFile=' + output_path] + list(pdf_paths)
+    raise RuntimeError('concatenating PDFs needs pdfunite or gs.')
+
+def concatenate_pdfs( pdf_paths, output_path ):
+    #writes the pages of pdf_paths, in order, to output_path.
+    if not pdf_paths:
+        raise ValueError('no PDFs to concatenate.')
+    if len(pdf_paths) == 1:
+        shutil.copyfile(pdf_paths[0], output_path)
+        return output_path
+    subprocess.check_output( get_pdf_concatenation_command( pdf_paths, output_path ), stderr = subprocess.STDOUT )
+    return output_path
+
+def get_chunk_name( name, index ):
+    return '%s_chunk_%03d' % (name, index)
+
+def render_timed_job( job ):
+    #render_job, with the wall clock times it started and finished.
+    start_time = time.time()
+    report = render_job( job )
+    return report, start_time, time.time()
+
+def render_chunked_lilypond_strings( named_chunks, output_directory, processes = 2, lilypond_command = 'lilypond',
+    cache_directory = renderCache.default_cache_directory ):
+    #named_chunks: (name, [chunk ly_string, ...]) pairs. Every chunk of every name is engraved in the same pool of processes
+    #(as name_chunk_000.ly, ...; no MIDI), then each name's chunk PDFs are concatenated, in order, into name.pdf.
+    #returns one report per name, in input order, with its chunks' reports under 'chunks', and writes them to render_report.json.
+    #A name's seconds is wall time, from its first chunk starting to its PDF being written; each chunk's own seconds are under 'chunks'.
+    if not os.path.isdir(output_directory):
+        os.makedirs(output_directory)
+    jobs = [ (get_chunk_name( name, index ), ly_string, output_directory, lilypond_command, False, cache_directory)
+        for name, ly_strings in named_chunks for index, ly_string in enumerate(ly_strings) ]
+    pool = ThreadPool( processes )
+    try:
+        timed_reports = pool.map( render_timed_job, jobs, chunksize = 1 )
+    finally:
+        pool.close()
+        pool.join()
+    reports = [ ]
+    start = 0
+    for name, ly_strings in named_chunks:
+        timed_chunks = timed_reports[start:start + len(ly_strings)]
+        start += len(ly_strings)
+        chunks = [ x[0] for x in timed_chunks ]
+        report = {'name': name, 'ly': [ x['ly'] for x in chunks ], 'outputs': [ ], 'failed': False, 'error': None, 'chunks': chunks,
+            'lilypond_seconds': sum( x['lilypond_seconds'] for x in chunks )}
+        failed_chunks = [ x for x in chunks if x['failed'] ]
+        if failed_chunks:
+            report['failed'] = True
+            report['error'] = '%s failed: %s' % (failed_chunks[0]['name'], failed_chunks[0]['error'])
+        else:
+            pdf_paths = [ x for chunk in chunks for x in chunk['outputs'] if x.endswith('.pdf') ]
+            try:
+                report['outputs'].append( concatenate_pdfs( pdf_paths, os.path.join(output_directory, name + '.pdf') ) )
+            except subprocess.CalledProcessError as error:
+                report['failed'] = True
+                report['error'] = 'PDF concatenation exited with status %s:\n%s' % (error.returncode,
+                    error.output.decode('utf-8', 'replace')[-2000:])
+            except Exception as error:
+                report['failed'] = True
+                report['error'] = '%s: %s' % (type(error).__name__, error)
+        report['seconds'] = time.time() - min( x[1] for x in timed_chunks ) if timed_chunks else 0.0
+        reports.append( report )
+    write_reports( reports, output_directory )
+    return reports
+
+def write_reports( reports, output_directory ):
+    with open(os.path.join(output_directory, report_file_name), 'w') as report_file:
+        json.dump( reports, report_file, indent = 2 )
+
+def print_reports( reports, output_file = sys.stderr ):
+    for report in reports:
+        status = 'FAILED' if report['failed'] else 'ok'
+        output_file.write( '%-40s %8.2fs  %s\n' % (report['name'], report['seconds'], status) )
+        if report['failed']:
+            output_file.write( report['error'] + '\n' )
+    failures = len([ x for x in reports if x['failed'] ])
+    output_file.write( '%s files, %s failed, %.2fs engraving in total\n' % (len(reports), failures, sum( x['seconds'] for x in reports )) )
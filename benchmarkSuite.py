@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+#Times each stage of the pipeline at 10^2 .. 10^5 chords with a fixed seed and writes the timings as JSON, so two runs
+#(before and after an abjad upgrade, say) can be compared; --compare fails the run when a stage got slower than --threshold allows.
+#The abjad stages load enfilade2.13.py and berkeleyOne.py (both abjad 2.13) by path and are recorded as errors when they do not run;
+#formatting the .ly is timed apart from engraving it, and LilyPond only runs with --engrave. A stage the baseline timed that errors
+#or is missing from the new run counts as a regression, unless the new run skipped it (--no-abjad, no --engrave).
+#usage: python benchmarkSuite.py --output after.json --compare before.json
+import argparse
+import arpeggioPool
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import chordEngine
+import enfiladeCore
+import melodySearch
+import pitchWeights
+import staffLines
+
+default_sizes = (100, 1000, 10000, 100000)
+default_seed = 1
+default_pitch_range = (-12, 31)
+default_melody_string = "g4 c' b e g d' ef b d' e g e' d' ef b2"
+#a stage regresses when it takes more than (1 + threshold) times its baseline and at least minimum_regression_seconds longer.
+default_threshold = 0.25
+minimum_regression_seconds = 0.005
+default_engrave_maximum_size = 1000
+
+#stages: each takes the outputs of the stages before it (by name) and the number of chords, and returns its own output.
+
+def generate_chords( outputs, size ):
+    low, high = default_pitch_range
+    return chordEngine.make_chord_batch( size, low, high, chordEngine.make_random_state( outputs['seed'] ) )
+
+def generate_weighted_chords( outputs, size ):
+    #the same chords' distribution through pitchWeights' alias tables (compiled outside the timing by the warm-up run).
+    low, high = default_pitch_range
+    sampler = pitchWeights.get_chord_sampler( low, high )
+    return pitchWeights.make_chord_batch( size, sampler, chordEngine.make_random_state( outputs['seed'] ) )
+
+def arpeggiate_chords( outputs, size ):
+    return [ melodySearch.make_arpeggio( x ) for x in outputs['chord_generation'] ]
+
+def search_melody( outputs, size ):
+    #the melody repeated often enough that every arpeggio is checked.
+    pitch_numbers = melodySearch.get_pitch_numbers_from_melody_string( default_melody_string ) * size
+    return list( melodySearch.search_melody( pitch_numbers, outputs['arpeggiation'] ) )
+
+def index_arpeggio_pool( outputs, size ):
+    return arpeggioPool.make_arpeggio_pool( outputs['chord_generation'] )
+
+def search_arpeggio_pool( outputs, size ):
+    #the melody at every transposition within an octave each way, all in the same pool: a bisect per melody note, no scans.
+    pitch_numbers = melodySearch.get_pitch_numbers_from_melody_string( default_melody_string )
+    return arpeggioPool.search_melodies( outputs['arpeggio_pool'], [pitch_numbers], range(-12, 13) )
+
+def place_staff_switches( outputs, size ):
+    return [ staffLines.get_staff_switches( x.pitch_numbers ) for x in outputs['arpeggiation'] ]
+
+def annotate_arpeggios( outputs, size ):
+    #every arpeggio as one pass's selection, its first note standing for the hidden melody note, with the staff's breaks and tempo.
+    selections = [ (x, x.pitch_numbers[0]) for x in outputs['arpeggiation'] ]
+    return enfiladeCore.annotate_passes( [selections] )
+
+def partition_staffs( outputs, size ):
+    chords = outputs['chord_generation']
+    split_pitch_numbers = staffLines.get_split_pitch_numbers( *default_pitch_range )
+    return staffLines.partition_pitch_numbers( list( chords ), split_pitch_numbers )
+
+def make_abjad_chords( outputs, size ):
+    enfilade = outputs['enfilade']
+    return [ enfilade.make_chord( x ) for x in outputs['chord_generation'] ]
+
+def make_abjad_arpeggio_voices( outputs, size ):
+    enfilade = outputs['enfilade']
+    return [ enfilade.make_arpeggio_voice( x ) for x in outputs['arpeggiation'] ]
+
+def make_abjad_enfilade_staff( outputs, size ):
+    #the staff as make_enfilade_staff builds it: bare voices, then the whole staff's mark plan in one walk.
+    enfilade = outputs['enfilade']
+    return enfilade.make_annotated_staff( enfilade.Voice( default_melody_string ), outputs['annotation'] )
+
+def format_ly( outputs, size ):
+    enfilade = outputs['enfilade']
+    return enfilade.make_lilypond_file( outputs['abjad_enfilade_staff'] ).lilypond_format
+
+def format_ly_fast( outputs, size ):
+    import arpeggioSerializer
+    return arpeggioSerializer.format_arpeggio_voices( outputs['annotation'], outputs['enfilade'].clef_key_command_strings )
+
+def split_berkeley_staffs( outputs, size ):
+    berkeley = outputs['berkeley']
+    return berkeley.make_score( [ berkeley.Chord( x, berkeley.Duration(1,4) ) for x in outputs['chord_generation'] ] )
+
+def engrave_ly( outputs, size ):
+    import renderCache
+    output_directory = tempfile.mkdtemp( prefix = 'enfilade_benchmark.' )
+    try:
+        return renderCache.run_lilypond( outputs['ly_format'], output_directory )
+    finally:
+        shutil.rmtree( output_directory, ignore_errors = True )
+
+core_stages = [
+    ('chord_generation', generate_chords),
+    ('weighted_chord_generation', generate_weighted_chords),
+    ('arpeggiation', arpeggiate_chords),
+    ('melody_search', search_melody),
+    ('arpeggio_pool', index_arpeggio_pool),
+    ('pool_melody_search', search_arpeggio_pool),
+    ('staff_switches', place_staff_switches),
+    ('annotation', annotate_arpeggios),
+    ('staff_partition', partition_staffs),
+    ]
+abjad_stages = [
+    ('abjad_chords', make_abjad_chords),
+    ('abjad_arpeggio_voices', make_abjad_arpeggio_voices),
+    ('abjad_enfilade_staff', make_abjad_enfilade_staff),
+    ('ly_format', format_ly),
+    ('ly_format_fast', format_ly_fast),
+    ('berkeley_split_staffs', split_berkeley_staffs),
+    ]
+
+def run_stages( stages, sizes, seed, repeat = 1, modules = None, engrave_maximum_size = None ):
+    #returns (timings, errors): timings[stage][size] is the best of repeat runs, in seconds; errors[stage] is why a stage did not run.
+    #every repeat reruns the whole pipeline for a size, so stages that attach marks always start from fresh objects.
+    if engrave_maximum_size is not None:
+        stages = stages + [ ('engraving', engrave_ly) ]
+    timings = dict( (name, { }) for name, function in stages )
+    errors = { }
+    for size in sizes:
+        for x in range(repeat):
+            outputs = {'seed': seed}
+            outputs.update( modules or { } )
+            for name, function in stages:
+                if name == 'engraving' and engrave_maximum_size < size:
+                    continue
+                if name in errors:
+                    continue
+                start_time = time.time()
+                try:
+                    outputs[name] = function( outputs, size )
+                except Exception as error:
+                    errors[name] = '%s: %s' % (type(error).__name__, error)
+                    continue
+                seconds = time.time() - start_time
+                key = str(size)
+                timings[name][key] = min( seconds, timings[name].get(key, seconds) )
+    return timings, errors
+
+def load_abjad_modules():
+    #returns (modules, error); error is set when abjad (or a script) does not import.
+    try:
+        modules = {'enfilade': enfiladeCore.load_script( 'enfilade2.13.py', 'enfilade' ), 'berkeley': enfiladeCore.load_script( 'berkeleyOne.py', 'berkeleyOne' )}
+    except Exception as error:
+        return { }, '%s: %s' % (type(error).__name__, error)
+    return modules, None
+
+def get_abjad_version():
+    try:
+        import abjad
+    except ImportError:
+        return None
+    return getattr(abjad, '__version__', None)
+
+def run_benchmarks( sizes = default_sizes, seed = default_seed, repeat = 1, abjad = True, engrave_maximum_size = None ):
+    #the abjad stages run after (and on the outputs of) the core stages.
+    stages = core_stages
+    modules = { }
+    error = None
+    if abjad:
+        modules, error = load_abjad_modules()
+        if error is None:
+            stages = core_stages + abjad_stages
+    else:
+        engrave_maximum_size = None
+    #one untimed run at the smallest size first, so first-call costs do not land on it.
+    run_stages( stages, sizes[:1], seed, 1, modules )
+    timings, errors = run_stages( stages, sizes, seed, repeat, modules, engrave_maximum_size if error is None else None )
+    if error is not None:
+        for name, function in abjad_stages:
+            errors[name] = error
+        if engrave_maximum_size is not None:
+            errors['engraving'] = error
+    #the stages this run was asked not to time, which compare_reports does not hold against it.
+    skipped_stages = [ ]
+    if not abjad:
+        skipped_stages.extend( x[0] for x in abjad_stages )
+    if engrave_maximum_size is None:
+        skipped_stages.append( 'engraving' )
+    report = {
+        'seed': seed,
+        'sizes': list(sizes),
+        'repeat': repeat,
+        'python': platform.python_version(),
+        'abjad': get_abjad_version(),
+        'engrave_maximum_size': engrave_maximum_size,
+        'skipped_stages': skipped_stages,
+        'timings': timings,
+        'errors': errors,
+        }
+    return report
+
+def get_expected_sizes( report, name ):
+    #the sizes report should have timed stage name at: none if it skipped the stage, the engraved sizes for engraving, else all of them.
+    if name in report.get('skipped_stages', [ ]):
+        return [ ]
+    if name == 'engraving' and report.get('engrave_maximum_size') is not None:
+        return [ x for x in report['sizes'] if x <= report['engrave_maximum_size'] ]
+    return report['sizes']
+
+def compare_reports( report, baseline, threshold = default_threshold ):
+    #returns (stage, size, baseline seconds, seconds, regressed) rows for every baseline timing at a size report was expected to time;
+    #seconds is None, and the row a regression, when the stage errored or did not run there.
+    rows = [ ]
+    for name in sorted(baseline['timings']):
+        timings = report['timings'].get(name, { })
+        expected_sizes = get_expected_sizes( report, name )
+        for key in sorted(baseline['timings'][name], key = int):
+            if int(key) not in expected_sizes:
+                continue
+            baseline_seconds = baseline['timings'][name][key]
+            seconds = timings.get(key)
+            if seconds is None:
+                regressed = True
+            else:
+                regressed = baseline_seconds * (1 + threshold) < seconds and minimum_regression_seconds <= seconds - baseline_seconds
+            rows.append( (name, int(key), baseline_seconds, seconds, regressed) )
+    return rows
+
+def print_report( report, output_file = sys.stderr ):
+    for name in sorted(report['timings']):
+        for key in sorted(report['timings'][name], key = int):
+            output_file.write( '%-24s %8s chords %10.4fs\n' % (name, key, report['timings'][name][key]) )
+    for name in sorted(report['errors']):
+        output_file.write( '%-24s not run: %s\n' % (name, report['errors'][name]) )
+
+def print_comparison( rows, output_file = sys.stderr ):
+    for name, size, baseline_seconds, seconds, regressed in rows:
+        if seconds is None:
+            output_file.write( '%-24s %8s chords %10.4fs -> not run  REGRESSION\n' % (name, size, baseline_seconds) )
+            continue
+        output_file.write( '%-24s %8s chords %10.4fs -> %10.4fs %+7.1f%%%s\n' % (name, size, baseline_seconds, seconds,
+            100.0 * (seconds - baseline_seconds) / baseline_seconds if baseline_seconds else 0.0, '  REGRESSION' if regressed else '') )
+
+def main( arguments = None ):
+    parser = argparse.ArgumentParser( description = 'Time each pipeline stage and compare against a baseline.' )
+    parser.add_argument( '--sizes', nargs = '+', type = int, default = list(default_sizes), help = 'numbers of chords' )
+    parser.add_argument( '--seed', type = int, default = default_seed )
+    parser.add_argument( '--repeat', type = int, default = 1, help = 'runs per size; the fastest counts' )
+    parser.add_argument( '--no-abjad', action = 'store_true', help = 'only the stages that do not need abjad' )
+    parser.add_argument( '--engrave', action = 'store_true', help = 'also time LilyPond on the formatted .ly' )
+    parser.add_argument( '--engrave-maximum-size', type = int, default = default_engrave_maximum_size )
+    parser.add_argument( '--output', default = None, help = 'JSON report path (default: standard output)' )
+    parser.add_argument( '--compare', default = None, metavar = 'BASELINE', help = 'a JSON report from an earlier run' )
+    parser.add_argument( '--threshold', type = float, default = default_threshold, help = 'allowed slowdown, as a fraction' )
+    arguments = parser.parse_args( arguments )
+    engrave_maximum_size = arguments.engrave_maximum_size if arguments.engrave else None
+    report = run_benchmarks( arguments.sizes, arguments.seed, arguments.repeat, not arguments.no_abjad, engrave_maximum_size )
+    if arguments.output is None:
+        json.dump( report, sys.stdout, indent = 2, sort_keys = True )
+        sys.stdout.write( '\n' )
+    else:
+        with open( arguments.output, 'w' ) as output_file:
+            json.dump( report, output_file, indent = 2, sort_keys = True )
+    print_report( report )
+    if arguments.compare is not None:
+        with open( arguments.compare ) as baseline_file:
+            baseline = json.load( baseline_file )
+        rows = compare_reports( report, baseline, arguments.threshold )
+        print_comparison( rows )
+        regressions = [ x for x in rows if x[4] ]
+        if regressions:
+            sys.stderr.write( '%s regressions above %.0f%%\n' % (len(regressions), 100 * arguments.threshold) )
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -3,80 +3,43 @@
 #Next, it became primarily the code that avoids ledger lines via additional staves. 1/27/13
 #Possible model: default behavior is piano staff; octave_treble = True, octave_bass = True, splits = 
 #returns "piano_staff" containing n staffs.
+#Written against the abjad 2.13 API, like enfilade2.13.py.
 from abjad import *
 from random import randint, seed, choice
+import midiWriter
+import staffLines
+import os
+import tempfile
 
 #seed the random number generator
 seed(1)
 
-#split a single voice to two staffs
-def replace_note_below_split_with_skip(note, split_pitch):
-    if split_pitch.chromatic_pitch_number > note.written_pitch.chromatic_pitch_number:
-            skiptools.replace_leaves_in_expr_with_skips(note)
+#split a single voice to n staffs
+def get_leaf_pitch_numbers( leaf ):
+    #lowest first; None for a rest (or anything else without pitches).
+    if isinstance(leaf, Chord):
+        return [ x.pitch_number for x in leaf.written_pitches ]
+    if isinstance(leaf, Note):
+        return [ leaf.written_pitch.pitch_number ]
+    return None
 
-def remove_chord_pitches_below_split(chord, split_pitch):
-    index = chord.parent.index( chord )
-    for note in reversed(chord):
-        if split_pitch.chromatic_pitch_number > note.written_pitch.chromatic_pitch_number:
-            note_index = chord.written_pitches.index( note )
-            chord.pop(note_index)
-    if 0 == len(chord.written_pitches):
-        skip = skiptools.Skip(duration)
-        chord.parent[ index:index+1 ] = skip
-        
-def replace_note_above_split_with_skip(note, split_pitch):
-    if split_pitch.chromatic_pitch_number <= note.written_pitch.chromatic_pitch_number:
-           skiptools.replace_leaves_in_expr_with_skips(note)
-
-def remove_chord_pitches_above_split(chord, split_pitch):
-    index = chord.parent.index( chord )
-    popped = 0
-    for note in reversed(chord):
-        if split_pitch.chromatic_pitch_number <= note.written_pitch.chromatic_pitch_number:
-            note_index = chord.written_pitches.index( note )
-            chord.pop(note_index)
-            popped = 1
-    if 0 == len(chord.written_pitches):
-        skip = leaftools.make_tied_leaf( Skip, chord.written_duration )
-        chord.parent[ index:index+1 ] = skip
-
-def remove_pitches_below_split_in_components(voice, split_pitch):
-    for note in iterationtools.iterate_notes_in_expr(voice.leaves):
-        replace_note_below_split_with_skip(note, split_pitch)
-    for chord in iterationtools.iterate_chords_in_expr(voice.leaves):
-        remove_chord_pitches_below_split(chord, split_pitch)
-
-def remove_pitches_above_split_in_components(voice, split_pitch):
-    for note in iterationtools.iterate_notes_in_expr(voice.leaves):
-        replace_note_above_split_with_skip(note, split_pitch)
-    for chord in iterationtools.iterate_chords_in_expr(voice.leaves):
-        remove_chord_pitches_above_split(chord, split_pitch)
+def make_staff_leaf( pitch_numbers, duration ):
+    if pitch_numbers is None:
+        return Rest( duration )
+    if 0 == len(pitch_numbers):
+        return skiptools.Skip( duration )
+    if 1 == len(pitch_numbers):
+        return Note( pitch_numbers[0], duration )
+    return Chord( pitch_numbers, duration )
 
-def split_components_to_three_staffs(components):
-    braced_staffs = scoretools.PianoStaff()
-    treble_staff = Staff()
-    treble_staff.name = "treble"
-    bass_staff = Staff()
-    bass_staff.name = "bass"
-    copies = componenttools.copy_components_and_covered_spanners( components )
-    treble_voice = Voice(copies)
-    copies = componenttools.copy_components_and_covered_spanners( components )
-    bass_voice = Voice(copies)
-    remove_pitches_below_split_in_components(treble_voice, split_pitch)
-    remove_pitches_above_split_in_components(bass_voice, split_pitch)
-    bass_staff.extend(bass_voice[:])
-    treble_staff.extend(treble_voice[:])
-    contexttools.ClefMark('bass')(bass_staff)
-    braced_staffs.extend([treble_staff,bass_staff])
-    copies = componenttools.copy_components_and_covered_spanners( [braced_staffs[0][0]] )
-    upper_treble_voice = Voice(copies)
-    remove_pitches_below_split_in_components(upper_treble_voice, split_pitch = pitchtools.NamedChromaticPitch("f'''") )
-    remove_pitches_above_split_in_components( braced_staffs[0][0], split_pitch = pitchtools.NamedChromaticPitch("f'''") )
-    third_staff = Staff([upper_treble_voice])
-    third_staff.name = "upper_treble"
-    contexttools.ClefMark("treble^8")(third_staff)
-    braced_staffs.insert(0, third_staff)
-    #piano_staff.override.stem.transparent = True
+def split_leaves_to_staffs( leaves, braced_staffs, split_pitch_numbers ):
+    #one pass over the leaves: each pitch goes to the staff its band belongs to (see staffLines.partition_pitch_numbers),
+    #the other staffs get a skip, and rests go on every staff. Containers (tuplets) are not carried over; the leaves are not copied.
+    leaves = list( leaves )
+    bands = staffLines.partition_pitch_numbers( [ get_leaf_pitch_numbers( x ) for x in leaves ], split_pitch_numbers )
+    durations = [ x.written_duration for x in leaves ]
+    for staff, band in zip(braced_staffs, bands):
+        staff.extend( [ make_staff_leaf( pitch_numbers, duration ) for pitch_numbers, duration in zip(band, durations) ] )
     return braced_staffs
 
 #layout and formatting   
@@ -118,27 +81,27 @@ def get_pitch_set_from_pitch_range_tuple( pitch_range_tuple ):
     numeric_pitch_range_tuple = (numeric_pitch_range_low, numeric_pitch_range_high)
     pitches = [ ]
     for value in range( numeric_pitch_range_tuple[0], numeric_pitch_range_tuple[1] ):
-        pitch = pitchtools.NamedChromaticPitch(value)
+        pitch = pitchtools.NamedPitch(value)
         pitches.append(pitch)
     return pitches
 
 def make_chord( bottom_pitch_number, numeric_pitch_range_high ):
     pitch_number = bottom_pitch_number
-    bottom_pitch = pitchtools.NamedChromaticPitch( pitch_number  )
+    bottom_pitch = pitchtools.NamedPitch( pitch_number  )
     bottom_interval_choices = [5, 7, 9]
     chord = Chord( [ bottom_pitch ], Duration(1,4) )
     bottom_interval_ambitus = choice(bottom_interval_choices)
     next_to_bottom_pitch = bottom_pitch + bottom_interval_ambitus
     chord.append( next_to_bottom_pitch )
     added_pitch = next_to_bottom_pitch
-    while added_pitch.chromatic_pitch_number <= int(numeric_pitch_range_high * 2/3) :
+    while added_pitch.pitch_number <= int(numeric_pitch_range_high * 2/3) :
         #pitch = choose_pitch_from_weighted_table(pitch)
         sizes = [ 3, 4 ]
         interval_size = choice(sizes)
         current_pitch = added_pitch + interval_size
         chord.append( current_pitch  )
         added_pitch = current_pitch
-    while added_pitch.chromatic_pitch_number <= int(numeric_pitch_range_high) :
+    while added_pitch.pitch_number <= int(numeric_pitch_range_high) :
         #pitch = choose_pitch_from_weighted_table(pitch)
         sizes = [ 1, 2 ]
         interval_size = choice(sizes)
@@ -148,11 +111,11 @@ def make_chord( bottom_pitch_number, numeric_pitch_range_high ):
     return chord   
 
 def make_chords(number_of_chords, pitch_range_tuple):
-    numeric_pitch_range_low = pitchtools.chromatic_pitch_name_to_chromatic_pitch_number( pitch_range_tuple[0] )
-    numeric_pitch_range_high = pitchtools.chromatic_pitch_name_to_chromatic_pitch_number( pitch_range_tuple[1] )
+    numeric_pitch_range_low = pitchtools.NamedPitch( pitch_range_tuple[0] ).pitch_number
+    numeric_pitch_range_high = pitchtools.NamedPitch( pitch_range_tuple[1] ).pitch_number
     chords = [ ]
     for x in range(number_of_chords):
-        distance_from_range_low = choose_distance_from_range_low( pitchtools.HarmonicChromaticInterval(7) )
+        distance_from_range_low = choose_distance_from_range_low( pitchtools.NumberedInterval(7) )
         bottom_pitch_number = numeric_pitch_range_low + distance_from_range_low
         chord = make_chord( bottom_pitch_number, numeric_pitch_range_high )
         chords.append(chord)
@@ -180,7 +143,7 @@ def make_braced_staffs():
 
 def place_rest_on_staffs(component, braced_staffs):
     for staff in braced_staffs:
-        copy = componenttools.copy_components_and_covered_spanners( component )
+        copy = mutate( component ).copy()
         staff.append( copy )
 
 def place_note_on_staffs( component, braced_staffs ):
@@ -203,13 +166,16 @@ def place_note_on_staffs( component, braced_staffs ):
 def add_voice_to_braced_staffs( voice, braced_staffs ):
  #   #treat this like an fft -- go through the components of the voice and put them on four (assume four) staffs, according to range boundaries; rests just go on all staffs.
     for staff in braced_staffs:
-        copies = componenttools.copy_components_and_covered_spanners( [voice] )
-        staff.extend(copies)
+        staff.append( mutate( voice ).copy() )
      #   filter_staff_by_clef(staff)
 
 
 def get_range_bounds( voice ):
-    pitch_numbers = [ x.written_pitch.chromatic_pitch_number for x in iterationtools.iterate_components_and_grace_containers_in_expr( voice.leaves, (Note, Chord) ) ]
+    pitch_numbers = [ ]
+    for leaf in voice.select_leaves():
+        leaf_pitch_numbers = get_leaf_pitch_numbers( leaf )
+        if leaf_pitch_numbers is not None:
+            pitch_numbers.extend( leaf_pitch_numbers )
     low = min(pitch_numbers)
     high = max(pitch_numbers)
     return (low, high)
@@ -223,12 +189,12 @@ def make_staffs_from_range_bounds( voice ):
     contexttools.ClefMark('bass')(bass_staff)
     braced_staffs.extend([treble_staff,bass_staff])
     range_tuple = get_range_bounds( voice )
-    if 29 < range_tuple[1]:
+    if staffLines.upper_treble_split_pitch_number < range_tuple[1]:
         upper_staff = Staff()
         upper_staff.name = "upper_treble"
         contexttools.ClefMark("treble^8")(upper_staff)
         braced_staffs.insert(0, upper_staff)
-    if -27 > range_tuple[0]:
+    if staffLines.lower_bass_split_pitch_number > range_tuple[0]:
         lower_staff = Staff()
         lower_staff.name = "lower_bass"
         contexttools.ClefMark("bass_8")(lower_staff)
@@ -240,7 +206,8 @@ def make_staffs_from_range_bounds( voice ):
 def voice_to_staffs_to_reduce_ledger_lines( voice ):
     braced_staffs = make_staffs_from_range_bounds( voice )
     #add_voice_to_braced_staffs( voice, braced_staffs )
-    split_components_to_three_staffs(voice[:])
+    split_pitch_numbers = staffLines.get_split_pitch_numbers( *get_range_bounds( voice ) )
+    split_leaves_to_staffs( voice.select_leaves(), braced_staffs, split_pitch_numbers )
     return braced_staffs
     
 
@@ -261,12 +228,18 @@ def make_chord_chart(number_of_chords, pitch_range_tuple):
     chords = make_chords(number_of_chords, pitch_range_tuple)
     lilypond_file = make_lilypond_file(chords)
     show(lilypond_file)
-    play(lilypond_file)
+    notes, stop = midiWriter.make_chord_notes( get_chord_pitch_numbers( chords ) )
+    play_notes( notes, 'berkeley_chord_chart.mid' )
 
-0123456
-0213243546
+def get_chord_pitch_numbers( leaves ):
+    #a list of pitch numbers per chord or note in leaves (one for a note), lowest first, for midiWriter.
+    return [ get_leaf_pitch_numbers( leaf ) for leaf in leaves ]
 
-0213
+def play_notes( notes, file_name ):
+    #writes MIDI straight from the notes (no LilyPond run) and plays it.
+    file_path = os.path.join( tempfile.gettempdir(), file_name )
+    midiWriter.write_midi_file( file_path, notes, [ (0, 48) ] )
+    midiWriter.play( file_path )
 
 def arpeggiate_chord( chord ):
     notes = [ ]
@@ -290,9 +263,10 @@ def arpeggiate_chords( chords ):
 def arpeggiate_chord_chart(number_of_chords, pitch_range_tuple):
     chords = make_chords(number_of_chords, pitch_range_tuple)
     arpeggios = arpeggiate_chords( chords )
-    arpeggios = sequencetools.flatten_sequence( arpeggios )
-    lilypond_file = make_lilypond_file( arpeggios )
+    lilypond_file = make_lilypond_file( sequencetools.flatten_sequence( arpeggios ) )
     show(lilypond_file)
-    play(lilypond_file)
+    notes, stop = midiWriter.make_arpeggio_notes( [ sum( get_chord_pitch_numbers( arpeggio ), [ ] ) for arpeggio in arpeggios ] )
+    play_notes( notes, 'berkeley_arpeggio_chart.mid' )
 
-arpeggiate_chord_chart(20, ("c", "c''''") )
\ No newline at end of file
+if __name__ == '__main__':
+    arpeggiate_chord_chart(20, ("c", "c''''") )
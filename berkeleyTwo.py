@@ -5,9 +5,15 @@
 #returns "piano_staff" containing n staffs.
 from abjad import *
 from random import randint, seed, choice
+import enfiladePasses
+import staffLines
 
-#seed the random number generator
-seed(1)
+#seed the random number generator; make_enfilade spawns one stream per pass from random_seed.
+random_seed = 1
+seed(random_seed)
+
+#nth_time: [transposition of the hidden melody, dynamic of the arpeggios, dynamic of the hidden melody notes]
+nth_time_dictionary = {0: [24, 'ppp', 'mf'], 1: [12, 'p', 'f'], 2: [0, 'mf', 'ff'], 3: [12, 'p', 'f'], 4: [24, 'ppp', 'mf']}
 
 #layout and formatting - global 
     
@@ -96,12 +102,10 @@ def format_melody(melody):
 #staff and clef moving:
 
 def add_staff_switches_to_voice( voice ):
-    move_staff_lines_at_leaf(voice[0], 1)
     notes = list( iterationtools.iterate_notes_in_expr( voice ) )
-    treble_notes = [x for x in notes if x.sounding_pitch.chromatic_pitch_number < 24 and x.sounding_pitch.chromatic_pitch_number >= -1]
-    move_staff_lines_at_leaf(treble_notes[0], 2)
-    bass_notes = [x for x in notes if x.sounding_pitch.chromatic_pitch_number < 0]
-    move_staff_lines_at_leaf(bass_notes[0], 3)
+    pitch_numbers = [ x.sounding_pitch.chromatic_pitch_number for x in notes ]
+    for index, clef_key in staffLines.get_staff_switches( pitch_numbers ):
+        move_staff_lines_at_leaf(notes[index], clef_key)
 
 def format_voice( voice ):
     contexttools.TimeSignatureMark((1,16))( voice[0] )
@@ -152,9 +156,13 @@ def make_chord( bottom_pitch_number, numeric_pitch_range_high ):
         added_pitch = current_pitch
     return chord   
 
-def make_chords(number_of_chords, pitch_range_tuple):
+def get_numeric_pitch_range( pitch_range_tuple ):
     numeric_pitch_range_low = pitchtools.chromatic_pitch_name_to_chromatic_pitch_number( pitch_range_tuple[0] )
     numeric_pitch_range_high = pitchtools.chromatic_pitch_name_to_chromatic_pitch_number( pitch_range_tuple[1] )
+    return (numeric_pitch_range_low, numeric_pitch_range_high)
+
+def make_chords(number_of_chords, pitch_range_tuple):
+    numeric_pitch_range_low, numeric_pitch_range_high = get_numeric_pitch_range( pitch_range_tuple )
     chords = [ ]
     for x in range(number_of_chords):
         distance_from_range_low = choose_distance_from_range_low( pitchtools.HarmonicChromaticInterval(7) )
@@ -196,31 +204,16 @@ def make_chord_chart(number_of_chords, pitch_range_tuple):
     show(lilypond_file)
     play(lilypond_file)
 
-def arpeggiate_chord( chord ):
+def make_arpeggio_voice( arpeggio ):
+    #builds the voice for a melodySearch.Arpeggio selected by the melody search.
     notes = [ ]
-    pitches = chord.written_pitches
-    ordered_pitches = [ ]
-    for pitch in pitches:
-        ordered_pitches.append( pitch )
-    ordered_pitches.reverse()
-    for pitch in ordered_pitches:
-        note = Note(pitch, Duration(1,16))
+    for pitch_number in arpeggio.pitch_numbers:
+        note = Note(pitch_number, Duration(1,16))
         notes.append( note )
     voice = Voice(notes)
     format_voice(voice)
     return voice
 
-def color_pitch( arpeggio, pitch):
-    for note in iterationtools.iterate_notes_in_expr(arpeggio):
-        if pitch == note.sounding_pitch:
-            note.override.note_head.color = "red"
-        
-
-def contains_pitch( pitch_to_find, arpeggio ):
-    pitches = set(pitchtools.list_named_chromatic_pitches_in_expr(arpeggio))
-    if pitches.issuperset([ pitch_to_find ] ):
-        return True
-        
 def format_subsequent_pitch( arpeggio, note, hidden_melody_tuple ):
     melody_note_dynamic = hidden_melody_tuple[1]
     original_dynamic = hidden_melody_tuple[0]
@@ -229,53 +222,47 @@ def format_subsequent_pitch( arpeggio, note, hidden_melody_tuple ):
     index_of_the_note_after_that = note.parent.index(note)
     if index_of_the_note_after_that < len( arpeggio ) - 1:
         note_after_that = componenttools.get_nth_sibling_from_component(note, 1)
-        print note_after_that
         contexttools.DynamicMark(original_dynamic)(note_after_that)
 
-def emphasize_pitch( arpeggio, pitch_to_check, hidden_melody_tuple):
-    for note in iterationtools.iterate_notes_in_expr(arpeggio):
-        if pitch_to_check == note.sounding_pitch:
-            format_subsequent_pitch( arpeggio, note, hidden_melody_tuple )
-    
-def find_melody_in_arpeggios( melody, arpeggio_voices, nth_time ):
-    nth_time_dictionary = {0: [24, 'ppp', 'mf'], 1: [12, 'p', 'f'], 2: [0, 'mf', 'ff'], 3: [12, 'p', 'f'], 4: [24, 'ppp', 'mf']}
-    hidden_melody_tuple = nth_time_dictionary[nth_time]
-    hidden_melody_transposition = hidden_melody_tuple[0]
-    hidden_melody_tuple = hidden_melody_tuple[1:]
+def emphasize_pitch( arpeggio, voice, pitch_number_to_check, hidden_melody_tuple):
+    #voice: make_arpeggio_voice( arpeggio ), whose notes are in the same order as arpeggio.pitch_numbers.
+    for x, pitch_number in enumerate( arpeggio.pitch_numbers ):
+        if pitch_number_to_check == pitch_number:
+            format_subsequent_pitch( voice, voice[x], hidden_melody_tuple )
+
+def get_hidden_melody_pitch_numbers( melody, nth_time ):
+    hidden_melody_transposition = nth_time_dictionary[nth_time][0]
+    pitch_numbers = [ x.sounding_pitch.chromatic_pitch_number + hidden_melody_transposition for x in iterationtools.iterate_notes_in_expr( melody )]
+    return pitch_numbers
+
+def make_selected_voices( selections, nth_time ):
+    #selections: the (arpeggio, pitch_number) pairs chosen by the melody search.
+    hidden_melody_tuple = nth_time_dictionary[nth_time][1:]
     selected_arpeggios = [ ]
-    pitches = [ x.sounding_pitch for x in iterationtools.iterate_notes_in_expr( melody )]
-    pitch_index = 0
-    for arpeggio in arpeggio_voices:
-        if pitch_index == len(pitches):
-            break
-        pitch_to_check = pitches[ pitch_index] + hidden_melody_transposition
-        if contains_pitch( pitch_to_check, arpeggio):
-            contexttools.DynamicMark(hidden_melody_tuple[0])(arpeggio[0])
-            selected_arpeggios.append( arpeggio )
-            #color_pitch( arpeggio, pitch_to_check)
-            emphasize_pitch( arpeggio, pitch_to_check, hidden_melody_tuple)
-            pitch_index += 1
+    for arpeggio, pitch_number_to_check in selections:
+        voice = make_arpeggio_voice( arpeggio )
+        contexttools.DynamicMark(hidden_melody_tuple[0])(voice[0])
+        selected_arpeggios.append( voice )
+        emphasize_pitch( arpeggio, voice, pitch_number_to_check, hidden_melody_tuple)
     return selected_arpeggios
         
-def arpeggiate_chords( chords ):
-    arpeggio_voices = [ ]
-    for chord in chords:
-        arpeggio_voice = arpeggiate_chord( chord )
-        arpeggio_voices.append( arpeggio_voice )
-    return arpeggio_voices
-
-def make_enfilade(melody, pitch_range_tuple):
+def make_enfilade(melody, pitch_range_tuple, sampling = 'rejection', processes = None, seed = None):
+    #the five passes are searched in a process pool (see enfiladePasses.search_passes); voices are built here, in pass order.
     format_melody( melody )
     staff = Staff([melody])
-    for x in range(5):
-        nth_time = x
-        chords = make_chords(100, pitch_range_tuple)
-        arpeggio_voices = arpeggiate_chords( chords )
-        selected_voices = find_melody_in_arpeggios( melody, arpeggio_voices, nth_time )
+    numeric_pitch_range_low, numeric_pitch_range_high = get_numeric_pitch_range( pitch_range_tuple )
+    hidden_melodies = [ get_hidden_melody_pitch_numbers( melody, nth_time ) for nth_time in range(5) ]
+    if seed is None:
+        seed = random_seed
+    passes = enfiladePasses.search_passes( hidden_melodies, numeric_pitch_range_low, numeric_pitch_range_high, seed, sampling, processes )
+    for nth_time, selections in enumerate(passes):
+        selected_voices = make_selected_voices( selections, nth_time )
         staff.extend(selected_voices)
     format_staff(staff)
     lilypond_file = make_lilypond_file( staff )
     show(lilypond_file)
 
-melody = Voice("g4 c' b e g d' ef b d' e g e' d' ef b2")
-make_enfilade( melody, ("c", "c''''") )
\ No newline at end of file
+#the passes run in worker processes, which re-import this file on some platforms.
+if __name__ == '__main__':
+    melody = Voice("g4 c' b e g d' ef b d' e g e' d' ef b2")
+    make_enfilade( melody, ("c", "c''''") )
\ No newline at end of file
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+#Vectorized chord generation for the enfilade scripts; works on plain pitch numbers (c' = 0, as in abjad) and does not import abjad.
+#A batch of chords is a padded array of pitch numbers, lowest pitch first, plus the number of pitches in each chord.
+#The rules are the ones make_chord used:
+#1. the bottom pitch is 0-7 semitones (a perfect fifth) above the bottom of the range;
+#2. the bottom interval is 5, 7, or 9 semitones;
+#3. 3 or 4 semitone steps are added until a pitch lies above 2/3 of the top of the range;
+#4. 1 or 2 semitone steps are added until a pitch lies above the top of the range.
+import numpy
+
+bottom_distance_width = 7
+bottom_interval_choices = (5, 7, 9)
+lower_step_choices = (3, 4)
+upper_step_choices = (1, 2)
+
+def make_random_state( seed = None ):
+    #returns the numpy random state every function in this module draws from; RandomState (not default_rng) so the scripts still run
+    #on the numpy of Python 2, which abjad 2.13 needs. seed: as RandomState takes it.
+    return numpy.random.RandomState( seed )
+
+def get_lower_step_ceiling( numeric_pitch_range_high ):
+    #the pitch number above which make_chord switches from 3/4 steps to 1/2 steps.
+    return int(numeric_pitch_range_high * 2 / 3)
+
+class ChordBatch(object):
+    #a batch of chords: pitch_numbers is an (n, width) array, padded with zeros past each chord's length.
+    __slots__ = ('pitch_numbers', 'lengths')
+
+    def __init__(self, pitch_numbers, lengths):
+        self.pitch_numbers = pitch_numbers
+        self.lengths = lengths
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.get_pitch_numbers(index)
+
+    def get_pitch_numbers(self, index):
+        #returns the pitch numbers of one chord as a list of ints, lowest first.
+        return self.pitch_numbers[index, :self.lengths[index]].tolist()
+
+def add_steps_until_above( starts, step_choices, ceiling, random_state ):
+    #vectorized form of make_chord's while loops: from each start, adds steps drawn from step_choices while the last pitch is <= ceiling.
+    #returns the added pitches as an (n, width) array and the number of valid columns in each row.
+    lowest_start = starts.min() if len(starts) else ceiling + 1
+    if lowest_start > ceiling:
+        return numpy.zeros((len(starts), 0), dtype = starts.dtype), numpy.zeros(len(starts), dtype = numpy.intp)
+    width = (ceiling - lowest_start) // min(step_choices) + 1
+    steps = random_state.choice(step_choices, size = (len(starts), width)).astype(starts.dtype)
+    positions = (starts[:, None] + numpy.cumsum(steps, axis = 1)).astype(starts.dtype)
+    #the loop runs once more than the number of added pitches still at or below the ceiling, and not at all if the start is above it.
+    counts = numpy.where(starts <= ceiling, (positions <= ceiling).sum(axis = 1) + 1, 0)
+    return positions, counts
+
+def get_last_added_pitches( starts, positions, counts ):
+    rows = numpy.arange(len(starts))
+    last_columns = numpy.maximum(counts - 1, 0)
+    if positions.shape[1] == 0:
+        return starts.copy()
+    return numpy.where(counts > 0, positions[rows, last_columns], starts)
+
+def pack_chord_columns( columns_and_counts ):
+    #concatenates variable-length column blocks row by row, so each chord's pitches are contiguous and left-aligned.
+    blocks = [ ]
+    valid_blocks = [ ]
+    for positions, counts in columns_and_counts:
+        blocks.append(positions)
+        valid_blocks.append(numpy.arange(positions.shape[1])[None, :] < counts[:, None])
+    candidates = numpy.concatenate(blocks, axis = 1)
+    valid = numpy.concatenate(valid_blocks, axis = 1)
+    order = numpy.argsort(~valid, axis = 1, kind = 'stable')
+    lengths = valid.sum(axis = 1)
+    width = lengths.max() if len(lengths) else 0
+    pitch_numbers = numpy.take_along_axis(candidates, order, axis = 1)[:, :width]
+    pitch_numbers[numpy.arange(width)[None, :] >= lengths[:, None]] = 0
+    return pitch_numbers, lengths
+
+def make_chord_batch( number_of_chords, numeric_pitch_range_low, numeric_pitch_range_high, random_state ):
+    #makes number_of_chords chords at once, with the same distribution as calling make_chord in a loop.
+    ones = numpy.ones(number_of_chords, dtype = numpy.intp)
+    bottom_pitch_numbers = numeric_pitch_range_low + random_state.randint(0, bottom_distance_width + 1, size = number_of_chords)
+    bottom_pitch_numbers = bottom_pitch_numbers.astype(numpy.int16)
+    bottom_intervals = random_state.choice(bottom_interval_choices, size = number_of_chords)
+    next_to_bottom_pitch_numbers = (bottom_pitch_numbers + bottom_intervals).astype(numpy.int16)
+    lower_positions, lower_counts = add_steps_until_above(
+        next_to_bottom_pitch_numbers, lower_step_choices, get_lower_step_ceiling( numeric_pitch_range_high ), random_state )
+    lower_tops = get_last_added_pitches( next_to_bottom_pitch_numbers, lower_positions, lower_counts )
+    upper_positions, upper_counts = add_steps_until_above(
+        lower_tops, upper_step_choices, int(numeric_pitch_range_high), random_state )
+    pitch_numbers, lengths = pack_chord_columns([
+        (bottom_pitch_numbers[:, None], ones),
+        (next_to_bottom_pitch_numbers[:, None], ones),
+        (lower_positions, lower_counts),
+        (upper_positions, upper_counts),
+        ])
+    return ChordBatch(pitch_numbers, lengths)
+
+#conditioned sampling: chords drawn only from those that contain a target pitch.
+#Pitches only go up, so a chord's walk is a Markov chain on the pitch it last added. hit_probabilities[x] is the chance
+#that the walk, having just added x, goes on to add the target; weighting each choice by the hit probability of where it leads
+#draws exactly the chords rejection sampling would keep, with the same probabilities.
+
+def get_step_choices( pitch_number, numeric_pitch_range_high ):
+    #the steps make_chord can add after pitch_number, or an empty tuple if the chord is finished.
+    if pitch_number <= get_lower_step_ceiling( numeric_pitch_range_high ):
+        return lower_step_choices
+    if pitch_number <= int(numeric_pitch_range_high):
+        return upper_step_choices
+    return ()
+
+def get_hit_probabilities( target_pitch_number, numeric_pitch_range_low, numeric_pitch_range_high ):
+    #returns an array indexed by pitch_number - numeric_pitch_range_low, zero above the target.
+    padding = max(bottom_interval_choices)
+    hit_probabilities = numpy.zeros(max(target_pitch_number - numeric_pitch_range_low, -1) + 1 + padding)
+    if target_pitch_number < numeric_pitch_range_low:
+        return hit_probabilities
+    hit_probabilities[target_pitch_number - numeric_pitch_range_low] = 1.0
+    for pitch_number in range(target_pitch_number - 1, numeric_pitch_range_low - 1, -1):
+        step_choices = get_step_choices( pitch_number, numeric_pitch_range_high )
+        if step_choices:
+            index = pitch_number - numeric_pitch_range_low
+            hit_probabilities[index] = numpy.mean([hit_probabilities[index + step] for step in step_choices])
+    return hit_probabilities
+
+def get_bottom_hit_probabilities( target_pitch_number, numeric_pitch_range_low, numeric_pitch_range_high ):
+    #the chance of a chord containing the target given each possible bottom pitch, lowest bottom first.
+    hit_probabilities = get_hit_probabilities( target_pitch_number, numeric_pitch_range_low, numeric_pitch_range_high )
+    bottom_hit_probabilities = numpy.zeros(bottom_distance_width + 1)
+    for distance in range(bottom_distance_width + 1):
+        if distance == target_pitch_number - numeric_pitch_range_low:
+            bottom_hit_probabilities[distance] = 1.0
+        elif distance < len(hit_probabilities) - max(bottom_interval_choices):
+            bottom_hit_probabilities[distance] = numpy.mean([hit_probabilities[distance + interval] for interval in bottom_interval_choices])
+    return bottom_hit_probabilities
+
+def get_pitch_probability( target_pitch_number, numeric_pitch_range_low, numeric_pitch_range_high ):
+    #the probability that a chord from make_chord_batch contains the target pitch.
+    return get_bottom_hit_probabilities( target_pitch_number, numeric_pitch_range_low, numeric_pitch_range_high ).mean()
+
+def choose_weighted_columns( weights, random_state ):
+    #draws one column per row of weights, with probability proportional to the row's weights.
+    cumulative_weights = numpy.cumsum(weights, axis = 1)
+    draws = random_state.random_sample(len(weights)) * cumulative_weights[:, -1]
+    columns = (cumulative_weights <= draws[:, None]).sum(axis = 1)
+    return numpy.minimum(columns, weights.shape[1] - 1)
+
+def make_conditioned_chord_batch( target_pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high, random_state ):
+    #makes one chord per target pitch number, each drawn from make_chord's distribution conditioned on containing its target.
+    #raises ValueError for a target that no chord in the range can contain.
+    target_pitch_numbers = numpy.asarray(target_pitch_numbers, dtype = numpy.int16)
+    number_of_chords = len(target_pitch_numbers)
+    distinct_targets, target_rows = numpy.unique(target_pitch_numbers, return_inverse = True)
+    tables = [ get_hit_probabilities( int(x), numeric_pitch_range_low, numeric_pitch_range_high ) for x in distinct_targets ]
+    table_width = max([ len(x) for x in tables ] + [1])
+    hit_table = numpy.zeros((len(tables), table_width + 1))
+    for row, table in enumerate(tables):
+        hit_table[row, :len(table)] = table
+    bottom_table = numpy.array([ get_bottom_hit_probabilities( int(x), numeric_pitch_range_low, numeric_pitch_range_high ) for x in distinct_targets ])
+    unreachable = bottom_table.sum(axis = 1) == 0
+    if unreachable.any():
+        raise ValueError('no chord in this range contains pitch number %s.' % distinct_targets[unreachable][0])
+
+    def get_weights( pitch_numbers, steps ):
+        #hit probabilities of pitch_numbers + each step; once a chord has its target, every continuation is equally welcome.
+        next_pitch_numbers = pitch_numbers[:, None] + numpy.asarray(steps)[None, :]
+        indices = numpy.clip(next_pitch_numbers - numeric_pitch_range_low, 0, table_width)
+        weights = hit_table[target_rows[:, None], indices]
+        already_hit = pitch_numbers >= target_pitch_numbers
+        weights[already_hit] = 1.0
+        return weights
+
+    distances = choose_weighted_columns( bottom_table[target_rows], random_state )
+    current_pitch_numbers = (numeric_pitch_range_low + distances).astype(numpy.int16)
+    columns = [ current_pitch_numbers ]
+    interval_columns = choose_weighted_columns( get_weights( current_pitch_numbers, bottom_interval_choices ), random_state )
+    current_pitch_numbers = (current_pitch_numbers + numpy.asarray(bottom_interval_choices)[interval_columns]).astype(numpy.int16)
+    columns.append(current_pitch_numbers)
+    lengths = numpy.full(number_of_chords, 2, dtype = numpy.intp)
+    lower_step_ceiling = get_lower_step_ceiling( numeric_pitch_range_high )
+    while True:
+        active = current_pitch_numbers <= int(numeric_pitch_range_high)
+        if not active.any():
+            break
+        in_lower_steps = current_pitch_numbers <= lower_step_ceiling
+        lower_weights = get_weights( current_pitch_numbers, lower_step_choices )
+        upper_weights = get_weights( current_pitch_numbers, upper_step_choices )
+        step_columns = choose_weighted_columns( numpy.where(in_lower_steps[:, None], lower_weights, upper_weights), random_state )
+        steps = numpy.where(in_lower_steps, numpy.asarray(lower_step_choices)[step_columns], numpy.asarray(upper_step_choices)[step_columns])
+        current_pitch_numbers = numpy.where(active, current_pitch_numbers + steps, current_pitch_numbers).astype(numpy.int16)
+        columns.append(numpy.where(active, current_pitch_numbers, 0).astype(numpy.int16))
+        lengths += active
+    pitch_numbers = numpy.stack(columns, axis = 1)
+    return ChordBatch(pitch_numbers, lengths)
+
+def iterate_chords( numeric_pitch_range_low, numeric_pitch_range_high, random_state, chunk_size = 16 ):
+    #an endless stream of chords as lists of pitch numbers; batches of chunk_size are only made when the previous one runs out.
+    while True:
+        chords = make_chord_batch( chunk_size, numeric_pitch_range_low, numeric_pitch_range_high, random_state )
+        for pitch_numbers in chords:
+            yield pitch_numbers
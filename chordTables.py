@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+#Every chord chordEngine's rules can make in a range, with its exact probability; does not import abjad.
+#A chord is fixed by its pitches (they only go up), so the table lists each reachable chord once. Tables are cached in memory and on disk.
+#With a table, drawing a chord is one lookup in the cumulative probabilities, "does a chord contain p" has an exact answer,
+#and the number of chords a melody pass will need can be predicted before anything is generated.
+import hashlib
+import os
+import numpy
+import chordEngine
+
+default_cache_directory = os.path.join(os.path.expanduser('~'), '.cache', 'enfilade', 'chord_tables')
+#enumeration stops with ValueError past this many chords (a range several octaves wider than the carillon's).
+maximum_number_of_chords = 20000000
+
+chord_tables = { }
+
+class ChordTable(object):
+    #chords: a chordEngine.ChordBatch of every reachable chord; probabilities: the chance make_chord_batch makes each one.
+    __slots__ = ('chords', 'probabilities', 'cumulative_probabilities', 'numeric_pitch_range_low', 'numeric_pitch_range_high')
+
+    def __init__(self, chords, probabilities, numeric_pitch_range_low, numeric_pitch_range_high):
+        self.chords = chords
+        self.probabilities = probabilities
+        self.cumulative_probabilities = numpy.cumsum(probabilities)
+        self.numeric_pitch_range_low = numeric_pitch_range_low
+        self.numeric_pitch_range_high = numeric_pitch_range_high
+
+    def __len__(self):
+        return len(self.chords)
+
+def branch_chords( pitch_numbers, lengths, probabilities, finished, step_groups ):
+    #keeps the finished rows and adds one row per (row, step) of each (steps, rows) group, with its share of the row's probability.
+    number_of_rows = len(finished) + sum( len(rows) * len(steps) for steps, rows in step_groups )
+    if number_of_rows > maximum_number_of_chords:
+        raise ValueError('more than %s chords in this range.' % maximum_number_of_chords)
+    next_pitch_numbers = numpy.zeros((number_of_rows, pitch_numbers.shape[1] + 1), dtype = numpy.int16)
+    next_lengths = numpy.empty(number_of_rows, dtype = numpy.intp)
+    next_probabilities = numpy.empty(number_of_rows)
+    next_pitch_numbers[:len(finished), :-1] = pitch_numbers[finished]
+    next_lengths[:len(finished)] = lengths[finished]
+    next_probabilities[:len(finished)] = probabilities[finished]
+    start = len(finished)
+    for steps, rows in step_groups:
+        last_pitch_numbers = pitch_numbers[rows, lengths[rows] - 1]
+        for step in steps:
+            stop = start + len(rows)
+            next_pitch_numbers[start:stop, :-1] = pitch_numbers[rows]
+            next_pitch_numbers[numpy.arange(start, stop), lengths[rows]] = last_pitch_numbers + step
+            next_lengths[start:stop] = lengths[rows] + 1
+            next_probabilities[start:stop] = probabilities[rows] / len(steps)
+            start = stop
+    return next_pitch_numbers, next_lengths, next_probabilities
+
+def enumerate_chords( numeric_pitch_range_low, numeric_pitch_range_high ):
+    #grows every chord one pitch at a time, branching on each choice make_chord_batch draws, until no chord can add a pitch.
+    number_of_bottoms = chordEngine.bottom_distance_width + 1
+    pitch_numbers = (numeric_pitch_range_low + numpy.arange(number_of_bottoms))[:, None].astype(numpy.int16)
+    lengths = numpy.ones(number_of_bottoms, dtype = numpy.intp)
+    probabilities = numpy.full(number_of_bottoms, 1.0 / number_of_bottoms)
+    no_rows = numpy.zeros(0, dtype = numpy.intp)
+    #the bottom interval is always added; after it, the last pitch decides the steps, as in chordEngine.get_step_choices.
+    pitch_numbers, lengths, probabilities = branch_chords( pitch_numbers, lengths, probabilities, no_rows,
+        [ (chordEngine.bottom_interval_choices, numpy.arange(number_of_bottoms)) ] )
+    lower_step_ceiling = chordEngine.get_lower_step_ceiling( numeric_pitch_range_high )
+    while True:
+        last_pitch_numbers = pitch_numbers[numpy.arange(len(lengths)), lengths - 1]
+        active = last_pitch_numbers <= int(numeric_pitch_range_high)
+        if not active.any():
+            break
+        in_lower_steps = last_pitch_numbers <= lower_step_ceiling
+        pitch_numbers, lengths, probabilities = branch_chords( pitch_numbers, lengths, probabilities, numpy.flatnonzero(~active), [
+            (chordEngine.lower_step_choices, numpy.flatnonzero(active & in_lower_steps)),
+            (chordEngine.upper_step_choices, numpy.flatnonzero(active & ~in_lower_steps)),
+            ] )
+    return ChordTable( chordEngine.ChordBatch(pitch_numbers, lengths), probabilities, numeric_pitch_range_low, numeric_pitch_range_high )
+
+def get_cache_file_path( numeric_pitch_range_low, numeric_pitch_range_high, cache_directory = default_cache_directory ):
+    #the rules are part of the name, so changing them in chordEngine never reads an old table.
+    rules = repr( (chordEngine.bottom_distance_width, chordEngine.bottom_interval_choices, chordEngine.lower_step_choices,
+        chordEngine.upper_step_choices, chordEngine.get_lower_step_ceiling( numeric_pitch_range_high )) )
+    rules_key = hashlib.sha256( rules.encode('utf-8') ).hexdigest()[:12]
+    return os.path.join(cache_directory, 'chords_%s_%s_%s.npz' % (numeric_pitch_range_low, numeric_pitch_range_high, rules_key))
+
+def get_chord_table( numeric_pitch_range_low, numeric_pitch_range_high, cache_directory = default_cache_directory ):
+    #the table of a range: from memory, else from cache_directory, else enumerated (and saved there). cache_directory None: memory only.
+    key = (numeric_pitch_range_low, numeric_pitch_range_high)
+    if key in chord_tables:
+        return chord_tables[key]
+    cache_file_path = None
+    if cache_directory is not None:
+        cache_file_path = get_cache_file_path( numeric_pitch_range_low, numeric_pitch_range_high, cache_directory )
+    if cache_file_path is not None and os.path.isfile(cache_file_path):
+        with numpy.load(cache_file_path) as arrays:
+            table = ChordTable( chordEngine.ChordBatch(arrays['pitch_numbers'], arrays['lengths']), arrays['probabilities'],
+                numeric_pitch_range_low, numeric_pitch_range_high )
+    else:
+        table = enumerate_chords( numeric_pitch_range_low, numeric_pitch_range_high )
+        if cache_file_path is not None:
+            if not os.path.isdir(cache_directory):
+                os.makedirs(cache_directory)
+            #written under a temporary name and renamed, so a reader never sees half a file.
+            temporary_file_path = cache_file_path + '.%s.tmp.npz' % os.getpid()
+            numpy.savez( temporary_file_path, pitch_numbers = table.chords.pitch_numbers, lengths = table.chords.lengths,
+                probabilities = table.probabilities )
+            os.rename(temporary_file_path, cache_file_path)
+    chord_tables[key] = table
+    return table
+
+def make_chord_batch( number_of_chords, table, random_state ):
+    #draws number_of_chords chords from a ChordTable: one lookup in the cumulative probabilities per chord.
+    draws = random_state.random_sample(number_of_chords) * table.cumulative_probabilities[-1]
+    rows = numpy.minimum( numpy.searchsorted(table.cumulative_probabilities, draws, side = 'right'), len(table) - 1 )
+    return chordEngine.ChordBatch(table.chords.pitch_numbers[rows], table.chords.lengths[rows])
+
+def iterate_chords( table, random_state, chunk_size = 16 ):
+    #chordEngine.iterate_chords, drawing from a ChordTable.
+    while True:
+        for pitch_numbers in make_chord_batch( chunk_size, table, random_state ):
+            yield pitch_numbers
+
+def get_pitch_probabilities( table ):
+    #{pitch number: the exact probability that a chord contains it}, for every pitch some chord contains.
+    chords = table.chords
+    valid = numpy.arange(chords.pitch_numbers.shape[1])[None, :] < chords.lengths[:, None]
+    row_probabilities = numpy.broadcast_to(table.probabilities[:, None], valid.shape)
+    pitch_numbers = chords.pitch_numbers[valid].astype(numpy.intp)
+    lowest_pitch_number = pitch_numbers.min()
+    totals = numpy.bincount(pitch_numbers - lowest_pitch_number, weights = row_probabilities[valid])
+    return dict( (int(x) + lowest_pitch_number, float(total)) for x, total in enumerate(totals) if total > 0 )
+
+def get_expected_number_of_chords( pitch_numbers, table ):
+    #the expected number of chords a rejection-sampled pass pulls to embed pitch_numbers: each pitch waits a geometric number of chords.
+    #infinite when a pitch is in no chord (enfiladePasses stops the pass there instead).
+    pitch_probabilities = get_pitch_probabilities( table )
+    expected_number_of_chords = 0.0
+    for pitch_number in pitch_numbers:
+        if pitch_number not in pitch_probabilities:
+            return float('inf')
+        expected_number_of_chords += 1.0 / pitch_probabilities[pitch_number]
+    return expected_number_of_chords
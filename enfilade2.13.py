@@ -4,62 +4,74 @@
 #Possible model: default behavior is piano staff; octave_treble = True, octave_bass = True, splits = 
 #returns "piano_staff" containing n staffs.
 from abjad import *
-from random import randint, seed, choice
+import argparse
+import arpeggioSerializer
+import batchRender
+import difflib
+import enfiladeCore
+import midiWriter
+import renderCache
+import stageProfiler
+import staffLines
 import os
+import tempfile
 
-#seed the random number generator
-seed(1)
+#the chords, arpeggios and melody search are enfiladeCore's (no abjad); this file turns them into the score.
+#make_enfilade seeds one stream per pass from random_seed; the chord chart's random state is made by the command line.
+random_seed = enfiladeCore.random_seed
+
+#nth_time: [transposition of the hidden melody, dynamic of the arpeggios, dynamic of the hidden melody notes]
+nth_time_dictionary = enfiladeCore.nth_time_dictionary
 
 #layout and formatting - global 
     
-def make_staff_line_position_override_mark( clef_key ):
-    #makes a LilyPondCommandMark that moves the staff lines according to a clef_key.
-    #clef_key: 1 - 15va treble; 2 - normal treble; 3 - bass
-    clef_dictionary = {1: schemetools.Scheme(18, 16, 14, 12, 10), 2: schemetools.Scheme(4, 2, 0, -2, -4), 3: schemetools.Scheme(-8, -10, -12, -14, -16)}
+#clef_key: 1 - 15va treble; 2 - normal treble; 3 - bass
+clef_dictionary = {1: schemetools.Scheme(18, 16, 14, 12, 10), 2: schemetools.Scheme(4, 2, 0, -2, -4), 3: schemetools.Scheme(-8, -10, -12, -14, -16)}
+clef_glyph_dictionary = {1: ["#\"clefs.G\"", 12, 14], 2: ["#\"clefs.G\"", -2, 0], 3: ["#\"clefs.F\"", -10, 0] }
+
+def make_staff_line_position_override_string( clef_key ):
     staff_lines_scheme = clef_dictionary[clef_key]
     mark_string = "override Staff.StaffSymbol #'line-positions = #'" + str(staff_lines_scheme)
-    staff_position_mark = marktools.LilyPondCommandMark(mark_string)
-    return staff_position_mark
+    return mark_string
 
 def make_clef_symbol_change_tuple( clef_key):
     #given a clef_key, returns a tuple of the three marks required to set clef symbol, position, and octavation.
-    clef_glyph_dictionary = {1: ["#\"clefs.G\"", 12, 14], 2: ["#\"clefs.G\"", -2, 0], 3: ["#\"clefs.F\"", -10, 0] }
     glyph_list = clef_glyph_dictionary[ clef_key ]
     clef_symbol_string = glyph_list[0]
     position = "#" + str(glyph_list[1] )
     octavation = "#" + str(glyph_list[2] )
     return (clef_symbol_string, position, octavation)
 
+def make_clef_key_command_strings( clef_key ):
+    #the command strings of the six LilyPondCommandMarks that switch the staff to clef_key, in attachment order:
+    #1. restarts staff
+    #2. attaches staff line position change
+    #3. sets clef symbol, position, and octavation
+    symbol_string, position, octavation = make_clef_symbol_change_tuple( clef_key )
+    return (
+        "stopStaff",
+        "startStaff",
+        make_staff_line_position_override_string( clef_key ),
+        "set Staff.clefGlyph = " + symbol_string,
+        "set Staff.clefPosition = " + position,
+        "set Staff.clefOctavation = " + octavation,
+        )
+
+#formatted once, at import; every staff switch reuses these strings.
+clef_key_command_strings = dict( (clef_key, make_clef_key_command_strings( clef_key )) for clef_key in clef_dictionary )
+
 def move_staff_lines_at_leaf(leaf, clef_key):
     #use: switches the position of staff lines at leaf according to clef_key (see above for description of key system)
-    #algorithm: 
-    #1. restarts staff
-    #2. looks up clef symbol, position, and octavization in dictionary; attaching those marks to leaf 
-    #3. attaches staff line position change to leaf
-    marktools.LilyPondCommandMark("stopStaff")(leaf)
-    marktools.LilyPondCommandMark("startStaff")(leaf)
-    staff_position_mark = make_staff_line_position_override_mark( clef_key )
-    staff_position_mark.attach(leaf)
-    clef_symbol_change_tuple = make_clef_symbol_change_tuple( clef_key )
-    symbol_string = clef_symbol_change_tuple[0]
-    position = clef_symbol_change_tuple[1]
-    octavation = clef_symbol_change_tuple[2]
-    clef_string = "set Staff.clefGlyph = " + symbol_string
-    marktools.LilyPondCommandMark(clef_string)(leaf)
-    marktools.LilyPondCommandMark("set Staff.clefPosition = " + position)(leaf)
-    marktools.LilyPondCommandMark("set Staff.clefOctavation = " + octavation)(leaf)
-
-def format_staff( staff ):
+    for command_string in clef_key_command_strings[clef_key]:
+        marktools.LilyPondCommandMark(command_string)(leaf)
+
+def format_staff_overrides( staff ):
     #staff.override.time_signature.stencil = False
     staff.override.bar_line.stencil = False
     staff.override.beam.damping = "inf.0"
     staff.set.explicit_clef_visibility = schemetools.Scheme("end-of-line-invisible")
     staff.set.force_clef = True
     staff.override.beam.breakable = True
-    for x, voice in enumerate(staff[1:]):
-        if x % 2 == 1:
-            marktools.LilyPondCommandMark('break', 'after')( voice[-1])
-    tempo_mark = contexttools.TempoMark((1,4), 48)(staff[1][0])
 
 def format_score(score):
     score.set.proportional_notation_duration = schemetools.SchemeMoment(1,8)
@@ -74,101 +86,85 @@ def format_score(score):
     score.override.bar_number.transparent = True
     score.override.metronome_mark.padding = 2
     
-def format_lilypond_file(lilypond_file):
-    lilypond_file.paper_block.paper_width = 11 * 25.4
-    lilypond_file.paper_block.paper_height = 17 * 25.4
-    lilypond_file.paper_block.top_margin = 1.0 * 25.4
-    lilypond_file.paper_block.bottom_margin = 0.5 * 25.4
-    lilypond_file.paper_block.left_margin = 1.0 * 25.4
-    lilypond_file.paper_block.right_margin = 1.0 * 25.4
+#paper sizes and margins in inches; letter is landscape, like enfiladeLetter.pdf.
+layout_presets = {
+    'tabloid': {'paper_width': 11, 'paper_height': 17, 'top_margin': 1.0, 'bottom_margin': 0.5, 'left_margin': 1.0, 'right_margin': 1.0,
+        'global_staff_size': 14, 'system_system_spacing': 26},
+    'letter': {'paper_width': 11, 'paper_height': 8.5, 'top_margin': 0.5, 'bottom_margin': 0.5, 'left_margin': 0.75, 'right_margin': 0.75,
+        'global_staff_size': 14, 'system_system_spacing': 20},
+    }
+default_layout = 'tabloid'
+#found once, at import.
+fontTree = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fontTree.ly')
+
+def format_lilypond_file(lilypond_file, layout = default_layout):
+    layout_preset = layout_presets[layout]
+    lilypond_file.paper_block.paper_width = layout_preset['paper_width'] * 25.4
+    lilypond_file.paper_block.paper_height = layout_preset['paper_height'] * 25.4
+    lilypond_file.paper_block.top_margin = layout_preset['top_margin'] * 25.4
+    lilypond_file.paper_block.bottom_margin = layout_preset['bottom_margin'] * 25.4
+    lilypond_file.paper_block.left_margin = layout_preset['left_margin'] * 25.4
+    lilypond_file.paper_block.right_margin = layout_preset['right_margin'] * 25.4
     lilypond_file.paper_block.ragged_bottom = False
-    lilypond_file.global_staff_size = 14
+    lilypond_file.global_staff_size = layout_preset['global_staff_size']
     lilypond_file.layout_block.indent = 0
     lilypond_file.layout_block.ragged_right = False
-    lilypond_file.paper_block.system_system_spacing = layouttools.make_spacing_vector(0, 0, 26, 0)
-    directory = os.path.dirname(os.path.abspath(__file__))
-    fontTree = os.path.join(directory,'fontTree.ly')
+    lilypond_file.paper_block.system_system_spacing = layouttools.make_spacing_vector(0, 0, layout_preset['system_system_spacing'], 0)
     lilypond_file.file_initial_user_includes.append(fontTree)
 
 #layout and formatting - local
 
 def format_melody(melody):
-    move_staff_lines_at_leaf( melody[0], 3)
-    for note in melody:
-        note.override.stem.no_stem_extend = False
-    marktools.LilyPondCommandMark('fermata', 'after')( melody[-1]  )
-    marktools.LilyPondCommandMark('break','after')(melody[-1])
-    contexttools.TempoMark((1,4), 40)(melody[0])
-    contexttools.DynamicMark('f')(melody[0])
-
-#staff and clef moving:
-
-def add_staff_switches_to_voice( voice ):
-    move_staff_lines_at_leaf(voice[0], 1)
-    notes = list( iterationtools.iterate_notes_in_expr( voice ) )
-    treble_notes = [x for x in notes if x.sounding_pitch.pitch_number < 24 and x.sounding_pitch.pitch_number >= -1]
-    move_staff_lines_at_leaf(treble_notes[0], 2)
-    bass_notes = [x for x in notes if x.sounding_pitch.pitch_number < 0]
-    move_staff_lines_at_leaf(bass_notes[0], 3)
-
-def format_voice( voice ):
-    contexttools.TimeSignatureMark((1,16))( voice[0] )
-    spannertools.PhrasingSlurSpanner( voice[:])
-    spannertools.BeamSpanner(voice[:])
-    add_staff_switches_to_voice( voice )
-    voice.override.phrasing_slur.ratio = 0.6
-    voice.override.phrasing_slur.height_limit = 20
-    
+    #the marks are planned by enfiladeCore.get_melody_mark_plan.
+    apply_mark_plan( melody, enfiladeCore.get_melody_mark_plan( len( melody.select_leaves() ) ) )
+
+#mark plans (see arpeggioSerializer.add_mark_plan): every planned mark kind and how it goes on a leaf.
+
+articulation_directions = {'up': Up, 'down': Down, None: None}
+
+def attach_time_signature( leaf, duration ):
+    contexttools.TimeSignatureMark(duration)(leaf)
+
+def attach_articulation( leaf, name, direction ):
+    marktools.Articulation(name, articulation_directions[direction])(leaf)
+
+def attach_dynamic( leaf, dynamic ):
+    contexttools.DynamicMark(dynamic)(leaf)
+
+def attach_command( leaf, command_string, format_slot ):
+    marktools.LilyPondCommandMark(command_string, format_slot)(leaf)
+
+def attach_tempo( leaf, duration, units_per_minute ):
+    contexttools.TempoMark(duration, units_per_minute)(leaf)
+
+def set_stem_extend( leaf, stem_extend ):
+    leaf.override.stem.no_stem_extend = stem_extend
+
+mark_attachers = {
+    'time_signature': attach_time_signature,
+    'staff_lines': move_staff_lines_at_leaf,
+    'articulation': attach_articulation,
+    'dynamic': attach_dynamic,
+    'command': attach_command,
+    'tempo': attach_tempo,
+    'stem_extend': set_stem_extend,
+    }
+
+def apply_mark_plan( component, plan ):
+    #attaches a plan's marks to the leaves of component in one walk over them; plan keys are leaf indices in that walk's order.
+    for leaf_index, leaf in enumerate( iterationtools.iterate_leaves_in_expr( component ) ):
+        for kind, arguments in plan.get(leaf_index, ()):
+            mark_attachers[kind]( leaf, *arguments )
 
 #composition
-def choose_distance_from_range_low(seed_interval):
-    interval_width = seed_interval.semitones
-    choice = randint(0, interval_width)
-    return choice
-    
-def get_pitch_set_from_pitch_range_tuple( pitch_range_tuple ):
-    numeric_pitch_range_tuple = (numeric_pitch_range_low, numeric_pitch_range_high)
-    pitches = [ ]
-    for value in range( numeric_pitch_range_tuple[0], numeric_pitch_range_tuple[1] ):
-        pitch = pitchtools.NamedChromaticPitch(value)
-        pitches.append(pitch)
-    return pitches
-
-def make_chord( bottom_pitch_number, numeric_pitch_range_high ):
-    pitch_number = bottom_pitch_number
-    bottom_pitch = pitchtools.NamedPitch( pitch_number  )
-    bottom_interval_choices = [5, 7, 9]
-    chord = Chord( [ bottom_pitch ], Duration(1,4) )
-    bottom_interval_ambitus = choice(bottom_interval_choices)
-    next_to_bottom_pitch = bottom_pitch + bottom_interval_ambitus
-    chord.append( next_to_bottom_pitch )
-    added_pitch = next_to_bottom_pitch
-    while added_pitch.pitch_number <= int(numeric_pitch_range_high * 2/3) :
-        #pitch = choose_pitch_from_weighted_table(pitch)
-        sizes = [ 3, 4 ]
-        interval_size = choice(sizes)
-        current_pitch = added_pitch + interval_size
-        chord.append( current_pitch  )
-        added_pitch = current_pitch
-    while added_pitch.pitch_number <= int(numeric_pitch_range_high) :
-        #pitch = choose_pitch_from_weighted_table(pitch)
-        sizes = [ 1, 2 ]
-        interval_size = choice(sizes)
-        current_pitch = added_pitch + interval_size
-        chord.append( current_pitch  )
-        added_pitch = current_pitch
-    return chord   
-
-def make_chords(number_of_chords, pitch_range_tuple):
-    numeric_pitch_range_low = pitchtools.NamedPitch(pitch_range_tuple[0] ).pitch_number
-    numeric_pitch_range_high = pitchtools.NamedPitch( pitch_range_tuple[1] ).pitch_number
-    chords = [ ]
-    for x in range(number_of_chords):
-        distance_from_range_low = choose_distance_from_range_low( pitchtools.NamedInterval('P5') )
-        bottom_pitch_number = numeric_pitch_range_low + distance_from_range_low
-        chord = make_chord( bottom_pitch_number, numeric_pitch_range_high )
-        chords.append(chord)
-    return chords
+def make_chord( pitch_numbers ):
+    #builds the abjad Chord for one row of a chordEngine.ChordBatch; only called for chords that end up in the score.
+    chord = Chord( pitch_numbers, Duration(1,4) )
+    return chord
+
+def make_chords(number_of_chords, pitch_range_tuple, random_state):
+    #returns a chordEngine.ChordBatch: pitch numbers only, no abjad objects. random_state: see enfiladeCore.make_random_state.
+    return enfiladeCore.make_chords( number_of_chords, pitch_range_tuple, random_state )
 
 #def place_component_on_staffs(component, braced_staffs):
  #   #if 1 < len(component):
@@ -180,107 +176,339 @@ def make_chords(number_of_chords, pitch_range_tuple):
   #  elif isinstance(component, Chord):
   #      place_note_on_staffs(component, braced_staffs) 
 
-def get_range_bounds( voice ):
-    pitch_numbers = [ x.written_pitch.chromatic_pitch_number for x in iterationtools.iterate_components_and_grace_containers_in_expr( voice.leaves, (Note, Chord) ) ]
-    low = min(pitch_numbers)
-    high = max(pitch_numbers)
-    return (low, high)
-
 def make_score( staff ):
     score = Score( [staff] )
     format_score(score)
     return score
 
-def make_lilypond_file( staff ):
-    score = make_score( staff )
-    lilypond_file = lilypondfiletools.make_basic_lilypond_file(score)
-    format_lilypond_file(lilypond_file)
+def make_lilypond_file( staff, profiler = None, layout = default_layout ):
+    #profiler: a stageProfiler.StageProfiler, to time the score and file settings. layout: a key of layout_presets.
+    if profiler is None:
+        profiler = stageProfiler.null_profiler
+    with profiler.stage( 'score' ):
+        score = make_score( staff )
+    with profiler.stage( 'lilypond_file' ):
+        lilypond_file = lilypondfiletools.make_basic_lilypond_file(score)
+        format_lilypond_file(lilypond_file, layout)
+    return lilypond_file
+
+def make_chord_chart_lilypond_file(number_of_chords, pitch_range_tuple, random_state):
+    chords = make_chords(number_of_chords, pitch_range_tuple, random_state)
+    staff = Staff( [ make_chord( pitch_numbers ) for pitch_numbers in chords ] )
+    lilypond_file = make_lilypond_file(staff)
     return lilypond_file
 
-def make_chord_chart(number_of_chords, pitch_range_tuple):
-    chords = make_chords(number_of_chords, pitch_range_tuple)
-    lilypond_file = make_lilypond_file(chords)
+def make_chord_chart(number_of_chords, pitch_range_tuple, random_state):
+    lilypond_file = make_chord_chart_lilypond_file(number_of_chords, pitch_range_tuple, random_state)
     show(lilypond_file)
-    play(lilypond_file)
-
-def arpeggiate_chord( chord ):
-    notes = [ ]
-    pitches = chord.written_pitches
-    ordered_pitches = [ ]
-    for pitch in pitches:
-        ordered_pitches.append( pitch )
-    ordered_pitches.reverse()
-    for pitch in ordered_pitches:
-        note = Note(pitch, Duration(1,16))
-        notes.append( note )
+    audition_chord_chart(number_of_chords, pitch_range_tuple, random_state)
+
+def audition_chord_chart(number_of_chords, pitch_range_tuple, random_state, file_path = None):
+    #writes the chords straight to MIDI with midiWriter (no LilyPond run) and plays the file.
+    if file_path is None:
+        file_path = os.path.join(tempfile.gettempdir(), 'enfilade_chord_chart.mid')
+    chords = make_chords(number_of_chords, pitch_range_tuple, random_state)
+    notes, stop = midiWriter.make_chord_notes( chords )
+    midiWriter.write_midi_file( file_path, notes, [ (0, 48) ] )
+    midiWriter.play( file_path )
+    return file_path
+
+def make_arpeggio_voice( arpeggio ):
+    #the bare voice of an arpeggio, with its staff switches and no dynamics.
+    annotation = arpeggioSerializer.ArpeggioAnnotation( arpeggio.pitch_numbers, staffLines.get_staff_switches( arpeggio.pitch_numbers ) )
+    return lower_arpeggio_annotation( annotation )
+
+def make_unmarked_arpeggio_voice( annotation ):
+    #the notes, spanners and overrides of an arpeggioSerializer.ArpeggioAnnotation's voice; its marks come from a mark plan.
+    notes = [ Note(pitch_number, Duration(*annotation.duration)) for pitch_number in annotation.pitch_numbers ]
     voice = Voice(notes)
-    format_voice(voice)
+    spannertools.PhrasingSlurSpanner(voice[:])
+    spannertools.BeamSpanner(voice[:])
+    voice.override.phrasing_slur.ratio = 0.6
+    voice.override.phrasing_slur.height_limit = 20
     return voice
 
-def color_pitch( arpeggio, pitch):
-    for note in iterationtools.iterate_notes_in_expr(arpeggio):
-        if pitch == note.sounding_pitch:
-            note.override.note_head.color = "red"
-        
-
-def contains_pitch( pitch_to_find, arpeggio ):
-    pitches = set(pitchtools.list_named_pitches_in_expr(arpeggio))
-    if pitches.issuperset([ pitch_to_find ] ):
-        return True
-        
-def format_subsequent_pitch( arpeggio, note, dynamic_tuple ): 
-    melody_note_dynamic = dynamic_tuple[1]
-    original_dynamic = dynamic_tuple[0]
-    marktools.Articulation("-",Up)(note)
-    contexttools.DynamicMark(melody_note_dynamic)(note)
-    note_after_that = inspect(note).get_leaf(1)
-    if note_after_that is not None:
-        contexttools.DynamicMark(original_dynamic)(note_after_that)
-
-def emphasize_pitch( arpeggio, pitch_to_check, hidden_melody_tuple):
-    for note in iterationtools.iterate_notes_in_expr(arpeggio):
-        if pitch_to_check == note.sounding_pitch:
-            format_subsequent_pitch( arpeggio, note, hidden_melody_tuple )
-    
-def find_melody_in_arpeggios( melody, arpeggio_voices, nth_time ):
-    nth_time_dictionary = {0: [24, 'ppp', 'mf'], 1: [12, 'p', 'f'], 2: [0, 'mf', 'ff']}
-    hidden_melody_tuple = nth_time_dictionary[nth_time]
-    hidden_melody_transposition = hidden_melody_tuple[0]
-    hidden_melody_tuple = hidden_melody_tuple[1:]
-    selected_arpeggios = [ ]
-    pitches = [ x.sounding_pitch for x in iterationtools.iterate_notes_in_expr( melody )]
-    pitch_index = 0
-    for arpeggio in arpeggio_voices:
-        if pitch_index == len(pitches):
-            break
-        pitch_to_check = pitches[ pitch_index] + hidden_melody_transposition
-        if contains_pitch( pitch_to_check, arpeggio):
-            contexttools.DynamicMark(hidden_melody_tuple[0])(arpeggio[0])
-            selected_arpeggios.append( arpeggio )
-            #color_pitch( arpeggio, pitch_to_check)
-            emphasize_pitch( arpeggio, pitch_to_check, hidden_melody_tuple)
-            pitch_index += 1
-    return selected_arpeggios
-        
-def arpeggiate_chords( chords ):
-    arpeggio_voices = [ ]
-    for chord in chords:
-        arpeggio_voice = arpeggiate_chord( chord )
-        arpeggio_voices.append( arpeggio_voice )
-    return arpeggio_voices
-
-def make_enfilade(melody, pitch_range_tuple):
-    format_melody( melody )
-    staff = Staff([melody])
-    for x in range(3):
-        nth_time = x
-        chords = make_chords(100, pitch_range_tuple)
-        arpeggio_voices = arpeggiate_chords( chords )
-        selected_voices = find_melody_in_arpeggios( melody, arpeggio_voices, nth_time )
+def lower_arpeggio_annotation( annotation ):
+    #the abjad voice of an arpeggioSerializer.ArpeggioAnnotation, marks and all.
+    #the marks are the annotation's own plan (arpeggioSerializer.add_mark_plan), applied in one walk as make_annotated_staff does.
+    voice = make_unmarked_arpeggio_voice( annotation )
+    apply_mark_plan( voice, arpeggioSerializer.add_mark_plan( [annotation] ) )
+    return voice
+
+def get_melody_pitch_numbers( melody ):
+    return [ x.sounding_pitch.pitch_number for x in iterationtools.iterate_notes_in_expr( melody ) ]
+
+def search_enfilade_passes(melody, pitch_range_tuple, sampling = 'rejection', processes = None, seed = None, profiler = None,
+    number_of_passes = None, pitch_weights_path = None, maximum_number_of_chords = enfiladeCore.maximum_number_of_chords_per_pass):
+    #sampling: 'rejection' pulls chords until one contains the next melody pitch, and stops the pass at a pitch no chord can contain;
+    #'table' is 'rejection' drawing each chord from the range's precomputed chordTables.ChordTable (same distribution, other chords);
+    #'weighted' is 'rejection' with make_chord's choices weighted by the file at pitch_weights_path (None for pitchWeights.json);
+    #'conditioned' makes exactly one chord per melody pitch, each guaranteed to contain it.
+    #processes: size of the process pool the passes are searched in (see enfiladePasses.search_passes).
+    #seed: defaults to random_seed; seedSweep.py ranks seeds by the passes they give here.
+    #number_of_passes: the first passes of nth_time_dictionary to search (default: all of them).
+    #maximum_number_of_chords: the most chords each pass generates, None for no ceiling (see enfiladeCore.search_enfilade_passes).
+    return enfiladeCore.search_enfilade_passes( get_melody_pitch_numbers( melody ), pitch_range_tuple, sampling, processes, seed, profiler,
+        number_of_passes, maximum_number_of_chords, pitch_weights_path )
+
+def make_staff_mark_plan(melody, annotations):
+    #the marks of a staff holding melody (None for none) and then the annotations' voices, by leaf index.
+    plan = { }
+    number_of_melody_notes = 0
+    if melody is not None:
+        number_of_melody_notes = len( melody.select_leaves() )
+        plan = enfiladeCore.get_melody_mark_plan( number_of_melody_notes )
+    return arpeggioSerializer.add_mark_plan( annotations, plan, number_of_melody_notes )
+
+def make_annotated_staff(melody, annotations, profiler = None, pass_sizes = None):
+    #every mark of the staff is planned first, by leaf index (the melody's, then the annotations'); the voices are built bare,
+    #in order, and the plan is applied in one walk over the staff's leaves. melody None leaves the melody out (see format_enfilade_chunks).
+    #pass_sizes: the number of annotations of each pass, to time each pass's voices as its own 'arpeggio_voices' stage.
+    if profiler is None:
+        profiler = stageProfiler.null_profiler
+    if pass_sizes is None:
+        pass_sizes = [ len(annotations) ]
+    with profiler.stage( 'mark_plan' ):
+        plan = make_staff_mark_plan( melody, annotations )
+    staff = Staff([melody] if melody is not None else [ ])
+    start = 0
+    for nth_time, pass_size in enumerate(pass_sizes):
+        with profiler.stage( 'arpeggio_voices', nth_time = nth_time ):
+            selected_voices = [ make_unmarked_arpeggio_voice( x ) for x in annotations[start:start + pass_size] ]
         staff.extend(selected_voices)
-    format_staff(staff)
-    lilypond_file = make_lilypond_file( staff )
-    show(lilypond_file)
+        start += pass_size
+    with profiler.stage( 'format_staff' ):
+        apply_mark_plan( staff, plan )
+        format_staff_overrides(staff)
+    return staff
+
+def make_enfilade_staff(melody, passes, profiler = None):
+    #make_annotated_staff for the annotations of make_arpeggio_annotations.
+    if profiler is None:
+        profiler = stageProfiler.null_profiler
+    with profiler.stage( 'annotate' ):
+        annotations = make_arpeggio_annotations( passes )
+    return make_annotated_staff( melody, annotations, profiler, [ len(x) for x in passes ] )
+
+def count_marks( component ):
+    #only counted when profiling: it walks every leaf.
+    return sum( len( inspect(leaf).get_marks() ) for leaf in iterationtools.iterate_leaves_in_expr( component ) )
+
+def make_enfilade(melody, pitch_range_tuple, sampling = 'rejection', processes = None, seed = None, profiler = None,
+    pitch_weights_path = None, maximum_number_of_chords = enfiladeCore.maximum_number_of_chords_per_pass):
+    #profiler: a stageProfiler.StageProfiler to time each stage (and pass) and count chords, rejected arpeggios, marks, .ly bytes
+    #and lilypond_seconds, the time LilyPond itself ran (0 when the render cache had the score; the 'lilypond' stage includes the lookup).
+    profiling = profiler is not None
+    if not profiling:
+        profiler = stageProfiler.null_profiler
+    with profiler.stage( 'search' ):
+        passes = search_enfilade_passes( melody, pitch_range_tuple, sampling, processes, seed, profiler if profiling else None,
+            pitch_weights_path = pitch_weights_path, maximum_number_of_chords = maximum_number_of_chords )
+    with profiler.stage( 'staff' ):
+        staff = make_enfilade_staff( melody, passes, profiler )
+    if profiling:
+        profiler.count( 'marks_attached', count_marks( staff ) )
+    with profiler.stage( 'make_lilypond_file' ):
+        lilypond_file = make_lilypond_file( staff, profiler )
+    with profiler.stage( 'format' ):
+        ly_string = lilypond_file.lilypond_format
+    if profiling:
+        profiler.count( 'ly_bytes', len( ly_string.encode('utf-8') ) )
+    #LilyPond only runs when the formatted .ly (or fontTree.ly, or the LilyPond version) has changed.
+    with profiler.stage( 'lilypond' ):
+        outputs, lilypond_seconds = renderCache.render_and_time_lilypond_string( ly_string )
+        renderCache.open_file( outputs['.pdf'] )
+    if profiling:
+        profiler.count( 'lilypond_seconds', lilypond_seconds )
+
+def audition_enfilade(melody_string, pitch_range_tuple, sampling = 'rejection', seed = None, file_path = None):
+    #writes the enfilade straight to MIDI with midiWriter, from the same passes make_enfilade would engrave, and plays the file.
+    if file_path is None:
+        file_path = os.path.join(tempfile.gettempdir(), 'enfilade.mid')
+    enfiladeCore.write_enfilade_midi( file_path, melody_string, pitch_range_tuple, sampling, seed )
+    midiWriter.play( file_path )
+    return file_path
+
+#fast .ly output: the arpeggio voices are written by arpeggioSerializer from the pass selections, never built as abjad objects.
+
+arpeggio_placeholder_name = 'enfilade_arpeggios'
+
+def make_arpeggio_annotations( passes ):
+    #the marks of every arpeggio voice of the staff, as arpeggioSerializer annotations; both serializers build from these.
+    return enfiladeCore.annotate_passes( passes )
+
+def format_enfilade_fast(melody, passes, layout = default_layout):
+    #the melody and the file, score and staff settings still come from abjad; an empty placeholder voice marks where the arpeggios go.
+    return format_annotations_fast( melody, make_arpeggio_annotations( passes ), layout )
+
+def format_annotations_fast(melody, annotations, layout = default_layout):
+    #format_enfilade_fast for a given list of annotations; melody None leaves the melody out (see format_enfilade_chunks).
+    voices = [ ]
+    if melody is not None:
+        format_melody( melody )
+        voices.append( melody )
+    staff = Staff( voices + [Voice(name = arpeggio_placeholder_name)] )
+    format_staff_overrides( staff )
+    lilypond_file = make_lilypond_file( staff, layout = layout )
+    return arpeggioSerializer.replace_placeholder_voice( lilypond_file.lilypond_format, arpeggio_placeholder_name, annotations, clef_key_command_strings )
+
+def format_enfilade(melody, pitch_range_tuple, sampling = 'rejection', processes = None, seed = None, serializer = 'abjad',
+    number_of_passes = None, layout = default_layout, pitch_weights_path = None,
+    maximum_number_of_chords = enfiladeCore.maximum_number_of_chords_per_pass):
+    #returns the .ly text of the enfilade; serializer: 'abjad' builds and formats every voice, 'fast' uses format_enfilade_fast.
+    passes = search_enfilade_passes( melody, pitch_range_tuple, sampling, processes, seed, None, number_of_passes, pitch_weights_path,
+        maximum_number_of_chords )
+    if serializer == 'fast':
+        return format_enfilade_fast( melody, passes, layout )
+    staff = make_enfilade_staff( melody, passes )
+    return make_lilypond_file( staff, layout = layout ).lilypond_format
+
+#chunked output: above a few hundred arpeggios LilyPond's page breaking makes one big score engrave superlinearly, so the staff is cut
+#at its breaks into scores of systems_per_chunk systems, engraved in parallel and joined into one PDF (see batchRender).
+#Each chunk is a whole score with the staff settings; the melody and the tempo mark are only in the first, and the melody's system
+#counts toward the first chunk's systems_per_chunk. No MIDI is written.
+default_systems_per_chunk = 24
+
+def format_enfilade_chunks(melody, pitch_range_tuple, sampling = 'rejection', processes = None, seed = None, serializer = 'abjad',
+    number_of_passes = None, layout = default_layout, systems_per_chunk = default_systems_per_chunk, pitch_weights_path = None,
+    maximum_number_of_chords = enfiladeCore.maximum_number_of_chords_per_pass):
+    #format_enfilade, as one .ly text per chunk, in order.
+    passes = search_enfilade_passes( melody, pitch_range_tuple, sampling, processes, seed, None, number_of_passes, pitch_weights_path,
+        maximum_number_of_chords )
+    #the melody ends with its own break.
+    chunks = arpeggioSerializer.split_annotations_at_breaks( make_arpeggio_annotations( passes ), systems_per_chunk, 1 )
+    ly_strings = [ ]
+    for index, annotations in enumerate(chunks):
+        chunk_melody = melody if index == 0 else None
+        if serializer == 'fast':
+            ly_strings.append( format_annotations_fast( chunk_melody, annotations, layout ) )
+        else:
+            ly_strings.append( make_lilypond_file( make_annotated_staff( chunk_melody, annotations ), layout = layout ).lilypond_format )
+    return ly_strings
+
+def diff_enfilade_serializers(melody_string, pitch_range_tuple, sampling = 'rejection', seed = None, passes = None):
+    #formats the same passes both ways and returns the unified diff lines; empty when the fast serializer matches abjad.
+    #passes: the passes to format (see enfiladeCore.load_passes) instead of searching them.
+    melody = Voice(melody_string)
+    if passes is None:
+        passes = search_enfilade_passes( melody, pitch_range_tuple, sampling, 1, seed )
+    abjad_string = make_lilypond_file( make_enfilade_staff( melody, passes ) ).lilypond_format
+    fast_string = format_enfilade_fast( Voice(melody_string), passes )
+    return list( difflib.unified_diff( abjad_string.split('\n'), fast_string.split('\n'), 'abjad', 'fast', lineterm = '' ) )
+
+#serializerGolden.ly is abjad 2.13's formatting of the passes in serializerGolden.json (the first three passes of melody_string, seed 1),
+#which the fast serializer matched line for line; check_serializers diffs both serializers against it.
+golden_passes_path = os.path.join(enfiladeCore.directory, 'serializerGolden.json')
+golden_ly_path = os.path.join(enfiladeCore.directory, 'serializerGolden.ly')
+
+def get_comparable_lines( ly_string ):
+    #the lines of a formatted file without those that change with the date and the install: abjad's header comments, \version, \include.
+    return [ x for x in renderCache.get_uncommented_lines( ly_string ) if not x.startswith('\\version') and not x.startswith('\\include') ]
+
+def write_serializer_golden( passes ):
+    #writes passes (of melody_string) and their abjad formatting as the golden files; only to be run with abjad 2.13.
+    melody = Voice(melody_string)
+    enfiladeCore.write_passes( golden_passes_path, passes )
+    with open(golden_ly_path, 'w') as golden_file:
+        golden_file.write( '\n'.join( get_comparable_lines( make_lilypond_file( make_enfilade_staff( melody, passes ) ).lilypond_format ) ) )
+
+def check_serializers():
+    #returns the unified diff lines of each serializer's formatting of the golden passes against serializerGolden.ly; empty when both match.
+    passes = enfiladeCore.load_passes( golden_passes_path )
+    with open(golden_ly_path) as golden_file:
+        golden_lines = golden_file.read().split('\n')
+    diff = [ ]
+    for name, ly_string in [ ('abjad', make_lilypond_file( make_enfilade_staff( Voice(melody_string), passes ) ).lilypond_format),
+        ('fast', format_enfilade_fast( Voice(melody_string), passes )) ]:
+        diff.extend( difflib.unified_diff( golden_lines, get_comparable_lines( ly_string ), 'golden', name, lineterm = '' ) )
+    return diff
+
+#headless output: .ly, .pdf and .midi files in a directory, engraved by a bounded pool of LilyPond processes (see batchRender).
+
+def write_enfilades(melody_string, pitch_range_tuple, seeds, output_directory, processes = 2, sampling = 'rejection', serializer = 'abjad',
+    systems_per_chunk = None, pitch_weights_path = None, maximum_number_of_chords = enfiladeCore.maximum_number_of_chords_per_pass):
+    #one enfilade per seed, named enfilade_seed_<seed>; returns batchRender's per-file reports.
+    #systems_per_chunk: engrave each enfilade in chunks of that many systems (see format_enfilade_chunks) and join their PDFs.
+    if systems_per_chunk is not None:
+        named_chunks = [ ('enfilade_seed_%s' % seed, format_enfilade_chunks( Voice(melody_string), pitch_range_tuple, sampling, 1, seed,
+            serializer, systems_per_chunk = systems_per_chunk, pitch_weights_path = pitch_weights_path,
+            maximum_number_of_chords = maximum_number_of_chords )) for seed in seeds ]
+        reports = batchRender.render_chunked_lilypond_strings( named_chunks, output_directory, processes )
+        batchRender.print_reports( reports )
+        return reports
+    named_ly_strings = [ ]
+    for seed in seeds:
+        ly_string = format_enfilade( Voice(melody_string), pitch_range_tuple, sampling, 1, seed, serializer,
+            pitch_weights_path = pitch_weights_path, maximum_number_of_chords = maximum_number_of_chords )
+        named_ly_strings.append( ('enfilade_seed_%s' % seed, ly_string) )
+    reports = batchRender.render_lilypond_strings( named_ly_strings, output_directory, processes )
+    batchRender.print_reports( reports )
+    return reports
+
+def write_enfilade_ly(file_path, melody_string, pitch_range_tuple, seed, sampling = 'rejection', serializer = 'abjad',
+    layout = default_layout, pitch_weights_path = None, maximum_number_of_chords = enfiladeCore.maximum_number_of_chords_per_pass):
+    #writes the .ly text of one seed's enfilade to file_path, without engraving it. asyncRender.py runs this file with --ly-file to
+    #generate each variant under abjad's Python 2 while it engraves the previous ones from Python 3.
+    ly_string = format_enfilade( Voice(melody_string), pitch_range_tuple, sampling, 1, seed, serializer, layout = layout,
+        pitch_weights_path = pitch_weights_path, maximum_number_of_chords = maximum_number_of_chords )
+    with open(file_path, 'w') as ly_file:
+        ly_file.write(ly_string)
+    return file_path
+
+def write_chord_chart(number_of_chords, pitch_range_tuple, output_directory, random_state):
+    lilypond_file = make_chord_chart_lilypond_file(number_of_chords, pitch_range_tuple, random_state)
+    reports = batchRender.render_lilypond_strings( [ ('chord_chart', lilypond_file.lilypond_format) ], output_directory, 1 )
+    batchRender.print_reports( reports )
+    return reports
+
+melody_string = enfiladeCore.melody_string
+pitch_range_tuple = enfiladeCore.pitch_range_tuple
 
-melody = Voice("g4 c' b e g d' ef b d' e g e' d' ef b2")
-make_enfilade( melody, ("c", "g'''") )
\ No newline at end of file
+#the passes run in worker processes, which re-import this file on some platforms.
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description = 'Enfilade for carillon. Without --output-directory, shows the piece.' )
+    parser.add_argument( '--output-directory', default = None, help = 'write .ly, .pdf and .midi files here instead of opening a viewer' )
+    parser.add_argument( '--seeds', nargs = '+', type = int, default = [random_seed] )
+    parser.add_argument( '--processes', type = int, default = 2, help = 'LilyPond processes running at once' )
+    parser.add_argument( '--sampling', choices = ('rejection', 'table', 'weighted', 'conditioned'), default = 'rejection' )
+    parser.add_argument( '--serializer', choices = ('abjad', 'fast'), default = 'abjad',
+        help = "'fast' writes the arpeggio voices without abjad objects, matching abjad on serializerGolden.ly" )
+    parser.add_argument( '--pitch-weights', default = None, help = 'with --sampling weighted, a weights file (default pitchWeights.json)' )
+    parser.add_argument( '--maximum-chords', type = int, default = enfiladeCore.maximum_number_of_chords_per_pass,
+        help = 'the most chords a pass generates, 0 for no ceiling; passes that reach it are warned about' )
+    parser.add_argument( '--chord-chart', type = int, default = None, metavar = 'NUMBER_OF_CHORDS', help = 'also write a chord chart' )
+    parser.add_argument( '--chunk-systems', type = int, default = None, metavar = 'SYSTEMS',
+        help = 'engrave each enfilade in chunks of this many systems, in parallel, and join the PDFs (no MIDI)' )
+    parser.add_argument( '--ly-file', default = None, metavar = 'PATH',
+        help = 'only write the .ly of the first of --seeds here, without engraving it (asyncRender.py generates through this)' )
+    parser.add_argument( '--profile', default = None, metavar = 'REPORT', help = 'time each stage of make_enfilade and write a JSON report here' )
+    parser.add_argument( '--cprofile-directory', default = None, help = 'with --profile, also dump a cProfile per stage here' )
+    parser.add_argument( '--profile-memory', action = 'store_true',
+        help = 'with --profile, also trace peak memory per stage (slows every stage down; take wall times from a run without it)' )
+    arguments = parser.parse_args()
+    if arguments.ly_file is not None and (arguments.chunk_systems is not None or arguments.output_directory is not None):
+        parser.error( '--ly-file does not work with --chunk-systems or --output-directory.' )
+    if arguments.chunk_systems is not None and arguments.chunk_systems < 1:
+        parser.error( '--chunk-systems must be at least 1.' )
+    if arguments.maximum_chords < 0:
+        parser.error( '--maximum-chords must not be negative.' )
+    maximum_number_of_chords = arguments.maximum_chords or None
+    if arguments.ly_file is not None:
+        write_enfilade_ly( arguments.ly_file, melody_string, pitch_range_tuple, arguments.seeds[0], arguments.sampling, arguments.serializer,
+            pitch_weights_path = arguments.pitch_weights, maximum_number_of_chords = maximum_number_of_chords )
+    elif arguments.output_directory is None:
+        melody = Voice(melody_string)
+        profiler = None
+        if arguments.profile is not None:
+            profiler = stageProfiler.StageProfiler( arguments.profile_memory, arguments.cprofile_directory )
+        make_enfilade( melody, pitch_range_tuple, arguments.sampling, seed = arguments.seeds[0], profiler = profiler,
+            pitch_weights_path = arguments.pitch_weights, maximum_number_of_chords = maximum_number_of_chords )
+        if profiler is not None:
+            profiler.write_report( arguments.profile )
+    else:
+        write_enfilades( melody_string, pitch_range_tuple, arguments.seeds, arguments.output_directory,
+            arguments.processes, arguments.sampling, arguments.serializer, arguments.chunk_systems, arguments.pitch_weights,
+            maximum_number_of_chords )
+    if arguments.output_directory is not None and arguments.chord_chart is not None:
+        write_chord_chart( arguments.chord_chart, pitch_range_tuple, arguments.output_directory,
+            enfiladeCore.make_random_state( arguments.seeds[0] ) )
\ No newline at end of file
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+#The chord, arpeggio and melody-search logic of enfilade2.13.py on plain pitch numbers (c' = 0, as in abjad), for sweeps and analysis.
+#Does not import abjad and does nothing at import; enfilade2.13.py builds the score (and imports abjad) on top of these functions.
+import json
+import os
+import warnings
+import arpeggioPool
+import arpeggioSerializer
+import chordEngine
+import chordTables
+import enfiladePasses
+import melodySearch
+import midiWriter
+import staffLines
+
+#make_enfilade spawns one random stream per pass from random_seed.
+random_seed = 1
+
+#nth_time: [transposition of the hidden melody, dynamic of the arpeggios, dynamic of the hidden melody notes]
+nth_time_dictionary = {0: [24, 'ppp', 'mf'], 1: [12, 'p', 'f'], 2: [0, 'mf', 'ff']}
+
+#the most chords a pass generates before giving up on the rest of its melody, by default; see enfiladePasses.
+maximum_number_of_chords_per_pass = enfiladePasses.default_maximum_number_of_chords
+
+directory = os.path.dirname(os.path.abspath(__file__))
+
+melody_string = "g4 c' b e g d' ef b d' e g e' d' ef b2"
+pitch_range_tuple = ("c", "g'''")
+
+def get_numeric_pitch_range( pitch_range_tuple ):
+    numeric_pitch_range_low = melodySearch.get_pitch_number_from_pitch_name( pitch_range_tuple[0] )
+    numeric_pitch_range_high = melodySearch.get_pitch_number_from_pitch_name( pitch_range_tuple[1] )
+    return (numeric_pitch_range_low, numeric_pitch_range_high)
+
+def make_random_state( seed = None ):
+    #seed: defaults to random_seed.
+    if seed is None:
+        seed = random_seed
+    return chordEngine.make_random_state( seed )
+
+def make_chords( number_of_chords, pitch_range_tuple, random_state ):
+    #returns a chordEngine.ChordBatch.
+    numeric_pitch_range_low, numeric_pitch_range_high = get_numeric_pitch_range( pitch_range_tuple )
+    return chordEngine.make_chord_batch( number_of_chords, numeric_pitch_range_low, numeric_pitch_range_high, random_state )
+
+def iterate_chords( pitch_range_tuple, random_state ):
+    #chords are only generated as the melody search pulls them.
+    numeric_pitch_range_low, numeric_pitch_range_high = get_numeric_pitch_range( pitch_range_tuple )
+    return chordEngine.iterate_chords( numeric_pitch_range_low, numeric_pitch_range_high, random_state )
+
+def get_reachable_pitch_numbers( pitch_numbers, pitch_range_tuple ):
+    numeric_pitch_range_low, numeric_pitch_range_high = get_numeric_pitch_range( pitch_range_tuple )
+    return enfiladePasses.get_reachable_pitch_numbers( pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high )
+
+def make_conditioned_chords( pitch_numbers, pitch_range_tuple, random_state ):
+    #one chord per pitch number, each drawn from make_chords' distribution conditioned on containing that pitch.
+    numeric_pitch_range_low, numeric_pitch_range_high = get_numeric_pitch_range( pitch_range_tuple )
+    return chordEngine.make_conditioned_chord_batch( pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high, random_state )
+
+def arpeggiate_chord( pitch_numbers ):
+    #a melodySearch.Arpeggio: pitch numbers and pitch mask only.
+    return melodySearch.make_arpeggio( pitch_numbers )
+
+def arpeggiate_chords( chords ):
+    #a generator, so chords are only arpeggiated as the melody search asks for them.
+    for chord in chords:
+        yield arpeggiate_chord( chord )
+
+def contains_pitch( pitch_number_to_find, arpeggio ):
+    return arpeggio.contains_pitch_number( pitch_number_to_find )
+
+def make_arpeggio_pool( number_of_chords, pitch_range_tuple, random_state ):
+    #an arpeggioPool.ArpeggioPool of number_of_chords chords, to search several melodies in the same material.
+    return arpeggioPool.make_arpeggio_pool( make_chords( number_of_chords, pitch_range_tuple, random_state ) )
+
+def find_melodies_in_arpeggio_pool( melodies_pitch_numbers, pool, number_of_passes = None ):
+    #every melody at the transposition of every nth_time, each searched from the start of the pool (see arpeggioPool.search_melodies).
+    #returns {(melody index, nth_time): selections}.
+    if number_of_passes is None:
+        number_of_passes = len(nth_time_dictionary)
+    transpositions = [ nth_time_dictionary[nth_time][0] for nth_time in range(number_of_passes) ]
+    selections = arpeggioPool.search_melodies( pool, melodies_pitch_numbers, transpositions )
+    return dict( ((melody_index, nth_time), selections[(melody_index, transposition)])
+        for melody_index in range(len(melodies_pitch_numbers)) for nth_time, transposition in enumerate(transpositions) )
+
+def get_hidden_melody_pitch_numbers( melody_pitch_numbers, nth_time ):
+    hidden_melody_transposition = nth_time_dictionary[nth_time][0]
+    return [ x + hidden_melody_transposition for x in melody_pitch_numbers ]
+
+def find_melody_in_arpeggios( melody_pitch_numbers, arpeggios, nth_time ):
+    #returns the (arpeggio, pitch_number) selections; arpeggios may be an endless generator.
+    pitch_numbers = get_hidden_melody_pitch_numbers( melody_pitch_numbers, nth_time )
+    return list( melodySearch.search_melody( pitch_numbers, arpeggios ) )
+
+def get_pass_reports( melody_pitch_numbers, pitch_range_tuple, passes, sampling = 'rejection',
+    maximum_number_of_chords = maximum_number_of_chords_per_pass, pitch_weights_path = None ):
+    #enfiladePasses.get_pass_reports for the passes of search_enfilade_passes, each labeled with its nth_time.
+    numeric_pitch_range_low, numeric_pitch_range_high = get_numeric_pitch_range( pitch_range_tuple )
+    hidden_melodies = [ get_hidden_melody_pitch_numbers( melody_pitch_numbers, nth_time ) for nth_time in range(len(passes)) ]
+    reports = enfiladePasses.get_pass_reports( hidden_melodies, numeric_pitch_range_low, numeric_pitch_range_high, passes, sampling,
+        maximum_number_of_chords, pitch_weights_path )
+    for nth_time, report in enumerate(reports):
+        report['nth_time'] = nth_time
+    return reports
+
+def search_enfilade_passes( melody_pitch_numbers, pitch_range_tuple, sampling = 'rejection', processes = None, seed = None, profiler = None,
+    number_of_passes = None, maximum_number_of_chords = maximum_number_of_chords_per_pass, pitch_weights_path = None ):
+    #one pass per nth_time; see enfiladePasses.search_passes. seed: defaults to random_seed.
+    #number_of_passes: the first passes of nth_time_dictionary to search (default: all of them).
+    #maximum_number_of_chords: the most chords each pass generates, None for no ceiling; a pass that reaches it is warned about.
+    #pitch_weights_path: the weights file of 'weighted' sampling (None for pitchWeights.weights_path).
+    if number_of_passes is None:
+        number_of_passes = len(nth_time_dictionary)
+    if not 0 < number_of_passes <= len(nth_time_dictionary):
+        raise ValueError('number_of_passes must be between 1 and %s.' % len(nth_time_dictionary))
+    numeric_pitch_range_low, numeric_pitch_range_high = get_numeric_pitch_range( pitch_range_tuple )
+    hidden_melodies = [ get_hidden_melody_pitch_numbers( melody_pitch_numbers, nth_time ) for nth_time in range(number_of_passes) ]
+    if seed is None:
+        seed = random_seed
+    passes = enfiladePasses.search_passes( hidden_melodies, numeric_pitch_range_low, numeric_pitch_range_high, seed, sampling, processes,
+        profiler, maximum_number_of_chords, pitch_weights_path )
+    for report in get_pass_reports( melody_pitch_numbers, pitch_range_tuple, passes, sampling, maximum_number_of_chords,
+        pitch_weights_path ):
+        if report['hit_ceiling']:
+            warnings.warn( 'pass %(nth_time)s embedded %(embedded_pitches)s of %(reachable_pitches)s melody pitches in '
+                '%(maximum_number_of_chords)s chords.' % report )
+    return passes
+
+def get_expected_numbers_of_chords( melody_pitch_numbers, pitch_range_tuple, number_of_passes = None ):
+    #the expected number of chords each rejection-sampled pass generates, from the range's chordTables.ChordTable, before generating any.
+    if number_of_passes is None:
+        number_of_passes = len(nth_time_dictionary)
+    numeric_pitch_range_low, numeric_pitch_range_high = get_numeric_pitch_range( pitch_range_tuple )
+    table = chordTables.get_chord_table( numeric_pitch_range_low, numeric_pitch_range_high )
+    expected_numbers_of_chords = [ ]
+    for nth_time in range(number_of_passes):
+        pitch_numbers = get_reachable_pitch_numbers( get_hidden_melody_pitch_numbers( melody_pitch_numbers, nth_time ), pitch_range_tuple )
+        expected_numbers_of_chords.append( chordTables.get_expected_number_of_chords( pitch_numbers, table ) )
+    return expected_numbers_of_chords
+
+def get_melody_mark_plan( number_of_melody_notes ):
+    #the marks of the melody voice, as an arpeggioSerializer.add_mark_plan plan: bass staff lines, tempo and dynamic on the first note,
+    #no stem extension on every note, and a fermata and a break after the last.
+    plan = dict( (x, [ ('stem_extend', (False,)) ]) for x in range(number_of_melody_notes) )
+    plan[0][:0] = [ ('staff_lines', (3,)) ]
+    plan[number_of_melody_notes - 1].extend( [ ('command', ('fermata', 'after')), ('command', ('break', 'after')) ] )
+    plan[0].extend( [ ('tempo', ((1,4), 40)), ('dynamic', ('f',)) ] )
+    return plan
+
+def annotate_pass( selections, nth_time ):
+    #the marks of a pass's arpeggio voices, as arpeggioSerializer.ArpeggioAnnotations: the arpeggio dynamic on the first note,
+    #and on each hidden melody note a tenuto, the melody dynamic, and the arpeggio dynamic again on the note after it.
+    arpeggio_dynamic, melody_note_dynamic = nth_time_dictionary[nth_time][1:]
+    annotations = [ ]
+    for arpeggio, pitch_number_to_check in selections:
+        pitch_numbers = arpeggio.pitch_numbers
+        dynamics = [ (0, arpeggio_dynamic) ]
+        articulations = [ ]
+        for x, pitch_number in enumerate( pitch_numbers ):
+            if pitch_number_to_check == pitch_number:
+                articulations.append( (x, '-', 'up') )
+                dynamics.append( (x, melody_note_dynamic) )
+                if x + 1 < len(pitch_numbers):
+                    dynamics.append( (x + 1, arpeggio_dynamic) )
+        annotations.append( arpeggioSerializer.ArpeggioAnnotation( pitch_numbers, staffLines.get_staff_switches( pitch_numbers ),
+            dynamics, articulations ) )
+    return annotations
+
+def annotate_passes( passes ):
+    #annotate_pass for every pass, in order, plus the staff's marks: a break after every second arpeggio and the tempo on the first.
+    annotations = [ ]
+    for nth_time, selections in enumerate(passes):
+        annotations.extend( annotate_pass( selections, nth_time ) )
+    for x, annotation in enumerate(annotations):
+        if x % 2 == 1:
+            annotation.break_after = True
+    if annotations:
+        annotations[0].tempo = ((1,4), 48)
+    return annotations
+
+def write_enfilade_midi( file_path, melody_string, pitch_range_tuple, sampling = 'rejection', seed = None ):
+    #the enfilade straight to a MIDI file (see midiWriter), from the same passes make_enfilade would engrave.
+    melody_notes = melodySearch.get_notes_from_melody_string( melody_string )
+    passes = search_enfilade_passes( [ x[0] for x in melody_notes ], pitch_range_tuple, sampling, None, seed )
+    notes, tempi = midiWriter.make_enfilade_notes( melody_notes, passes, nth_time_dictionary )
+    return midiWriter.write_midi_file( file_path, notes, tempi )
+
+def write_passes( file_path, passes ):
+    #passes as JSON: per pass, [arpeggio pitch numbers, hidden melody pitch number] pairs; load_passes reads them back.
+    with open(file_path, 'w') as passes_file:
+        json.dump( [ [ [ [ int(x) for x in arpeggio.pitch_numbers ], int(pitch_number) ] for arpeggio, pitch_number in selections ]
+            for selections in passes ], passes_file )
+
+def load_passes( file_path ):
+    with open(file_path) as passes_file:
+        return [ [ (melodySearch.Arpeggio( pitch_numbers ), pitch_number) for pitch_numbers, pitch_number in selections ]
+            for selections in json.load(passes_file) ]
+
+def load_script( file_name, module_name ):
+    #loads one of the scripts in this directory as a module; they are not importable by name (enfilade2.13.py),
+    #and their pieces only run under their main guards. Loading enfilade2.13.py imports abjad.
+    file_path = os.path.join(directory, file_name)
+    try:
+        import importlib.util
+    except ImportError:
+        import imp
+        return imp.load_source( module_name, file_path )
+    spec = importlib.util.spec_from_file_location( module_name, file_path )
+    module = importlib.util.module_from_spec( spec )
+    spec.loader.exec_module( module )
+    return module
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+#Runs the hidden-melody passes of make_enfilade (one per nth_time) on plain pitch numbers; does not import abjad.
+#Each pass draws from its own random stream, seeded by the seed and the pass's number, so a pass's chords do not depend on the other passes.
+#That makes the passes independent: they can run in a process pool and give the same result whatever the worker count or order.
+import itertools
+import multiprocessing
+import os
+import chordEngine
+import chordTables
+import melodySearch
+import pitchWeights
+import stageProfiler
+
+#the most chords a pass generates (in chunks, as the search pulls them) before it gives up on the rest of its melody; None: no ceiling.
+default_maximum_number_of_chords = 10000
+
+def make_pass_seeds( seed, number_of_passes ):
+    #[seed, nth_time] per pass, which numpy seeds from as a whole (SeedSequence.spawn would need Python 3's numpy, and abjad 2.13 is
+    #Python 2); pass n always gets the same stream for a given seed.
+    return [ [seed, nth_time] for nth_time in range(number_of_passes) ]
+
+def get_reachable_pitch_numbers( pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high ):
+    #the melody up to its first pitch that no chord in the range can contain; searching an endless chord stream for that pitch would never end.
+    for x, pitch_number in enumerate(pitch_numbers):
+        if 0 == chordEngine.get_pitch_probability( pitch_number, numeric_pitch_range_low, numeric_pitch_range_high ):
+            return pitch_numbers[:x]
+    return pitch_numbers
+
+def get_pass_pitch_numbers( pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high, sampling, pitch_weights_path = None ):
+    #the pitch numbers a pass searches for: all of them when conditioned, else the ones before the first the sampling can never reach.
+    #pitch_weights_path: the weights file of 'weighted' sampling (None for pitchWeights.weights_path).
+    if sampling == 'conditioned':
+        return pitch_numbers
+    if sampling == 'weighted':
+        sampler = pitchWeights.get_chord_sampler( numeric_pitch_range_low, numeric_pitch_range_high, pitch_weights_path )
+        return pitchWeights.get_reachable_pitch_numbers( pitch_numbers, sampler )
+    return get_reachable_pitch_numbers( pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high )
+
+def iterate_pass_arpeggios( pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high, sampling, random_state,
+    pitch_weights_path = None ):
+    #sampling: 'rejection' pulls from an endless chord stream; 'table' does too, drawing each chord from the range's chordTables.ChordTable;
+    #'weighted' does too, with the choices of make_chord weighted by the file at pitch_weights_path (None for pitchWeights.weights_path);
+    #'conditioned' makes one chord per melody pitch, each containing it.
+    if sampling == 'conditioned':
+        chords = chordEngine.make_conditioned_chord_batch( pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high, random_state )
+    elif sampling == 'table':
+        table = chordTables.get_chord_table( numeric_pitch_range_low, numeric_pitch_range_high )
+        chords = chordTables.iterate_chords( table, random_state )
+    elif sampling == 'weighted':
+        sampler = pitchWeights.get_chord_sampler( numeric_pitch_range_low, numeric_pitch_range_high, pitch_weights_path )
+        chords = pitchWeights.iterate_chords( sampler, random_state )
+    else:
+        chords = chordEngine.iterate_chords( numeric_pitch_range_low, numeric_pitch_range_high, random_state )
+    for chord_pitch_numbers in chords:
+        yield melodySearch.make_arpeggio( chord_pitch_numbers )
+
+def run_pass( pass_arguments ):
+    #pass_arguments: (hidden melody pitch numbers, numeric_pitch_range_low, numeric_pitch_range_high, sampling, pass seed,
+    #maximum_number_of_chords, pitch_weights_path). Returns the selected (arpeggio, pitch_number) pairs of the pass and the number of
+    #arpeggios the search pulled.
+    (pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high, sampling, pass_seed, maximum_number_of_chords,
+        pitch_weights_path) = pass_arguments
+    random_state = chordEngine.make_random_state( pass_seed )
+    pitch_numbers = get_pass_pitch_numbers( pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high, sampling, pitch_weights_path )
+    arpeggios = iterate_pass_arpeggios( pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high, sampling, random_state,
+        pitch_weights_path )
+    if maximum_number_of_chords is not None:
+        arpeggios = itertools.islice( arpeggios, maximum_number_of_chords )
+    number_of_arpeggios_searched = [0]
+    def count_arpeggios( arpeggios ):
+        for arpeggio in arpeggios:
+            number_of_arpeggios_searched[0] += 1
+            yield arpeggio
+    selections = list( melodySearch.search_melody( pitch_numbers, count_arpeggios( arpeggios ) ) )
+    return selections, number_of_arpeggios_searched[0]
+
+def search_pass( pass_arguments ):
+    #returns the selected (arpeggio, pitch_number) pairs of the pass; module level so process pools can pickle it.
+    selections, number_of_arpeggios_searched = run_pass( pass_arguments )
+    return selections
+
+def run_profiled_pass( pass_arguments, profiler, **labels ):
+    with profiler.stage( 'search_pass', **labels ):
+        selections, number_of_arpeggios_searched = run_pass( pass_arguments )
+    #each arpeggio the search pulled is one generated chord; all but the selected ones failed the contains_pitch test.
+    profiler.count( 'chords_generated', number_of_arpeggios_searched )
+    profiler.count( 'arpeggios_rejected', number_of_arpeggios_searched - len(selections) )
+    profiler.count( 'arpeggios_selected', len(selections) )
+    (pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high, sampling, pass_seed, maximum_number_of_chords,
+        pitch_weights_path) = pass_arguments
+    report = get_pass_report( pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high, selections, sampling,
+        maximum_number_of_chords, pitch_weights_path )
+    profiler.count( 'passes_at_chord_ceiling', int(report['hit_ceiling']) )
+    return selections
+
+def profile_pass( profile_arguments ):
+    #search_pass measured by its own stageProfiler.StageProfiler, for worker processes: returns the selections and the profiler's report.
+    #profile_arguments: (pass_arguments, whether to trace memory).
+    pass_arguments, memory = profile_arguments
+    profiler = stageProfiler.StageProfiler( memory )
+    selections = run_profiled_pass( pass_arguments, profiler )
+    profiler.stop()
+    return selections, profiler.get_report()
+
+def make_pass_arguments( hidden_melodies, numeric_pitch_range_low, numeric_pitch_range_high, seed, sampling = 'rejection',
+    maximum_number_of_chords = default_maximum_number_of_chords, pitch_weights_path = None ):
+    #the weights file goes to every pass as an absolute path: worker processes that re-import pitchWeights (spawn) only see the default.
+    if pitch_weights_path is None:
+        pitch_weights_path = pitchWeights.weights_path
+    pitch_weights_path = os.path.abspath(pitch_weights_path)
+    pass_seeds = make_pass_seeds( seed, len(hidden_melodies) )
+    pass_arguments = [ (pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high, sampling, pass_seed, maximum_number_of_chords,
+        pitch_weights_path) for pitch_numbers, pass_seed in zip(hidden_melodies, pass_seeds) ]
+    return pass_arguments
+
+def get_pass_report( pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high, selections, sampling = 'rejection',
+    maximum_number_of_chords = default_maximum_number_of_chords, pitch_weights_path = None ):
+    #what the pass of a hidden melody (pitch_numbers) embedded in its selections: melody_pitches, reachable_pitches (the melody up to
+    #its first pitch no chord contains), embedded_pitches, and hit_ceiling, true when the pass stopped at its maximum_number_of_chords
+    #with reachable pitches left unembedded.
+    reachable_pitch_numbers = get_pass_pitch_numbers( pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high, sampling,
+        pitch_weights_path )
+    return {
+        'melody_pitches': len(pitch_numbers),
+        'reachable_pitches': len(reachable_pitch_numbers),
+        'embedded_pitches': len(selections),
+        'maximum_number_of_chords': maximum_number_of_chords,
+        'hit_ceiling': len(selections) < len(reachable_pitch_numbers),
+        }
+
+def get_pass_reports( hidden_melodies, numeric_pitch_range_low, numeric_pitch_range_high, passes, sampling = 'rejection',
+    maximum_number_of_chords = default_maximum_number_of_chords, pitch_weights_path = None ):
+    #one get_pass_report per pass of search_passes' result, in pass order.
+    return [ get_pass_report( pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high, selections, sampling,
+        maximum_number_of_chords, pitch_weights_path ) for pitch_numbers, selections in zip(hidden_melodies, passes) ]
+
+def search_passes( hidden_melodies, numeric_pitch_range_low, numeric_pitch_range_high, seed, sampling = 'rejection', processes = None,
+    profiler = None, maximum_number_of_chords = default_maximum_number_of_chords, pitch_weights_path = None ):
+    #hidden_melodies: one list of transposed melody pitch numbers per pass. Returns each pass's selections, in pass order.
+    #processes: worker processes (None for one per pass, up to the number of cores; 1 runs the passes in this process).
+    #profiler: a stageProfiler.StageProfiler to add each pass's stage (labeled with its pass number) and counters to.
+    #maximum_number_of_chords: the ceiling on the chords of each pass; get_pass_reports tells which passes reached it.
+    #pitch_weights_path: the weights file of 'weighted' sampling (None for pitchWeights.weights_path).
+    pass_arguments = make_pass_arguments( hidden_melodies, numeric_pitch_range_low, numeric_pitch_range_high, seed, sampling,
+        maximum_number_of_chords, pitch_weights_path )
+    if processes is None:
+        processes = min( len(pass_arguments), multiprocessing.cpu_count() )
+    if processes <= 1 or len(pass_arguments) <= 1:
+        if profiler is None:
+            return [ search_pass( x ) for x in pass_arguments ]
+        return [ run_profiled_pass( x, profiler, nth_time = nth_time ) for nth_time, x in enumerate(pass_arguments) ]
+    pool = multiprocessing.Pool( processes )
+    try:
+        if profiler is None:
+            return pool.map( search_pass, pass_arguments, chunksize = 1 )
+        results = pool.map( profile_pass, [ (x, profiler.memory) for x in pass_arguments ], chunksize = 1 )
+    finally:
+        pool.close()
+        pool.join()
+    passes = [ ]
+    for nth_time, (selections, report) in enumerate(results):
+        profiler.add_report( report, nth_time = nth_time )
+        passes.append( selections )
+    return passes
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+#A resident enfilade server: a pool of worker processes keeps abjad and enfilade2.13.py loaded and takes requests over a local
+#Unix socket, so repeated renders skip the interpreter start, the abjad import and the file setup; renders go through renderCache.
+#One JSON request per line, every field optional:
+#{"melody": "g4 c' b", "range": ["c", "g'''"], "seed": 1, "passes": 3, "layout": "letter", "sampling": "rejection", "serializer": "abjad", "render": true}
+#answered by one JSON line: {"ok": true, "ly": path, "pdf": path, "seconds": s}, or {"ok": false, "error": message, "seconds": s}.
+#The workers run enfilade2.13.py, so serve under the Python 2 that has abjad 2.13; the request client runs under either Python.
+#usage: python2 enfiladeServer.py serve --output-directory renders --workers 4
+#       python enfiladeServer.py request --seed 3 --layout letter
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+import batchRender
+import enfiladeCore
+import renderCache
+
+default_socket_path = os.path.join(tempfile.gettempdir(), 'enfilade.sock')
+request_defaults = {
+    'melody': enfiladeCore.melody_string,
+    'range': list(enfiladeCore.pitch_range_tuple),
+    'seed': enfiladeCore.random_seed,
+    'passes': len(enfiladeCore.nth_time_dictionary),
+    'layout': 'tabloid',
+    'sampling': 'rejection',
+    'serializer': 'abjad',
+    'render': True,
+    }
+
+#set in each worker process by load_worker.
+worker_settings = {'enfilade': None, 'error': None}
+
+def load_worker( output_directory, lilypond_command, cache_directory ):
+    #the pool's initializer: imports abjad once per worker. A failed import is answered to every request instead of killing the worker.
+    worker_settings.update( output_directory = output_directory, lilypond_command = lilypond_command, cache_directory = cache_directory )
+    try:
+        worker_settings['enfilade'] = enfiladeCore.load_script( 'enfilade2.13.py', 'enfilade' )
+    except Exception as error:
+        worker_settings['error'] = '%s: %s' % (type(error).__name__, error)
+
+def check_abjad():
+    #fails at start, rather than on every request, under an interpreter the workers could not load enfilade2.13.py in.
+    try:
+        import abjad
+    except ImportError as error:
+        raise RuntimeError('the server needs abjad 2.13, which runs under Python 2 (%s: %s).' % (type(error).__name__, error))
+
+def get_request_name( request ):
+    #the same request always writes to the same files.
+    key = hashlib.sha256( json.dumps( request, sort_keys = True ).encode('utf-8') ).hexdigest()[:12]
+    return 'enfilade_%s_seed_%s_%s' % (request['layout'], request['seed'], key)
+
+def handle_request( fields ):
+    #runs in a worker; returns the response dictionary and never raises.
+    start_time = time.time()
+    try:
+        unknown_fields = sorted( set(fields) - set(request_defaults) )
+        if unknown_fields:
+            raise ValueError('unknown request fields: %s.' % ', '.join(unknown_fields))
+        if worker_settings['error'] is not None:
+            raise RuntimeError('the worker could not load enfilade2.13.py: %s' % worker_settings['error'])
+        request = dict( request_defaults )
+        request.update( fields )
+        enfilade = worker_settings['enfilade']
+        if request['layout'] not in enfilade.layout_presets:
+            raise ValueError('unknown layout %r; choose from %s.' % (request['layout'], ', '.join(sorted(enfilade.layout_presets))))
+        #processes = 1: pool workers can not start processes of their own.
+        ly_string = enfilade.format_enfilade( enfilade.Voice(request['melody']), tuple(request['range']), request['sampling'], 1,
+            request['seed'], request['serializer'], request['passes'], request['layout'] )
+        name = get_request_name( request )
+        output_directory = worker_settings['output_directory']
+        if request['render']:
+            report = batchRender.render_job( (name, ly_string, output_directory, worker_settings['lilypond_command'], False,
+                worker_settings['cache_directory']) )
+            if report['failed']:
+                response = {'ok': False, 'error': report['error'], 'ly': report['ly']}
+            else:
+                response = {'ok': True, 'ly': report['ly']}
+                for output_path in report['outputs']:
+                    response[ os.path.splitext(output_path)[1][1:] ] = output_path
+        else:
+            ly_path = os.path.join(output_directory, name + '.ly')
+            with open(ly_path, 'w') as ly_file:
+                ly_file.write(ly_string)
+            response = {'ok': True, 'ly': ly_path}
+    except Exception as error:
+        response = {'ok': False, 'error': '%s: %s' % (type(error).__name__, error)}
+    response['seconds'] = time.time() - start_time
+    return response
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    #one thread per connection; the work itself goes to the server's process pool, so connections wait on each other only for workers.
+
+    def handle(self):
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                fields = json.loads( line.decode('utf-8') )
+                if not isinstance(fields, dict):
+                    raise ValueError('a request is a JSON object.')
+            except ValueError as error:
+                response = {'ok': False, 'error': 'bad request: %s' % error}
+            else:
+                response = self.server.pool.apply_async( handle_request, (fields,) ).get()
+            self.wfile.write( (json.dumps( response, sort_keys = True ) + '\n').encode('utf-8') )
+            self.wfile.flush()
+
+class EnfiladeServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, pool):
+        socketserver.UnixStreamServer.__init__( self, socket_path, RequestHandler )
+        self.pool = pool
+
+def is_serving( socket_path ):
+    client = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+    try:
+        client.connect( socket_path )
+    except socket.error:
+        return False
+    finally:
+        client.close()
+    return True
+
+def stop_serving( signal_number, frame ):
+    raise SystemExit(0)
+
+def serve( socket_path = default_socket_path, output_directory = '.', workers = None, lilypond_command = 'lilypond',
+    cache_directory = renderCache.default_cache_directory ):
+    #serves until interrupted. workers: default one per core.
+    check_abjad()
+    if os.path.exists(socket_path):
+        if is_serving( socket_path ):
+            raise RuntimeError('a server is already listening on %s.' % socket_path)
+        os.remove(socket_path)
+    output_directory = os.path.abspath(output_directory)
+    if not os.path.isdir(output_directory):
+        os.makedirs(output_directory)
+    pool = multiprocessing.Pool( workers, load_worker, (output_directory, lilypond_command, cache_directory) )
+    server = EnfiladeServer( socket_path, pool )
+    #so kill cleans up the socket and the workers, as Control-C does.
+    signal.signal( signal.SIGTERM, stop_serving )
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        pool.terminate()
+        pool.join()
+
+def send_request( fields, socket_path = default_socket_path ):
+    #a client: sends one request and returns the response dictionary.
+    client = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+    try:
+        client.connect( socket_path )
+        client.sendall( (json.dumps( fields ) + '\n').encode('utf-8') )
+        client.shutdown( socket.SHUT_WR )
+        response_file = client.makefile('rb')
+        line = response_file.readline()
+        response_file.close()
+    finally:
+        client.close()
+    if not line:
+        raise RuntimeError('the server closed the connection without answering.')
+    return json.loads( line.decode('utf-8') )
+
+def main( arguments = None ):
+    parser = argparse.ArgumentParser( description = 'A resident enfilade server on a Unix socket, and its client.' )
+    parser.add_argument( '--socket', default = default_socket_path )
+    subparsers = parser.add_subparsers( dest = 'command' )
+    serve_parser = subparsers.add_parser( 'serve' )
+    serve_parser.add_argument( '--output-directory', default = '.' )
+    serve_parser.add_argument( '--workers', type = int, default = None, help = 'default: one per core' )
+    serve_parser.add_argument( '--lilypond', default = 'lilypond' )
+    serve_parser.add_argument( '--no-cache', action = 'store_true', help = 'always run LilyPond' )
+    request_parser = subparsers.add_parser( 'request' )
+    request_parser.add_argument( '--melody' )
+    request_parser.add_argument( '--range', nargs = 2, metavar = ('LOW', 'HIGH') )
+    request_parser.add_argument( '--seed', type = int )
+    request_parser.add_argument( '--passes', type = int )
+    request_parser.add_argument( '--layout' )
+    request_parser.add_argument( '--sampling', choices = ('rejection', 'table', 'weighted', 'conditioned') )
+    request_parser.add_argument( '--serializer', choices = ('abjad', 'fast') )
+    request_parser.add_argument( '--no-render', action = 'store_true', help = 'only write the .ly' )
+    arguments = parser.parse_args( arguments )
+    if arguments.command == 'serve':
+        cache_directory = None if arguments.no_cache else renderCache.default_cache_directory
+        serve( arguments.socket, arguments.output_directory, arguments.workers, arguments.lilypond, cache_directory )
+        return 0
+    if arguments.command == 'request':
+        fields = { }
+        for name in ('melody', 'range', 'seed', 'passes', 'layout', 'sampling', 'serializer'):
+            if getattr(arguments, name) is not None:
+                fields[name] = getattr(arguments, name)
+        if arguments.no_render:
+            fields['render'] = False
+        response = send_request( fields, arguments.socket )
+        json.dump( response, sys.stdout, indent = 2, sort_keys = True )
+        sys.stdout.write( '\n' )
+        return 0 if response['ok'] else 1
+    parser.print_help()
+    return 2
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+#Finding a hidden melody in a stream of arpeggios, on plain pitch numbers (c' = 0, as in abjad); does not import abjad.
+#Each arpeggio carries an integer bitmask of its sounding pitches, so "does this arpeggio contain pitch p" is one bit test.
+
+import re
+
+#bit 0 of a pitch mask is c,,,, (MIDI note 0); every carillon range sits well above it.
+lowest_mask_pitch_number = -60
+
+def make_pitch_mask( pitch_numbers ):
+    pitch_mask = 0
+    for pitch_number in pitch_numbers:
+        if pitch_number < lowest_mask_pitch_number:
+            raise ValueError('pitch number %s is below the pitch mask range.' % pitch_number)
+        pitch_mask |= 1 << (pitch_number - lowest_mask_pitch_number)
+    return pitch_mask
+
+def mask_contains_pitch( pitch_mask, pitch_number ):
+    if pitch_number < lowest_mask_pitch_number:
+        return False
+    return bool( (pitch_mask >> (pitch_number - lowest_mask_pitch_number)) & 1 )
+
+class Arpeggio(object):
+    #an arpeggiated chord: its pitch numbers in playing order and their pitch mask.
+    __slots__ = ('pitch_numbers', 'pitch_mask')
+
+    def __init__(self, pitch_numbers):
+        self.pitch_numbers = pitch_numbers
+        self.pitch_mask = make_pitch_mask( pitch_numbers )
+
+    def contains_pitch_number(self, pitch_number):
+        return mask_contains_pitch( self.pitch_mask, pitch_number )
+
+def search_melody( pitch_numbers, arpeggios ):
+    #yields (arpeggio, pitch_number) for each arpeggio that contains the next melody pitch, in order.
+    #arpeggios may be an endless generator: nothing more is pulled from it once the last melody pitch is found.
+    pitch_index = 0
+    if pitch_index == len(pitch_numbers):
+        return
+    for arpeggio in arpeggios:
+        pitch_number_to_check = pitch_numbers[ pitch_index ]
+        if arpeggio.contains_pitch_number( pitch_number_to_check ):
+            yield arpeggio, pitch_number_to_check
+            pitch_index += 1
+            if pitch_index == len(pitch_numbers):
+                return
+
+def make_arpeggio( chord_pitch_numbers ):
+    #chords are stored lowest pitch first and arpeggiated from the top down.
+    ordered_pitch_numbers = list( chord_pitch_numbers )
+    ordered_pitch_numbers.reverse()
+    return Arpeggio( ordered_pitch_numbers )
+
+#pitch names in LilyPond's English-style input, as abjad reads them: c = -12, c' = 0, cs' = 1, ef' = 3.
+pitch_class_numbers = {'c': 0, 'd': 2, 'e': 4, 'f': 5, 'g': 7, 'a': 9, 'b': 11}
+pitch_name_pattern = re.compile(r"^([a-g])((?:s|f)*)([',]*)")
+
+def get_pitch_number_from_pitch_name( pitch_name ):
+    match = pitch_name_pattern.match( pitch_name )
+    if match is None:
+        raise ValueError('can not read a pitch from %r.' % pitch_name)
+    letter, accidentals, octave_ticks = match.groups()
+    pitch_number = pitch_class_numbers[letter] - 12
+    pitch_number += accidentals.count('s') - accidentals.count('f')
+    pitch_number += 12 * (octave_ticks.count("'") - octave_ticks.count(','))
+    return pitch_number
+
+duration_pattern = re.compile(r"(\d+)(\.*)$")
+
+def get_notes_from_melody_string( melody_string ):
+    #"g4 c' b2." -> [(-5, (1, 4)), (0, (1, 4)), (-1, (3, 4))]: pitch numbers and whole-note durations; as in LilyPond, a note without a duration takes the previous one.
+    notes = [ ]
+    duration = (1, 4)
+    for note_string in melody_string.split():
+        match = duration_pattern.search( note_string )
+        if match is not None:
+            denominator = int(match.group(1))
+            dots = len(match.group(2))
+            duration = ((2 ** (dots + 1) - 1), denominator * 2 ** dots)
+        notes.append( (get_pitch_number_from_pitch_name( note_string ), duration) )
+    return notes
+
+def get_pitch_numbers_from_melody_string( melody_string ):
+    #"g4 c' b e" -> [-5, 0, -1, -8]: the pitches of a note-entry string like the one the scripts build the melody Voice from; durations are ignored.
+    return [ get_pitch_number_from_pitch_name( x ) for x in melody_string.split() ]
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+#Writes Standard MIDI Files straight from pitch numbers (c' = 0, as in abjad), without a LilyPond run; does not import abjad.
+#A piece is a list of notes (start, duration, pitch number, dynamic) with durations in whole notes as (numerator, denominator)
+#pairs, plus tempo changes (start, units per minute of a quarter). Dynamics are the names DynamicMark takes ('ppp' .. 'fff').
+import multiprocessing
+import struct
+from fractions import Fraction
+import renderCache
+
+ticks_per_quarter = 480
+#General MIDI program 14, tubular bells: the nearest instrument to a carillon.
+bell_program = 14
+dynamic_velocities = {'ppp': 16, 'pp': 33, 'p': 49, 'mp': 64, 'mf': 80, 'f': 96, 'ff': 112, 'fff': 127}
+
+def get_midi_note_number( pitch_number ):
+    return pitch_number + 60
+
+def get_ticks( duration ):
+    #duration: whole notes, as a number or a (numerator, denominator) pair.
+    if isinstance(duration, tuple):
+        duration = Fraction(*duration)
+    return int( Fraction(duration) * 4 * ticks_per_quarter )
+
+def encode_variable_length_quantity( value ):
+    encoded = [ value & 0x7f ]
+    value >>= 7
+    while value:
+        encoded.append( (value & 0x7f) | 0x80 )
+        value >>= 7
+    encoded.reverse()
+    return bytes(bytearray(encoded))
+
+def make_track_events( notes, tempi, program = bell_program, channel = 0 ):
+    #returns (tick, order, event bytes) triples; at the same tick tempo comes first, then note offs, then note ons.
+    events = [ (0, 0, bytes(bytearray([0xc0 | channel, program]))) ]
+    for start, units_per_minute in tempi:
+        microseconds_per_quarter = int(round(60000000.0 / units_per_minute))
+        events.append( (get_ticks( start ), 0, b'\xff\x51\x03' + struct.pack('>I', microseconds_per_quarter)[1:]) )
+    for start, duration, pitch_number, dynamic in notes:
+        note_number = get_midi_note_number( pitch_number )
+        if not 0 <= note_number <= 127:
+            raise ValueError('pitch number %s is outside the MIDI range.' % pitch_number)
+        start_tick = get_ticks( start )
+        stop_tick = start_tick + get_ticks( duration )
+        velocity = dynamic_velocities[dynamic]
+        events.append( (start_tick, 2, bytes(bytearray([0x90 | channel, note_number, velocity]))) )
+        events.append( (stop_tick, 1, bytes(bytearray([0x80 | channel, note_number, 0]))) )
+    events.sort( key = lambda x: (x[0], x[1]) )
+    return events
+
+def make_midi_bytes( notes, tempi, program = bell_program ):
+    #a format 0 Standard MIDI File holding one track.
+    track = bytearray()
+    previous_tick = 0
+    for tick, order, event in make_track_events( notes, tempi, program ):
+        track += encode_variable_length_quantity( tick - previous_tick ) + event
+        previous_tick = tick
+    track += b'\x00\xff\x2f\x00'
+    header = b'MThd' + struct.pack('>IHHH', 6, 0, 1, ticks_per_quarter)
+    return header + b'MTrk' + struct.pack('>I', len(track)) + bytes(track)
+
+def write_midi_file( file_path, notes, tempi, program = bell_program ):
+    with open(file_path, 'wb') as midi_file:
+        midi_file.write( make_midi_bytes( notes, tempi, program ) )
+    return file_path
+
+#pieces
+
+def make_chord_notes( chords, start = 0, duration = (1,4), dynamic = 'mf' ):
+    #chords: lists of pitch numbers (a chordEngine.ChordBatch will do), one after another. Returns (notes, stop).
+    notes = [ ]
+    start = Fraction(start)
+    for pitch_numbers in chords:
+        for pitch_number in pitch_numbers:
+            notes.append( (start, duration, pitch_number, dynamic) )
+        start += Fraction(*duration)
+    return notes, start
+
+def make_arpeggio_notes( arpeggios, start = 0, duration = (1,16), dynamic = 'mf' ):
+    #arpeggios: lists of pitch numbers in playing order, or (pitch numbers, {note index: dynamic}) pairs; a dynamic lasts until the next one.
+    notes = [ ]
+    start = Fraction(start)
+    for arpeggio in arpeggios:
+        if isinstance(arpeggio, tuple):
+            pitch_numbers, dynamics = arpeggio
+        else:
+            pitch_numbers, dynamics = arpeggio, { }
+        for index, pitch_number in enumerate(pitch_numbers):
+            dynamic = dynamics.get(index, dynamic)
+            notes.append( (start, duration, pitch_number, dynamic) )
+            start += Fraction(*duration)
+    return notes, start
+
+def make_enfilade_notes( melody_notes, passes, nth_time_dictionary, melody_tempo = 40, arpeggio_tempo = 48 ):
+    #the enfilade as make_enfilade_staff lays it out: the melody (TempoMark 40, forte), then each pass's selected arpeggios (TempoMark 48)
+    #at the pass's arpeggio dynamic, the hidden melody note at its melody dynamic, and the note after it back at the arpeggio dynamic.
+    #melody_notes: (pitch number, duration) pairs; passes: the selections of enfiladePasses.search_passes. Returns (notes, tempi).
+    notes = [ ]
+    start = Fraction(0)
+    for pitch_number, duration in melody_notes:
+        notes.append( (start, duration, pitch_number, 'f') )
+        start += Fraction(*duration)
+    tempi = [ (0, melody_tempo), (start, arpeggio_tempo) ]
+    arpeggios = [ ]
+    for nth_time, selections in enumerate(passes):
+        arpeggio_dynamic, melody_note_dynamic = nth_time_dictionary[nth_time][1:]
+        for arpeggio, pitch_number_to_check in selections:
+            dynamics = {0: arpeggio_dynamic}
+            for x, pitch_number in enumerate(arpeggio.pitch_numbers):
+                if pitch_number == pitch_number_to_check:
+                    dynamics[x] = melody_note_dynamic
+                    dynamics[x + 1] = arpeggio_dynamic
+            arpeggios.append( (arpeggio.pitch_numbers, dynamics) )
+    arpeggio_notes, stop = make_arpeggio_notes( arpeggios, start )
+    notes.extend( arpeggio_notes )
+    return notes, tempi
+
+def write_midi_job( job ):
+    #job: (file_path, notes, tempi); module level so process pools can pickle it.
+    file_path, notes, tempi = job
+    return write_midi_file( file_path, notes, tempi )
+
+def write_midi_files( jobs, processes = 1 ):
+    #jobs: (file_path, notes, tempi) triples, for sweeps; processes above 1 spread large batches over a process pool.
+    if processes == 1:
+        return [ write_midi_job( x ) for x in jobs ]
+    pool = multiprocessing.Pool( processes )
+    try:
+        return pool.map( write_midi_job, jobs, chunksize = 16 )
+    finally:
+        pool.close()
+        pool.join()
+
+def play( file_path ):
+    #opens a written MIDI file in the platform's player, as abjad's play() does.
+    renderCache.open_file( file_path )
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+#make_chord with weighted choices: the "pitch-dependent probability table" of the scripts' header comment; does not import abjad.
+#A weights file (JSON, see pitchWeights.json, which gives make_chord's own uniform choices) weights each choice make_chord makes:
+#  bottom_distances: one weight per distance of the bottom pitch above the bottom of the range;
+#  bottom_intervals, lower_steps, upper_steps: {semitones: weight} for the bottom interval, the steps up to 2/3 of the range, and the rest;
+#  pitch_classes: twelve weights (c first) that multiply the weight of every choice landing on a pitch of that class;
+#  registers: [{"low": pitch number, "high": pitch number, "lower_steps": {...}, ...}], each replacing tables for choices made from
+#  pitches between low and high (inclusive). Later registers win.
+#The tables are compiled, per range, into alias-method samplers (Vose), so every weighted draw is one uniform column, one uniform
+#number and one comparison, made for the whole batch at once.
+import json
+import os
+import numpy
+import chordEngine
+
+step_table_names = ('bottom_intervals', 'lower_steps', 'upper_steps')
+weights_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pitchWeights.json')
+
+chord_samplers = { }
+
+class AliasTable(object):
+    #one alias-method sampler per row: column x is kept with probability probabilities[row, x], else replaced by aliases[row, x].
+    __slots__ = ('probabilities', 'aliases')
+
+    def __init__(self, probabilities, aliases):
+        self.probabilities = probabilities
+        self.aliases = aliases
+
+    def draw(self, rows, random_state):
+        #one column per entry of rows, drawn with probability proportional to that row's weights.
+        columns = random_state.randint(0, self.probabilities.shape[1], size = len(rows))
+        keep = random_state.random_sample(len(rows)) < self.probabilities[rows, columns]
+        return numpy.where(keep, columns, self.aliases[rows, columns])
+
+def make_alias_table( weights ):
+    #weights: an (n, k) array, each row with a positive sum.
+    weights = numpy.asarray(weights, dtype = float)
+    number_of_rows, number_of_columns = weights.shape
+    probabilities = numpy.ones((number_of_rows, number_of_columns))
+    aliases = numpy.tile(numpy.arange(number_of_columns), (number_of_rows, 1))
+    for row in range(number_of_rows):
+        scaled = weights[row] * number_of_columns / weights[row].sum()
+        small = [ x for x in range(number_of_columns) if scaled[x] < 1.0 ]
+        large = [ x for x in range(number_of_columns) if scaled[x] >= 1.0 ]
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            probabilities[row, less] = scaled[less]
+            aliases[row, less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+        #what is left is 1 up to rounding.
+        for x in small + large:
+            probabilities[row, x] = 1.0
+    return AliasTable(probabilities, aliases)
+
+def load_weights( file_path = None ):
+    #file_path: defaults to weights_path.
+    if file_path is None:
+        file_path = weights_path
+    with open(file_path) as weights_file:
+        weights = json.load(weights_file)
+    weights.setdefault('registers', [ ])
+    for tables in [weights] + weights['registers']:
+        for name in step_table_names:
+            for step in tables.get(name, { }):
+                if int(step) <= 0:
+                    raise ValueError('%s: %s steps must be positive, not %s.' % (file_path, name, step))
+    if len(weights['pitch_classes']) != 12:
+        raise ValueError('%s: pitch_classes needs twelve weights.' % file_path)
+    return weights
+
+def get_step_table( weights, name, pitch_number ):
+    #the {semitones: weight} table for choices made from pitch_number.
+    step_table = weights[name]
+    for register in weights['registers']:
+        if name in register and register['low'] <= pitch_number <= register['high']:
+            step_table = register[name]
+    return dict( (int(step), weight) for step, weight in step_table.items() )
+
+class ChordSampler(object):
+    #the compiled weights of one range. Row (phase * number_of_sources + pitch_number - numeric_pitch_range_low) of steps and
+    #step_alias_table holds the choices from that pitch in that phase (0: bottom interval, 1: lower steps, 2: upper steps).
+    #reachable_pitch_numbers: every pitch some weighted chord can contain.
+    __slots__ = ('numeric_pitch_range_low', 'numeric_pitch_range_high', 'bottom_distances', 'bottom_alias_table', 'steps',
+        'step_alias_table', 'number_of_sources', 'reachable_pitch_numbers')
+
+    def __init__(self, weights, numeric_pitch_range_low, numeric_pitch_range_high):
+        self.numeric_pitch_range_low = numeric_pitch_range_low
+        self.numeric_pitch_range_high = numeric_pitch_range_high
+        pitch_class_weights = numpy.asarray(weights['pitch_classes'], dtype = float)
+        self.bottom_distances = numpy.arange(len(weights['bottom_distances']))
+        bottom_weights = numpy.asarray(weights['bottom_distances'], dtype = float)
+        bottom_weights = bottom_weights * pitch_class_weights[(numeric_pitch_range_low + self.bottom_distances) % 12]
+        if not bottom_weights.sum() > 0:
+            raise ValueError('no bottom pitch has a positive weight.')
+        self.bottom_alias_table = make_alias_table( bottom_weights[None, :] )
+        self.number_of_sources = int(numeric_pitch_range_high) - numeric_pitch_range_low + 1
+        step_tables = [ [ sorted( get_step_table( weights, name, numeric_pitch_range_low + source ).items() )
+            for source in range(self.number_of_sources) ] for name in step_table_names ]
+        #a register's table may have more choices than the base tables.
+        width = max( len(step_table) for phase_tables in step_tables for step_table in phase_tables )
+        self.steps = numpy.ones((3 * self.number_of_sources, width), dtype = numpy.int16)
+        step_weights = numpy.zeros((3 * self.number_of_sources, width))
+        for phase, phase_tables in enumerate(step_tables):
+            for source, step_table in enumerate(phase_tables):
+                pitch_number = numeric_pitch_range_low + source
+                row = phase * self.number_of_sources + source
+                for column, (step, weight) in enumerate(step_table):
+                    self.steps[row, column] = step
+                    step_weights[row, column] = weight * pitch_class_weights[(pitch_number + step) % 12]
+        self.reachable_pitch_numbers = self.get_reachable_pitch_numbers( bottom_weights, step_weights )
+        #rows no chord reaches may have no weight at all; any positive weights do for their alias tables.
+        step_weights[step_weights.sum(axis = 1) == 0, 0] = 1.0
+        self.step_alias_table = make_alias_table( step_weights )
+
+    def get_reachable_pitch_numbers(self, bottom_weights, step_weights):
+        #follows every choice with a positive weight; raises ValueError if a chord can reach a pitch it can not go on from.
+        lower_step_ceiling = chordEngine.get_lower_step_ceiling( self.numeric_pitch_range_high )
+        frontier = [ (self.numeric_pitch_range_low + int(x), 0) for x in self.bottom_distances[bottom_weights > 0] ]
+        seen = set(frontier)
+        while frontier:
+            pitch_number, phase = frontier.pop()
+            if phase and pitch_number > int(self.numeric_pitch_range_high):
+                continue
+            row = phase * self.number_of_sources + pitch_number - self.numeric_pitch_range_low
+            if not step_weights[row].sum() > 0:
+                raise ValueError('a chord can reach pitch number %s but no %s step from it has a positive weight.'
+                    % (pitch_number, step_table_names[phase]))
+            for step in self.steps[row][step_weights[row] > 0]:
+                next_pitch_number = pitch_number + int(step)
+                next_state = (next_pitch_number, 1 if next_pitch_number <= lower_step_ceiling else 2)
+                if next_state not in seen:
+                    seen.add(next_state)
+                    frontier.append(next_state)
+        return frozenset( pitch_number for pitch_number, phase in seen )
+
+    def get_rows(self, pitch_numbers, phases):
+        return phases * self.number_of_sources + numpy.clip(pitch_numbers - self.numeric_pitch_range_low, 0, self.number_of_sources - 1)
+
+def get_chord_sampler( numeric_pitch_range_low, numeric_pitch_range_high, file_path = None ):
+    #the ChordSampler of a range and weights file, compiled once per process (and again if the file changes).
+    if file_path is None:
+        file_path = weights_path
+    key = (os.path.abspath(file_path), os.path.getmtime(file_path), numeric_pitch_range_low, numeric_pitch_range_high)
+    if key not in chord_samplers:
+        chord_samplers[key] = ChordSampler( load_weights( file_path ), numeric_pitch_range_low, numeric_pitch_range_high )
+    return chord_samplers[key]
+
+def make_chord_batch( number_of_chords, sampler, random_state ):
+    #chordEngine.make_chord_batch with the sampler's weights; with pitchWeights.json, the same distribution (drawn differently).
+    numeric_pitch_range_high = int(sampler.numeric_pitch_range_high)
+    lower_step_ceiling = chordEngine.get_lower_step_ceiling( sampler.numeric_pitch_range_high )
+    rows = numpy.zeros(number_of_chords, dtype = numpy.intp)
+    distances = sampler.bottom_distances[ sampler.bottom_alias_table.draw( rows, random_state ) ]
+    current_pitch_numbers = (sampler.numeric_pitch_range_low + distances).astype(numpy.int16)
+    columns = [ current_pitch_numbers ]
+    phases = numpy.zeros(number_of_chords, dtype = numpy.intp)
+    active = numpy.ones(number_of_chords, dtype = bool)
+    lengths = numpy.ones(number_of_chords, dtype = numpy.intp)
+    while active.any():
+        rows = sampler.get_rows( current_pitch_numbers, phases )
+        steps = sampler.steps[rows, sampler.step_alias_table.draw( rows, random_state )]
+        current_pitch_numbers = numpy.where(active, current_pitch_numbers + steps, current_pitch_numbers).astype(numpy.int16)
+        columns.append(numpy.where(active, current_pitch_numbers, 0).astype(numpy.int16))
+        lengths += active
+        phases = numpy.where(current_pitch_numbers <= lower_step_ceiling, 1, 2)
+        active = current_pitch_numbers <= numeric_pitch_range_high
+    return chordEngine.ChordBatch(numpy.stack(columns, axis = 1), lengths)
+
+def iterate_chords( sampler, random_state, chunk_size = 16 ):
+    #chordEngine.iterate_chords, with the sampler's weights.
+    while True:
+        for pitch_numbers in make_chord_batch( chunk_size, sampler, random_state ):
+            yield pitch_numbers
+
+def get_reachable_pitch_numbers( pitch_numbers, sampler ):
+    #enfiladePasses.get_reachable_pitch_numbers under the sampler's weights: the melody up to its first pitch no weighted chord contains.
+    for x, pitch_number in enumerate(pitch_numbers):
+        if pitch_number not in sampler.reachable_pitch_numbers:
+            return pitch_numbers[:x]
+    return pitch_numbers
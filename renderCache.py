@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+#A content-addressed cache of LilyPond output, so an unchanged .ly is never engraved twice; does not import abjad.
+#The key hashes the .ly text without its comment lines (abjad dates every file it formats), the contents of every file it \include's
+#that exists on disk (fontTree.ly), and the LilyPond version.
+#Each key gets a directory under the cache directory holding its .pdf and .midi; entries are evicted by age, then by total size, oldest first.
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+default_cache_directory = os.path.join(os.path.expanduser('~'), '.cache', 'enfilade', 'renders')
+default_maximum_bytes = 1024 * 1024 * 1024
+default_maximum_age_seconds = 30 * 24 * 60 * 60
+output_extensions = ('.pdf', '.midi', '.mid')
+include_pattern = re.compile(r'^\s*\\include\s+"([^"]+)"', re.MULTILINE)
+
+lilypond_versions = { }
+
+def get_lilypond_version( lilypond_command = 'lilypond' ):
+    #the first line of lilypond --version, asked once per command.
+    if lilypond_command not in lilypond_versions:
+        output = subprocess.check_output( [lilypond_command, '--version'] )
+        lilypond_versions[lilypond_command] = output.decode('utf-8', 'replace').strip().split('\n')[0]
+    return lilypond_versions[lilypond_command]
+
+def get_include_file_paths( ly_string, directory = None ):
+    #the \include'd files that exist on disk; LilyPond's own includes (english.ly) are covered by the version.
+    file_paths = [ ]
+    for include in include_pattern.findall( ly_string ):
+        file_path = include
+        if not os.path.isabs(file_path) and directory is not None:
+            file_path = os.path.join(directory, file_path)
+        if os.path.isfile(file_path):
+            file_paths.append(file_path)
+    return file_paths
+
+def get_uncommented_lines( ly_string ):
+    #the lines of ly_string that are not whole-line % comments, such as the Abjad revision and date abjad heads every file with.
+    return [ x for x in ly_string.split('\n') if not x.startswith('%') ]
+
+def make_cache_key( ly_string, lilypond_version, directory = None ):
+    key = hashlib.sha256()
+    key.update( lilypond_version.encode('utf-8') + b'\0' )
+    key.update( '\n'.join( get_uncommented_lines( ly_string ) ).encode('utf-8') + b'\0' )
+    for file_path in get_include_file_paths( ly_string, directory ):
+        with open(file_path, 'rb') as include_file:
+            key.update( file_path.encode('utf-8') + b'\0' + include_file.read() + b'\0' )
+    return key.hexdigest()
+
+def get_cached_outputs( entry_directory ):
+    #maps extension ('.pdf', '.midi') to path for the outputs of one cache entry.
+    outputs = { }
+    if os.path.isdir(entry_directory):
+        for file_name in os.listdir(entry_directory):
+            extension = os.path.splitext(file_name)[1]
+            if extension in output_extensions:
+                outputs[extension] = os.path.join(entry_directory, file_name)
+    return outputs
+
+#a LilyPond run is split in three so asyncRender can await the process in between: write_lilypond_input, the process,
+#check_lilypond_exit.
+
+def write_lilypond_input( ly_string, output_directory, lilypond_command = 'lilypond', file_name = 'score' ):
+    #writes output_directory/file_name.ly and returns the command line that engraves it (run with output_directory as working directory).
+    ly_path = os.path.join(output_directory, file_name + '.ly')
+    with open(ly_path, 'w') as ly_file:
+        ly_file.write(ly_string)
+    return [lilypond_command, '-o', os.path.join(output_directory, file_name), ly_path]
+
+def check_lilypond_exit( returncode, lilypond_command, log ):
+    #raises CalledProcessError with LilyPond's log if it failed.
+    if returncode != 0:
+        raise subprocess.CalledProcessError( returncode, lilypond_command, log )
+
+def run_lilypond( ly_string, output_directory, lilypond_command = 'lilypond', file_name = 'score' ):
+    #engraves ly_string in output_directory; returns the seconds LilyPond took. Raises CalledProcessError with LilyPond's log on failure.
+    command = write_lilypond_input( ly_string, output_directory, lilypond_command, file_name )
+    start_time = time.time()
+    process = subprocess.Popen( command, cwd = output_directory, stdout = subprocess.PIPE, stderr = subprocess.STDOUT )
+    log = process.communicate()[0]
+    check_lilypond_exit( process.returncode, lilypond_command, log )
+    return time.time() - start_time
+
+#a cached render is split the same way: look_up_entry (which may run lilypond --version), a LilyPond run in the working directory
+#of make_working_directory, commit_entry, then evict.
+
+def look_up_entry( ly_string, cache_directory = default_cache_directory, lilypond_command = 'lilypond', directory = None ):
+    #returns (key, entry directory, outputs); outputs is empty on a cache miss. directory: where relative \include's are resolved.
+    key = make_cache_key( ly_string, get_lilypond_version( lilypond_command ), directory )
+    entry_directory = os.path.join(cache_directory, key)
+    outputs = get_cached_outputs( entry_directory )
+    if outputs:
+        #the entry's modification time is its last use, for eviction.
+        os.utime(entry_directory, None)
+    return key, entry_directory, outputs
+
+def make_working_directory( cache_directory, key ):
+    #a fresh directory to run LilyPond in; commit_entry turns it into the key's entry.
+    if not os.path.isdir(cache_directory):
+        os.makedirs(cache_directory)
+    return tempfile.mkdtemp(prefix = key + '.', dir = cache_directory)
+
+def commit_entry( working_directory, entry_directory ):
+    try:
+        os.rename(working_directory, entry_directory)
+    except OSError:
+        #another process rendered the same key first.
+        shutil.rmtree(working_directory, ignore_errors = True)
+
+def render_and_time_lilypond_string( ly_string, cache_directory = default_cache_directory, lilypond_command = 'lilypond',
+    directory = None, maximum_bytes = default_maximum_bytes, maximum_age_seconds = default_maximum_age_seconds ):
+    #render_lilypond_string, also returning the seconds LilyPond ran: (outputs, seconds), seconds 0.0 on a cache hit.
+    key, entry_directory, outputs = look_up_entry( ly_string, cache_directory, lilypond_command, directory )
+    if outputs:
+        return outputs, 0.0
+    working_directory = make_working_directory( cache_directory, key )
+    try:
+        lilypond_seconds = run_lilypond( ly_string, working_directory, lilypond_command )
+    except:
+        shutil.rmtree(working_directory, ignore_errors = True)
+        raise
+    commit_entry( working_directory, entry_directory )
+    evict( cache_directory, maximum_bytes, maximum_age_seconds, keep = key )
+    return get_cached_outputs( entry_directory ), lilypond_seconds
+
+def render_lilypond_string( ly_string, cache_directory = default_cache_directory, lilypond_command = 'lilypond',
+    directory = None, maximum_bytes = default_maximum_bytes, maximum_age_seconds = default_maximum_age_seconds ):
+    #returns the cached outputs of ly_string ({'.pdf': path, '.midi': path}), running LilyPond only on a cache miss.
+    #directory: where relative \include's are resolved.
+    return render_and_time_lilypond_string( ly_string, cache_directory, lilypond_command, directory, maximum_bytes, maximum_age_seconds )[0]
+
+def get_directory_size( directory ):
+    size = 0
+    for root, directory_names, file_names in os.walk(directory):
+        for file_name in file_names:
+            size += os.path.getsize(os.path.join(root, file_name))
+    return size
+
+def evict( cache_directory = default_cache_directory, maximum_bytes = default_maximum_bytes,
+    maximum_age_seconds = default_maximum_age_seconds, keep = None ):
+    #removes entries unused for longer than maximum_age_seconds, then least recently used entries until the cache fits in maximum_bytes.
+    #keep: a key that is never evicted (the entry just rendered). Returns the evicted keys.
+    if not os.path.isdir(cache_directory):
+        return [ ]
+    entries = [ ]
+    for key in os.listdir(cache_directory):
+        entry_directory = os.path.join(cache_directory, key)
+        if key == keep or '.' in key or not os.path.isdir(entry_directory):
+            continue
+        entries.append( (os.path.getmtime(entry_directory), get_directory_size(entry_directory), key) )
+    entries.sort()
+    total_bytes = sum( x[1] for x in entries )
+    if keep is not None:
+        total_bytes += get_directory_size( os.path.join(cache_directory, keep) )
+    now = time.time()
+    evicted = [ ]
+    for last_used, size, key in entries:
+        if now - last_used <= maximum_age_seconds and total_bytes <= maximum_bytes:
+            break
+        shutil.rmtree( os.path.join(cache_directory, key), ignore_errors = True )
+        total_bytes -= size
+        evicted.append(key)
+    return evicted
+
+def open_file( file_path ):
+    #opens a rendered file in the platform's viewer, as abjad's show() does.
+    if sys.platform.startswith('darwin'):
+        subprocess.Popen( ['open', file_path] )
+    elif sys.platform.startswith('win'):
+        os.startfile(file_path)
+    else:
+        subprocess.Popen( ['xdg-open', file_path] )
+
+def show( ly_string, **keywords ):
+    #a cached replacement for abjad's show(): renders through the cache and opens the PDF.
+    outputs = render_lilypond_string( ly_string, **keywords )
+    open_file( outputs['.pdf'] )
+    return outputs
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+#Tries make_enfilade's generation and melody search over a range of seeds on all cores, without abjad or LilyPond,
+#and writes a ranked table of the results so only the best few seeds need rendering.
+#A seed here gives the same passes as make_enfilade with random_seed set to it (same melody, range, transpositions and sampling).
+#usage: python seedSweep.py 1 1000 --output sweep.tsv
+import argparse
+import csv
+import multiprocessing
+import sys
+import os
+import chordTables
+import enfiladeCore
+import enfiladePasses
+import melodySearch
+import midiWriter
+
+default_melody_string = enfiladeCore.melody_string
+default_pitch_range_tuple = enfiladeCore.pitch_range_tuple
+#the hidden melody transpositions of enfilade2.13.py; berkeleyTwo.py uses 24 12 0 12 24.
+default_transpositions = tuple( enfiladeCore.nth_time_dictionary[x][0] for x in sorted(enfiladeCore.nth_time_dictionary) )
+#the pass dynamics (arpeggios, hidden melody note) of nth_time_dictionary, by transposition.
+transposition_dynamics = dict( (x[0], tuple(x[1:])) for x in enfiladeCore.nth_time_dictionary.values() )
+
+summary_columns = ['rank', 'seed', 'melody_embedded', 'embedded_pitches', 'melody_pitches', 'arpeggios_per_pass',
+    'arpeggios_searched_per_pass', 'passes_at_chord_ceiling', 'total_notes', 'notes_per_embedded_pitch', 'lowest_pitch', 'highest_pitch']
+
+def measure_seed( sweep_arguments ):
+    #sweep_arguments: (seed, melody pitch numbers, transpositions, numeric_pitch_range_low, numeric_pitch_range_high, sampling,
+    #maximum_number_of_chords, pitch_weights_path). Returns a dictionary of metrics for the seed; module level so the process pool can pickle it.
+    (seed, melody_pitch_numbers, transpositions, numeric_pitch_range_low, numeric_pitch_range_high, sampling,
+        maximum_number_of_chords, pitch_weights_path) = sweep_arguments
+    hidden_melodies = [ [ x + transposition for x in melody_pitch_numbers ] for transposition in transpositions ]
+    pass_arguments = enfiladePasses.make_pass_arguments( hidden_melodies, numeric_pitch_range_low, numeric_pitch_range_high, seed, sampling,
+        maximum_number_of_chords, pitch_weights_path )
+    arpeggios_per_pass = [ ]
+    arpeggios_searched_per_pass = [ ]
+    passes_at_chord_ceiling = [ ]
+    selected_pitch_numbers = list( melody_pitch_numbers )
+    for nth_time, x in enumerate(pass_arguments):
+        selections, number_of_arpeggios_searched = enfiladePasses.run_pass( x )
+        arpeggios_per_pass.append( len(selections) )
+        arpeggios_searched_per_pass.append( number_of_arpeggios_searched )
+        report = enfiladePasses.get_pass_report( hidden_melodies[nth_time], numeric_pitch_range_low, numeric_pitch_range_high, selections,
+            sampling, maximum_number_of_chords, pitch_weights_path )
+        if report['hit_ceiling']:
+            passes_at_chord_ceiling.append( nth_time )
+        for arpeggio, pitch_number in selections:
+            selected_pitch_numbers.extend( arpeggio.pitch_numbers )
+    embedded_pitches = sum( arpeggios_per_pass )
+    melody_pitches = len(melody_pitch_numbers) * len(transpositions)
+    #the arpeggio notes it takes to hide one melody pitch: fewer is a tighter enfilade.
+    notes_per_embedded_pitch = float('inf')
+    if embedded_pitches:
+        notes_per_embedded_pitch = float( len(selected_pitch_numbers) - len(melody_pitch_numbers) ) / embedded_pitches
+    metrics = {
+        'seed': seed,
+        'melody_embedded': embedded_pitches == melody_pitches,
+        'embedded_pitches': embedded_pitches,
+        'melody_pitches': melody_pitches,
+        'arpeggios_per_pass': arpeggios_per_pass,
+        'arpeggios_searched_per_pass': arpeggios_searched_per_pass,
+        'passes_at_chord_ceiling': passes_at_chord_ceiling,
+        'total_notes': len(selected_pitch_numbers),
+        'notes_per_embedded_pitch': round( notes_per_embedded_pitch, 3 ),
+        'lowest_pitch': min(selected_pitch_numbers),
+        'highest_pitch': max(selected_pitch_numbers),
+        }
+    return metrics
+
+def get_rank_key( metrics ):
+    #best first: the most melody pitches embedded, then the fewest passes stopped at the chord ceiling, then the fewest arpeggio notes
+    #per embedded pitch; ties go to the lower seed. (Register spread is no key: the passes reach both ends of the range for nearly every seed.)
+    return (-metrics['embedded_pitches'], len(metrics['passes_at_chord_ceiling']), metrics['notes_per_embedded_pitch'], metrics['seed'])
+
+def sweep_seeds( seeds, melody_pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high,
+    transpositions = default_transpositions, sampling = 'rejection', processes = None,
+    maximum_number_of_chords = enfiladePasses.default_maximum_number_of_chords, pitch_weights_path = None ):
+    #returns the metrics of every seed, ranked best first.
+    #pitch_weights_path: the weights file of 'weighted' sampling (None for pitchWeights.weights_path).
+    sweep_arguments = [ (seed, melody_pitch_numbers, tuple(transpositions), numeric_pitch_range_low, numeric_pitch_range_high, sampling,
+        maximum_number_of_chords, pitch_weights_path) for seed in seeds ]
+    if processes == 1:
+        results = [ measure_seed( x ) for x in sweep_arguments ]
+    else:
+        pool = multiprocessing.Pool( processes )
+        try:
+            chunk_size = max(1, len(sweep_arguments) // (4 * (processes or multiprocessing.cpu_count())))
+            results = list( pool.imap_unordered( measure_seed, sweep_arguments, chunk_size ) )
+        finally:
+            pool.close()
+            pool.join()
+    results.sort( key = get_rank_key )
+    for rank, metrics in enumerate(results):
+        metrics['rank'] = rank + 1
+    return results
+
+def write_summary_table( results, output_file ):
+    #tab-separated, one ranked row per seed; per-pass counts are written as space-separated lists.
+    writer = csv.writer( output_file, delimiter = '\t', lineterminator = '\n' )
+    writer.writerow( summary_columns )
+    for metrics in results:
+        row = [ ]
+        for column in summary_columns:
+            value = metrics[column]
+            if isinstance(value, list):
+                value = ' '.join( str(x) for x in value )
+            row.append( value )
+        writer.writerow( row )
+
+def write_seed_midi_files( results, melody_string, numeric_pitch_range_low, numeric_pitch_range_high,
+    transpositions, sampling, midi_directory, processes = None, maximum_number_of_chords = enfiladePasses.default_maximum_number_of_chords,
+    pitch_weights_path = None ):
+    #regenerates the passes of each seed in results and writes them to midi_directory/seed_N.mid with midiWriter, for audition.
+    if not os.path.isdir(midi_directory):
+        os.makedirs(midi_directory)
+    melody_notes = melodySearch.get_notes_from_melody_string( melody_string )
+    melody_pitch_numbers = [ x[0] for x in melody_notes ]
+    hidden_melodies = [ [ x + transposition for x in melody_pitch_numbers ] for transposition in transpositions ]
+    nth_time_dictionary = dict( (x, (transposition,) + transposition_dynamics.get(transposition, ('mf', 'ff')))
+        for x, transposition in enumerate(transpositions) )
+    jobs = [ ]
+    for metrics in results:
+        passes = enfiladePasses.search_passes( hidden_melodies, numeric_pitch_range_low, numeric_pitch_range_high,
+            metrics['seed'], sampling, 1, None, maximum_number_of_chords, pitch_weights_path )
+        notes, tempi = midiWriter.make_enfilade_notes( melody_notes, passes, nth_time_dictionary )
+        jobs.append( (os.path.join(midi_directory, 'seed_%s.mid' % metrics['seed']), notes, tempi) )
+    return midiWriter.write_midi_files( jobs, processes or 1 )
+
+def main( arguments = None ):
+    parser = argparse.ArgumentParser( description = 'Rank enfilade seeds by the passes they generate.' )
+    parser.add_argument( 'first_seed', type = int )
+    parser.add_argument( 'last_seed', type = int, help = 'inclusive' )
+    parser.add_argument( '--melody', default = default_melody_string )
+    parser.add_argument( '--range', nargs = 2, default = default_pitch_range_tuple, metavar = ('LOW', 'HIGH') )
+    parser.add_argument( '--transpositions', nargs = '+', type = int, default = list(default_transpositions) )
+    parser.add_argument( '--sampling', choices = ('rejection', 'table', 'weighted', 'conditioned'), default = 'rejection' )
+    parser.add_argument( '--processes', type = int, default = None, help = 'default: one per core' )
+    parser.add_argument( '--pitch-weights', default = None, help = 'with --sampling weighted, a weights file (default pitchWeights.json)' )
+    parser.add_argument( '--maximum-chords', type = int, default = enfiladePasses.default_maximum_number_of_chords,
+        help = 'the most chords a pass generates, 0 for no ceiling' )
+    parser.add_argument( '--output', default = None, help = 'summary table path (default: standard output)' )
+    parser.add_argument( '--top', type = int, default = 10, help = 'best seeds to list on standard error' )
+    parser.add_argument( '--midi-directory', default = None, help = 'write a MIDI file for each of the --top seeds here' )
+    arguments = parser.parse_args( arguments )
+    if arguments.maximum_chords < 0:
+        parser.error( '--maximum-chords must not be negative.' )
+    maximum_number_of_chords = arguments.maximum_chords or None
+    melody_pitch_numbers = melodySearch.get_pitch_numbers_from_melody_string( arguments.melody )
+    numeric_pitch_range_low = melodySearch.get_pitch_number_from_pitch_name( arguments.range[0] )
+    numeric_pitch_range_high = melodySearch.get_pitch_number_from_pitch_name( arguments.range[1] )
+    seeds = range( arguments.first_seed, arguments.last_seed + 1 )
+    if arguments.sampling in ('rejection', 'table'):
+        #what arpeggios_searched_per_pass should average; also builds the table before the workers start.
+        table = chordTables.get_chord_table( numeric_pitch_range_low, numeric_pitch_range_high )
+        expected_numbers_of_chords = [ chordTables.get_expected_number_of_chords( enfiladePasses.get_reachable_pitch_numbers(
+            [ x + transposition for x in melody_pitch_numbers ], numeric_pitch_range_low, numeric_pitch_range_high ), table )
+            for transposition in arguments.transpositions ]
+        sys.stderr.write( 'expected arpeggios searched per pass: %s\n' % ' '.join( '%.1f' % x for x in expected_numbers_of_chords ) )
+    results = sweep_seeds( seeds, melody_pitch_numbers, numeric_pitch_range_low, numeric_pitch_range_high,
+        arguments.transpositions, arguments.sampling, arguments.processes, maximum_number_of_chords, arguments.pitch_weights )
+    if arguments.output is None:
+        write_summary_table( results, sys.stdout )
+    else:
+        with open( arguments.output, 'w' ) as output_file:
+            write_summary_table( results, output_file )
+    for metrics in results[:arguments.top]:
+        sys.stderr.write( 'seed %(seed)s: %(embedded_pitches)s/%(melody_pitches)s melody pitches, %(total_notes)s notes, %(notes_per_embedded_pitch)s per embedded pitch\n' % metrics )
+    if arguments.midi_directory is not None:
+        write_seed_midi_files( results[:arguments.top], arguments.melody, numeric_pitch_range_low, numeric_pitch_range_high,
+            arguments.transpositions, arguments.sampling, arguments.midi_directory, arguments.processes, maximum_number_of_chords,
+            arguments.pitch_weights )
+
+if __name__ == '__main__':
+    main()
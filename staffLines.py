@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#Where an arpeggio's staff lines move, on plain pitch numbers (c' = 0, as in abjad); does not import abjad.
+#clef_key: 1 - 15va treble; 2 - normal treble; 3 - bass (see move_staff_lines_at_leaf in enfilade2.13.py)
+
+#staff positions (0 = the middle line of a treble staff, b'; one per line or space) of the lines of each clef_key's staff;
+#all three keep treble-clef note positions and only move the lines.
+clef_line_positions = {1: (10, 18), 2: (-4, 4), 3: (-16, -8)}
+#the diatonic step of each pitch class under abjad's default spelling: c cs d ef e f fs g af a bf b.
+diatonic_steps = (0, 0, 1, 2, 2, 3, 3, 4, 5, 5, 6, 6)
+#what one staff switch (six LilyPondCommandMarks) costs, in ledger lines.
+default_switch_penalty = 2
+
+def get_staff_position( pitch_number ):
+    octave, pitch_class_number = divmod(pitch_number, 12)
+    return 7 * octave + diatonic_steps[pitch_class_number] - 6
+
+def get_ledger_line_count( pitch_number, clef_key ):
+    bottom_line, top_line = clef_line_positions[clef_key]
+    staff_position = get_staff_position( pitch_number )
+    if top_line < staff_position:
+        return (staff_position - top_line) // 2
+    if staff_position < bottom_line:
+        return (bottom_line - staff_position) // 2
+    return 0
+
+def get_staff_switches( pitch_numbers, switch_penalty = default_switch_penalty ):
+    #returns (note index, clef_key) pairs, in the order the marks are attached: the clef_key of the first note, then each change.
+    #the clef_keys are the ones with the fewest ledger lines plus switch_penalty per switch, by dynamic programming over the notes;
+    #ties keep the current clef_key, then go to the lower clef_key.
+    if not pitch_numbers:
+        return [ ]
+    clef_keys = sorted(clef_line_positions)
+    costs = [ get_ledger_line_count( pitch_numbers[0], x ) for x in clef_keys ]
+    #previous_keys[i][k]: the clef_key of note i - 1 on the cheapest way to reach note i in clef_keys[k].
+    previous_keys = [ None ]
+    for pitch_number in pitch_numbers[1:]:
+        best_cost = min(costs)
+        best_key = clef_keys[ costs.index(best_cost) ]
+        new_costs = [ ]
+        note_previous_keys = [ ]
+        for k, clef_key in enumerate(clef_keys):
+            if costs[k] <= best_cost + switch_penalty:
+                cost, previous_key = costs[k], clef_key
+            else:
+                cost, previous_key = best_cost + switch_penalty, best_key
+            new_costs.append( cost + get_ledger_line_count( pitch_number, clef_key ) )
+            note_previous_keys.append( previous_key )
+        costs = new_costs
+        previous_keys.append( note_previous_keys )
+    clef_key = clef_keys[ costs.index(min(costs)) ]
+    note_clef_keys = [ clef_key ]
+    for x in range(len(pitch_numbers) - 1, 0, -1):
+        clef_key = previous_keys[x][ clef_keys.index(clef_key) ]
+        note_clef_keys.append( clef_key )
+    note_clef_keys.reverse()
+    staff_switches = [ (0, note_clef_keys[0]) ]
+    for x in range(1, len(note_clef_keys)):
+        if note_clef_keys[x] != note_clef_keys[x - 1]:
+            staff_switches.append( (x, note_clef_keys[x]) )
+    return staff_switches
+
+#staff bands for berkeleyOne.py's ledger-line splitter: a 15va treble staff above the treble when the range goes above f''',
+#and an 8vb bass staff below the bass when it goes below a,,,.
+upper_treble_split_pitch_number = 29
+treble_split_pitch_number = 0
+lower_bass_split_pitch_number = -27
+
+def get_split_pitch_numbers( low, high ):
+    #the lowest pitch number of each staff but the bottom one, top staff first; n split points make n + 1 staffs.
+    split_pitch_numbers = [ treble_split_pitch_number ]
+    if upper_treble_split_pitch_number < high:
+        split_pitch_numbers.insert(0, upper_treble_split_pitch_number)
+    if lower_bass_split_pitch_number > low:
+        split_pitch_numbers.append(lower_bass_split_pitch_number)
+    return split_pitch_numbers
+
+def get_band_index( pitch_number, split_pitch_numbers ):
+    for x, split_pitch_number in enumerate(split_pitch_numbers):
+        if split_pitch_number <= pitch_number:
+            return x
+    return len(split_pitch_numbers)
+
+def partition_pitch_numbers( leaf_pitch_numbers, split_pitch_numbers ):
+    #leaf_pitch_numbers: for each leaf, its pitch numbers, or None for a rest. Returns one list per staff, top first, holding
+    #for each leaf the pitch numbers that fall on that staff: an empty list is a skip, and a rest (None) goes on every staff.
+    bands = [ [ ] for x in range(len(split_pitch_numbers) + 1) ]
+    for pitch_numbers in leaf_pitch_numbers:
+        if pitch_numbers is None:
+            for band in bands:
+                band.append( None )
+            continue
+        for band in bands:
+            band.append( [ ] )
+        for pitch_number in pitch_numbers:
+            bands[ get_band_index( pitch_number, split_pitch_numbers ) ][-1].append( pitch_number )
+    return bands
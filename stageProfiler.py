@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+#Opt-in per-stage instrumentation for make_enfilade and make_lilypond_file: wall time and peak traced memory per stage
+#(and per pass), named counters, a JSON report, and optionally one cProfile dump per stage; does not import abjad.
+#Functions take profiler = None and use null_profiler then, so nothing is measured unless a StageProfiler is passed in.
+#Memory tracing is opt-in (memory = True): tracemalloc slows Python code down several times, so take wall times from a run
+#without it and peak bytes from a separate run with it.
+import contextlib
+import cProfile
+import json
+import os
+import time
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+class StageProfiler(object):
+    #stages nest; a stage's seconds and peak_bytes include its inner stages, and its cProfile dump does not.
+    #peak_bytes is the most traced memory above what was allocated when the stage began (None unless memory is traced).
+
+    def __init__(self, memory = False, cprofile_directory = None):
+        self.memory = memory and tracemalloc is not None
+        self.cprofile_directory = cprofile_directory
+        self.stages = [ ]
+        self.counters = { }
+        #open stages: [name, labels, start time, start bytes, peak bytes, cProfile.Profile or None]
+        self.stack = [ ]
+        #only tracing this profiler started is stopped by stop().
+        self.started_tracing = False
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        if cprofile_directory is not None and not os.path.isdir(cprofile_directory):
+            os.makedirs(cprofile_directory)
+
+    def get_peak_bytes(self):
+        #the traced peak since the last reset, folded into every open stage before the peak is reset for a new one.
+        current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        for open_stage in self.stack:
+            open_stage[4] = max(open_stage[4], peak_bytes)
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        return current_bytes
+
+    @contextlib.contextmanager
+    def stage(self, name, **labels):
+        start_bytes = self.get_peak_bytes() if self.memory else None
+        profile = None
+        if self.cprofile_directory is not None:
+            if self.stack and self.stack[-1][5] is not None:
+                self.stack[-1][5].disable()
+            profile = cProfile.Profile()
+        open_stage = [name, labels, time.time(), start_bytes, start_bytes, profile]
+        self.stack.append( open_stage )
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            seconds = time.time() - open_stage[2]
+            if self.memory:
+                self.get_peak_bytes()
+            self.stack.pop()
+            record = {'name': name, 'seconds': seconds, 'depth': len(self.stack)}
+            record.update( labels )
+            record['peak_bytes'] = open_stage[4] - start_bytes if self.memory else None
+            if profile is not None:
+                record['cprofile'] = os.path.join( self.cprofile_directory, '%03d_%s.prof' % (len(self.stages), name) )
+                profile.dump_stats( record['cprofile'] )
+                if self.stack and self.stack[-1][5] is not None:
+                    self.stack[-1][5].enable()
+            self.stages.append( record )
+
+    def count(self, name, number = 1):
+        self.counters[name] = self.counters.get(name, 0) + number
+
+    def add_report(self, report, **labels):
+        #folds in the report of a StageProfiler that ran elsewhere (a pass in a worker process), labeling its stages.
+        for record in report['stages']:
+            record = dict( record )
+            record.update( labels )
+            record['depth'] += len(self.stack)
+            self.stages.append( record )
+        for name, number in report['counters'].items():
+            self.count( name, number )
+
+    def get_report(self):
+        #stages in the order they finished (inner stages before the stage holding them).
+        return {'stages': [ dict(x) for x in self.stages ], 'counters': dict(self.counters)}
+
+    def stop(self):
+        #stops memory tracing if this profiler started it, so the rest of the process runs at full speed; stages are no longer measured.
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+        self.memory = False
+
+    def write_report(self, file_path):
+        #also stops the profiler.
+        self.stop()
+        with open(file_path, 'w') as report_file:
+            json.dump( self.get_report(), report_file, indent = 2, sort_keys = True )
+        return file_path
+
+class NullProfiler(object):
+    #measures nothing.
+
+    @contextlib.contextmanager
+    def stage(self, name, **labels):
+        yield
+
+    def count(self, name, number = 1):
+        pass
+
+    def add_report(self, report, **labels):
+        pass
+
+null_profiler = NullProfiler()
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+#the modules are flat files in the directory above; the tests import them by name, as the scripts do.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+import os
+import arpeggioSerializer
+import enfiladeCore
+
+#enfilade2.13.py's clef_key_command_strings, written out: that table is built from abjad schemes.
+clef_key_command_strings = {
+    1: ('stopStaff', 'startStaff', "override Staff.StaffSymbol #'line-positions = #'(18 16 14 12 10)",
+        'set Staff.clefGlyph = #"clefs.G"', 'set Staff.clefPosition = #12', 'set Staff.clefOctavation = #14'),
+    2: ('stopStaff', 'startStaff', "override Staff.StaffSymbol #'line-positions = #'(4 2 0 -2 -4)",
+        'set Staff.clefGlyph = #"clefs.G"', 'set Staff.clefPosition = #-2', 'set Staff.clefOctavation = #0'),
+    3: ('stopStaff', 'startStaff', "override Staff.StaffSymbol #'line-positions = #'(-8 -10 -12 -14 -16)",
+        'set Staff.clefGlyph = #"clefs.F"', 'set Staff.clefPosition = #-10', 'set Staff.clefOctavation = #0'),
+    }
+
+def load_golden_lines():
+    with open(os.path.join(enfiladeCore.directory, 'serializerGolden.ly')) as golden_file:
+        return golden_file.read().split('\n')
+
+def test_arpeggio_voices_match_golden():
+    #serializerGolden.ly is abjad 2.13's formatting of serializerGolden.json; the arpeggio voices are one run of its lines.
+    annotations = enfiladeCore.annotate_passes( enfiladeCore.load_passes( os.path.join(enfiladeCore.directory, 'serializerGolden.json') ) )
+    golden_lines = load_golden_lines()
+    start = [ x.strip() for x in golden_lines ].index( '\\new Voice \\with {' )
+    indent = golden_lines[start][:len(golden_lines[start]) - len(golden_lines[start].lstrip())]
+    voice_lines = arpeggioSerializer.format_arpeggio_voices( annotations, clef_key_command_strings, indent )
+    assert len(annotations) == [ x.strip() for x in golden_lines ].count( '\\new Voice \\with {' )
+    assert golden_lines[start:start + len(voice_lines)] == voice_lines
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import collections
+import numpy
+import pytest
+import chordEngine
+
+#enfiladeCore.pitch_range_tuple, c to g'''.
+low, high = -12, 31
+
+def get_frequencies( items ):
+    counts = collections.Counter(items)
+    total = float(sum(counts.values()))
+    return dict( (key, count / total) for key, count in counts.items() )
+
+def get_total_variation( chords, other_chords, get_item = tuple ):
+    frequencies = get_frequencies( get_item(x) for x in chords )
+    other_frequencies = get_frequencies( get_item(x) for x in other_chords )
+    return 0.5 * sum( abs(frequencies.get(x, 0.0) - other_frequencies.get(x, 0.0)) for x in set(frequencies) | set(other_frequencies) )
+
+def get_pitch_frequencies( chords ):
+    #for each pitch number from low, the share of chords that contain it.
+    frequencies = numpy.zeros(high - low + 3)
+    for pitch_numbers in chords:
+        frequencies[ numpy.asarray(pitch_numbers) - low ] += 1
+    return frequencies / len(chords)
+
+def make_kept_chords( target_pitch_number, range_low, range_high ):
+    #rejection sampling: the chords of a plain batch that contain the target.
+    chords = chordEngine.make_chord_batch( 100000, range_low, range_high, chordEngine.make_random_state( 1 ) )
+    return [ x for x in chords if target_pitch_number in x ]
+
+def make_conditioned_chords( target_pitch_number, range_low, range_high ):
+    return list( chordEngine.make_conditioned_chord_batch( [target_pitch_number] * 20000, range_low, range_high,
+        chordEngine.make_random_state( 2 ) ) )
+
+def test_conditioned_chords_match_rejection_chords_in_a_small_range():
+    #c to d'' has few enough chords to compare whole chords; drawing the bottom pitch uniformly instead gives about 0.18.
+    kept_chords = make_kept_chords( 10, 0, 14 )
+    conditioned_chords = make_conditioned_chords( 10, 0, 14 )
+    assert all( 10 in x for x in conditioned_chords )
+    assert get_total_variation( kept_chords, conditioned_chords ) < 0.08
+
+@pytest.mark.parametrize( 'target_pitch_number', [-5, 13, 30] )
+def test_conditioned_chords_match_rejection_chords( target_pitch_number ):
+    kept_chords = make_kept_chords( target_pitch_number, low, high )
+    conditioned_chords = make_conditioned_chords( target_pitch_number, low, high )
+    assert all( target_pitch_number in x for x in conditioned_chords )
+    assert get_total_variation( kept_chords, conditioned_chords, len ) < 0.03
+    assert abs( get_pitch_frequencies( kept_chords ) - get_pitch_frequencies( conditioned_chords ) ).max() < 0.03
+    assert abs( len(kept_chords) / 100000.0 - chordEngine.get_pitch_probability( target_pitch_number, low, high ) ) < 0.01
+
+def test_conditioned_chords_reject_unreachable_targets():
+    with pytest.raises( ValueError ):
+        chordEngine.make_conditioned_chord_batch( [0, low - 1], low, high, chordEngine.make_random_state( 1 ) )
+    with pytest.raises( ValueError ):
+        chordEngine.make_conditioned_chord_batch( [high + 3], low, high, chordEngine.make_random_state( 1 ) )
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import os
+import signal
+import subprocess
+import sys
+import time
+import pytest
+import batchRender
+import enfiladeServer
+
+try:
+    import abjad
+except ImportError:
+    abjad = None
+
+needs_abjad = pytest.mark.skipif( abjad is None, reason = 'the server needs abjad 2.13 (Python 2)' )
+
+@pytest.fixture
+def server( tmpdir ):
+    #a real server in its own process, with one worker and no render cache; yields its socket path.
+    socket_path = str(tmpdir.join('enfilade.sock'))
+    with open(str(tmpdir.join('server.log')), 'w') as log_file:
+        process = subprocess.Popen( [ sys.executable, os.path.join(os.path.dirname(enfiladeServer.__file__), 'enfiladeServer.py'),
+            '--socket', socket_path, 'serve', '--output-directory', str(tmpdir.join('renders')), '--workers', '1', '--no-cache' ],
+            stdout = log_file, stderr = subprocess.STDOUT )
+    try:
+        deadline = time.time() + 120
+        while not enfiladeServer.is_serving( socket_path ):
+            assert process.poll() is None, 'the server exited; see %s' % tmpdir.join('server.log')
+            assert time.time() < deadline, 'the server did not start listening'
+            time.sleep( 0.2 )
+        yield socket_path
+    finally:
+        process.send_signal( signal.SIGTERM )
+        process.wait()
+    assert not os.path.exists(socket_path)
+
+@needs_abjad
+def test_server_writes_a_requested_enfilade( server ):
+    response = enfiladeServer.send_request( {'seed': 2, 'passes': 1, 'serializer': 'fast', 'render': False}, server )
+    assert response['ok'], response
+    with open(response['ly']) as ly_file:
+        ly_string = ly_file.read()
+    assert '\\score {' in ly_string
+    assert '\\new Voice \\with {' in ly_string
+    #the same request writes to the same file.
+    assert enfiladeServer.send_request( {'passes': 1, 'seed': 2, 'serializer': 'fast', 'render': False}, server )['ly'] == response['ly']
+
+@needs_abjad
+@pytest.mark.skipif( batchRender.find_executable( 'lilypond' ) is None, reason = 'no lilypond on the PATH' )
+def test_server_renders_a_requested_enfilade( server ):
+    response = enfiladeServer.send_request( {'seed': 2, 'passes': 1, 'layout': 'letter'}, server )
+    assert response['ok'], response
+    assert os.path.isfile(response['pdf'])
+
+@needs_abjad
+def test_server_answers_bad_requests( server ):
+    response = enfiladeServer.send_request( {'layout': 'napkin', 'render': False}, server )
+    assert not response['ok']
+    assert 'unknown layout' in response['error']
+    response = enfiladeServer.send_request( {'colour': 'red'}, server )
+    assert not response['ok']
+    assert 'unknown request fields: colour.' in response['error']
+
+@pytest.mark.skipif( abjad is not None, reason = 'abjad is installed' )
+def test_serve_needs_abjad( tmpdir ):
+    with pytest.raises( RuntimeError ):
+        enfiladeServer.serve( str(tmpdir.join('enfilade.sock')), str(tmpdir.join('renders')) )
+    assert not os.path.exists(str(tmpdir.join('enfilade.sock')))
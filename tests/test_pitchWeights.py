@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import json
+import pytest
+import chordEngine
+import pitchWeights
+
+low, high = -12, 31
+
+def write_weights( directory, registers ):
+    with open(pitchWeights.weights_path) as weights_file:
+        weights = json.load(weights_file)
+    weights['registers'] = registers
+    file_path = str(directory.join('weights.json'))
+    with open(file_path, 'w') as weights_file:
+        json.dump(weights, weights_file)
+    return file_path
+
+def get_upper_steps( chords, register_low, register_high ):
+    #the steps the chords take up from pitches in [register_low, register_high] above 2/3 of the range.
+    ceiling = chordEngine.get_lower_step_ceiling( high )
+    steps = set()
+    for pitch_numbers in chords:
+        for lower, upper in zip(pitch_numbers, pitch_numbers[1:]):
+            if ceiling < lower and register_low <= lower <= register_high:
+                steps.add(upper - lower)
+    return steps
+
+def test_default_weights_give_make_chords_choices():
+    sampler = pitchWeights.get_chord_sampler( low, high )
+    chords = list( pitchWeights.make_chord_batch( 2000, sampler, chordEngine.make_random_state( 1 ) ) )
+    assert get_upper_steps( chords, low, high ) == set([1, 2])
+
+def test_register_table_wider_than_the_base_table(tmpdir):
+    #four upper steps in a register against the base table's two: every row is as wide as the widest table.
+    file_path = write_weights( tmpdir, [ {'low': 24, 'high': 31, 'upper_steps': {'1': 1, '2': 1, '3': 1, '5': 1}} ] )
+    sampler = pitchWeights.get_chord_sampler( low, high, file_path )
+    assert sampler.steps.shape[1] == 4
+    chords = list( pitchWeights.make_chord_batch( 5000, sampler, chordEngine.make_random_state( 1 ) ) )
+    assert get_upper_steps( chords, 24, 31 ) == set([1, 2, 3, 5])
+    assert get_upper_steps( chords, 21, 23 ) == set([1, 2])
+    for pitch_numbers in chords:
+        assert pitch_numbers == sorted(pitch_numbers)
+        assert high < pitch_numbers[-1]
+
+def test_register_steps_must_be_positive(tmpdir):
+    file_path = write_weights( tmpdir, [ {'low': 24, 'high': 31, 'upper_steps': {'0': 1}} ] )
+    with pytest.raises(ValueError):
+        pitchWeights.load_weights( file_path )
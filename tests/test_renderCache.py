@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import renderCache
+
+ly_body = '\\version "2.18.2"\n\\language "english"\n\n\\score {\n\t{ c\'4 d\'4 }\n}\n'
+
+def make_ly_string( date ):
+    #abjad starts every file it formats with comment lines naming its version and the time it wrote the file.
+    return '%% Abjad revision 2.13\n%% %s\n\n' % date + ly_body
+
+def test_cache_key_ignores_header_comments():
+    key = renderCache.make_cache_key( make_ly_string( '2026-10-18 20:00' ), 'GNU LilyPond 2.18.2' )
+    assert renderCache.make_cache_key( make_ly_string( '2026-10-19 09:30' ), 'GNU LilyPond 2.18.2' ) == key
+
+def test_cache_key_follows_content_and_version():
+    key = renderCache.make_cache_key( make_ly_string( '2026-10-18 20:00' ), 'GNU LilyPond 2.18.2' )
+    assert renderCache.make_cache_key( make_ly_string( '2026-10-18 20:00' ).replace( "d'4", "e'4" ), 'GNU LilyPond 2.18.2' ) != key
+    assert renderCache.make_cache_key( make_ly_string( '2026-10-18 20:00' ), 'GNU LilyPond 2.24.1' ) != key
+
+def test_cache_key_follows_include_files( tmpdir ):
+    include_path = tmpdir.join('layout.ily')
+    include_path.write('\\paper { indent = 0 }\n')
+    ly_string = '\\include "layout.ily"\n' + make_ly_string( '2026-10-18 20:00' )
+    key = renderCache.make_cache_key( ly_string, 'GNU LilyPond 2.18.2', str(tmpdir) )
+    include_path.write('\\paper { indent = 10 }\n')
+    assert renderCache.make_cache_key( ly_string, 'GNU LilyPond 2.18.2', str(tmpdir) ) != key
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+import staffLines
+
+def test_ledger_line_count():
+    #c' sits one ledger line below the treble staff and one above the bass staff.
+    assert [ staffLines.get_ledger_line_count( 0, x ) for x in (1, 2, 3) ] == [8, 1, 1]
+    assert staffLines.get_ledger_line_count( 7, 2 ) == 0
+
+def test_staff_switches_stay_on_one_staff():
+    assert staffLines.get_staff_switches( [ ] ) == [ ]
+    assert staffLines.get_staff_switches( [7, 9, 11] ) == [ (0, 2) ]
+    assert staffLines.get_staff_switches( [-12, -8, -5] ) == [ (0, 3) ]
+    #c' costs one ledger line on either staff: the tie goes to the lower clef_key.
+    assert staffLines.get_staff_switches( [0] ) == [ (0, 2) ]
+
+def test_staff_switches_move_for_a_run():
+    #c e g in the bass, then c'''' e'''' g'''' on the 15va treble staff.
+    assert staffLines.get_staff_switches( [-12, -8, -5, 36, 40, 43] ) == [ (0, 3), (3, 1) ]
+
+def test_staff_switch_penalty():
+    #e''' takes three ledger lines on the treble staff, less than switching up and back at 2 each.
+    assert staffLines.get_staff_switches( [7, 9, 28, 11] ) == [ (0, 2) ]
+    assert staffLines.get_staff_switches( [7, 9, 28, 11], switch_penalty = 0 ) == [ (0, 2), (2, 1), (3, 2) ]